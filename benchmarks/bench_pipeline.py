@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the scene pipeline against a local landsat-pds and
+EarthExplorer emulator: scene throughput, probe latency, finder parse
+speed and batch scaling with the number of workers.
+
+Every run is appended to a JSON lines file, and compared with the last
+run of the same configuration, regressions beyond --threshold flagged.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--scenes N] [--size MB]
+        [--latency MS] [--bandwidth MB/s] [--error-rate RATE]
+        [--workers 1,2,4,8] [--records N] [--only NAME] [--repeat N]
+        [--results PATH] [--threshold PERCENT]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emulator import (  # noqa: E402
+    Emulator, inventory_xml, make_inventory_record, make_scene_ids
+)
+from landsat_downloader.downloader import LandsatDownloader  # noqa: E402
+from landsat_downloader.downloader_base import Downloader  # noqa: E402
+from landsat_downloader.finder import LandsatFinder  # noqa: E402
+from landsat_downloader.inventory import iter_metadata  # noqa: E402
+from landsat_downloader.metrics import (  # noqa: E402
+    MetricsRegistry, set_default_metrics
+)
+from landsat_downloader.retry import Resilience, RetryPolicy  # noqa: E402
+from landsat_downloader.scene_info import SceneInfo  # noqa: E402
+from landsat_downloader.transport import HTTPTransport  # noqa: E402
+
+MB = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+BANDS = ['B4', 'B5', 'BQA']
+FIRST_DATE = date(2018, 1, 1)
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'results.jsonl')
+
+
+def new_transport():
+    """A transport of its own for each benchmark, so circuits opened by
+    injected errors don't leak into the next one. Retries are quick: the
+    emulator errors are not overload.
+    """
+    return HTTPTransport(
+        resilience=Resilience(RetryPolicy(backoff=0.01), failures=100))
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def bench_scene_throughput(emulator, scenes, size, folder):
+    """download_scene of each scene one after the other."""
+    shutil.rmtree(folder, ignore_errors=True)
+    transport = new_transport()
+    began = time.perf_counter()
+    for scene_id, product_id in scenes:
+        LandsatDownloader.download_scene(
+            BANDS, scene_id, product_id, download_dir=folder,
+            transport=transport)
+    elapsed = time.perf_counter() - began
+    return {
+        "seconds": elapsed,
+        "scenes_per_s": len(scenes) / elapsed,
+        "mb_per_s": len(scenes) * len(BANDS) * size / MB / elapsed
+    }
+
+
+def bench_probe_latency(emulator, scenes):
+    """Probe of every collection of each scene, the pre-collection one
+    trying the next version once.
+    """
+    transport = new_transport()
+    registry = MetricsRegistry()
+    set_default_metrics(registry)
+    try:
+        seconds = []
+        for scene_id, product_id in scenes:
+            began = time.perf_counter()
+            Downloader(SceneInfo(scene_id, product_id), transport=transport)
+            seconds.append(time.perf_counter() - began)
+    finally:
+        set_default_metrics(None)
+
+    result = {
+        "p50_s": percentile(seconds, 0.5),
+        "p95_s": percentile(seconds, 0.95),
+    }
+    for collection in ('rt', 't1', 'pre'):
+        count, total = registry.get_histogram(
+            'landsat_probe_seconds', collection=collection)
+        result["{}_mean_s".format(collection)] = total / count
+    return result
+
+
+def bench_finder_parse(emulator, records):
+    """search_scenes_metadata of records scenes over 100 tiles, the
+    answers of the emulator built by a first search, and parsing of the
+    same records from memory, without the network.
+    """
+    tiles = [(1 + i, 1 + i) for i in range(100)]
+    days = max(1, records // len(tiles))
+    start = datetime.combine(FIRST_DATE, datetime.min.time())
+    inventory = [
+        make_inventory_record(path, row, start + timedelta(days=day))
+        for path, row in tiles for day in range(days)]
+    emulator.publish_inventory(inventory)
+    end = start + timedelta(days=days)
+
+    data = inventory_xml(inventory)
+    chunks = [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+    began = time.perf_counter()
+    parsed = sum(1 for _ in iter_metadata(chunks))
+    parsing = time.perf_counter() - began
+
+    transport = new_transport()
+    LandsatFinder.search_scenes_metadata(tiles, start, end,
+                                         transport=transport)
+    sent = emulator.stats()["sent"]
+    began = time.perf_counter()
+    found = LandsatFinder.search_scenes_metadata(tiles, start, end,
+                                                 transport=transport)
+    elapsed = time.perf_counter() - began
+    return {
+        "seconds": elapsed,
+        "records_per_s": len(found) / elapsed,
+        "mb_per_s": (emulator.stats()["sent"] - sent) / MB / elapsed,
+        "parse_records_per_s": parsed / parsing,
+        "parse_mb_per_s": len(data) / MB / parsing
+    }
+
+
+def bench_batch_scaling(emulator, scenes, size, folder, workers):
+    """download_scenes of every scene with each number of workers."""
+    result = {}
+    for count in workers:
+        shutil.rmtree(folder, ignore_errors=True)
+        transport = HTTPTransport(
+            pool_size=max(count, 1),
+            resilience=Resilience(RetryPolicy(backoff=0.01), failures=100))
+        began = time.perf_counter()
+        LandsatDownloader.download_scenes(
+            scenes, BANDS, download_dir=folder, max_workers=count,
+            transport=transport)
+        elapsed = time.perf_counter() - began
+        result["workers_{}_scenes_per_s".format(count)] = \
+            len(scenes) / elapsed
+        result["workers_{}_mb_per_s".format(count)] = \
+            len(scenes) * len(BANDS) * size / MB / elapsed
+    return result
+
+
+def best_of(repeat, fn, *args):
+    """Best value of each metric of fn(*args) over repeat runs: the
+    highest rate (_per_s), the lowest duration (_s).
+    """
+    best = {}
+    for _ in range(repeat):
+        for metric, value in fn(*args).items():
+            if metric not in best:
+                best[metric] = value
+            elif metric.endswith('_per_s'):
+                best[metric] = max(best[metric], value)
+            else:
+                best[metric] = min(best[metric], value)
+    return best
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(path, config):
+    """Last run stored in path with the same config, None if none."""
+    previous = None
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                run = json.loads(line)
+                if run["config"] == config:
+                    previous = run
+    return previous
+
+
+def is_regression(metric, old, new, threshold):
+    """Whether new is worse than old by more than threshold percent:
+    lower for rates (_per_s), higher for durations (_s).
+    """
+    if not old:
+        return False
+    change = (new - old) / old * 100
+    if metric.endswith('_per_s'):
+        return change < -threshold
+    return change > threshold
+
+
+def report(results, previous, threshold):
+    """Print results next to the previous ones. Returns the number of
+    regressions.
+    """
+    regressions = 0
+    print('{:<16}  {:<24}  {:>12}  {:>12}  {:>8}'.format(
+        'benchmark', 'metric', 'value', 'previous', 'change'))
+    for name, metrics in results.items():
+        old_metrics = previous["results"].get(name, {}) if previous else {}
+        for metric, value in metrics.items():
+            old = old_metrics.get(metric)
+            change = '{:+.1f}%'.format((value - old) / old * 100) \
+                if old else ''
+            flag = ''
+            if old is not None and is_regression(
+                    metric, old, value, threshold):
+                flag = '  REGRESSION'
+                regressions += 1
+            print('{:<16}  {:<24}  {:>12.4f}  {:>12}  {:>8}{}'.format(
+                name, metric, value,
+                '{:.4f}'.format(old) if old is not None else '-',
+                change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scenes', type=int, default=20)
+    parser.add_argument('--size', type=float, default=1,
+                        help='band MB')
+    parser.add_argument('--latency', type=float, default=20,
+                        help='ms before each answer')
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='MB/s of each connection, unlimited if unset')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of requests answered 503')
+    parser.add_argument('--workers', default='1,2,4,8,16',
+                        help='comma separated worker counts')
+    parser.add_argument('--records', type=int, default=20000,
+                        help='scenes of the finder inventory')
+    parser.add_argument('--only', action='append',
+                        choices=['scene', 'probe', 'finder', 'batch'],
+                        help='run only these benchmarks')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs of each benchmark, the best kept')
+    parser.add_argument('--results', default=RESULTS_PATH)
+    parser.add_argument('--threshold', type=float, default=10,
+                        help='percent change flagged as a regression')
+    args = parser.parse_args()
+
+    config = {
+        "scenes": args.scenes,
+        "size": args.size,
+        "latency": args.latency,
+        "bandwidth": args.bandwidth,
+        "error_rate": args.error_rate,
+        "workers": args.workers,
+        "records": args.records,
+    }
+    only = set(args.only or ['scene', 'probe', 'finder', 'batch'])
+    size = int(args.size * MB)
+    workers = [int(count) for count in args.workers.split(',')]
+    scenes = make_scene_ids(args.scenes, FIRST_DATE)
+
+    emulator = Emulator(
+        latency=args.latency / 1000,
+        bandwidth=args.bandwidth * MB if args.bandwidth else None,
+        error_rate=args.error_rate)
+    folder = tempfile.mkdtemp()
+    results = {}
+    with emulator, emulator.patch():
+        for scene_id, product_id in scenes:
+            emulator.publish_scene('c1/L8', product_id, BANDS, size)
+
+        if 'scene' in only:
+            results['scene'] = best_of(
+                args.repeat, bench_scene_throughput, emulator, scenes, size,
+                os.path.join(folder, 'scene'))
+        if 'probe' in only:
+            results['probe'] = best_of(
+                args.repeat, bench_probe_latency, emulator, scenes)
+        if 'finder' in only:
+            results['finder'] = best_of(
+                args.repeat, bench_finder_parse, emulator, args.records)
+        if 'batch' in only:
+            results['batch'] = best_of(
+                args.repeat, bench_batch_scaling, emulator, scenes, size,
+                os.path.join(folder, 'batch'), workers)
+        stats = emulator.stats()
+    shutil.rmtree(folder)
+
+    print('{} scenes of {} x {:.1f} MB, {:.0f} ms latency, {}, '
+          '{:.1%} errors ({} of {} requests)'.format(
+              args.scenes, len(BANDS), args.size, args.latency,
+              '{} MB/s per connection'.format(args.bandwidth)
+              if args.bandwidth else 'unlimited bandwidth',
+              args.error_rate, stats["errors"], stats["requests"]))
+    previous = load_previous(args.results, config)
+    regressions = report(results, previous, args.threshold)
+
+    run = {
+        "time": datetime.now().isoformat(),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "config": config,
+        "results": results
+    }
+    with open(args.results, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+    print('results appended to {}'.format(args.results))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
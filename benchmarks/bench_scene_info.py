@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare building SceneInfo one at a time with SceneInfo.from_ids for a
+large inventory of distinct scenes.
+
+Usage:
+    python benchmarks/bench_scene_info.py [--scenes N] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from landsat_downloader import scene_info  # noqa: E402
+from landsat_downloader.scene_info import SceneInfo  # noqa: E402
+
+
+def make_ids(count):
+    """count distinct (scene_id, product_id) pairs."""
+    scene_ids = []
+    product_ids = []
+    first = date(2013, 4, 1)
+    for i in range(count):
+        path, row = 1 + i % 233, 1 + (i // 233) % 248
+        acq_date = first + timedelta(days=(i // (233 * 248)) * 16 + i % 16)
+        scene_ids.append('LC8{:03d}{:03d}{}LGN00'.format(
+            path, row, acq_date.strftime('%Y%j')))
+        product_ids.append('LC08_L1TP_{:03d}{:03d}_{}_{}_01_T1'.format(
+            path, row, acq_date.strftime('%Y%m%d'),
+            (acq_date + timedelta(days=12)).strftime('%Y%m%d')))
+    return scene_ids, product_ids
+
+
+def clear_caches():
+    for function in (scene_info.parse_scene_id, scene_info.parse_product_id,
+                     scene_info.julian_to_date):
+        function.cache_clear()
+
+
+def one_by_one(scene_ids, product_ids):
+    return [SceneInfo(scene_id, product_id)
+            for scene_id, product_id in zip(scene_ids, product_ids)]
+
+
+def bulk(scene_ids, product_ids):
+    return SceneInfo.from_ids(scene_ids, product_ids)
+
+
+def timed(fn, scene_ids, product_ids, repeat, warm=False):
+    best = None
+    for _ in range(repeat):
+        clear_caches()
+        if warm:
+            fn(scene_ids, product_ids)
+        began = time.perf_counter()
+        fn(scene_ids, product_ids)
+        elapsed = time.perf_counter() - began
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--scenes', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    scene_ids, product_ids = make_ids(args.scenes)
+
+    print('{} scenes, numpy {}'.format(
+        args.scenes, 'available' if scene_info.np is not None else 'missing'))
+    print('{:>24}  {:>10}  {:>12}'.format('', 'seconds', 'scenes/s'))
+    for name, fn, warm in (
+        ('SceneInfo()', one_by_one, False),
+        ('SceneInfo() memoized', one_by_one, True),
+        ('SceneInfo.from_ids()', bulk, False),
+    ):
+        elapsed = timed(fn, scene_ids, product_ids, args.repeat, warm)
+        print('{:>24}  {:>10.3f}  {:>12.0f}'.format(
+            name, elapsed, args.scenes / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare single stream and segmented download throughput of
+HTTPTransport against a local HTTP server that caps the bandwidth of
+each connection, as S3 does for a single TCP stream.
+
+Usage:
+    python benchmarks/bench_segmented.py [--size MB] [--stream-rate MB/s]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import socketserver
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from landsat_downloader.transport import HTTPTransport  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class ThrottledHandler(BaseHTTPRequestHandler):
+    """Serve server.data with Range support at server.rate bytes/s per
+    connection.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        data = self.server.data
+        start, end = 0, len(data) - 1
+        byte_range = self.headers.get('Range')
+        if byte_range:
+            first, last = byte_range[6:].split('-')
+            start = int(first)
+            end = min(int(last), end) if last else end
+
+        self.send_response(206 if byte_range else 200)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+
+        block = 64 * 1024
+        began = time.time()
+        for offset in range(start, end + 1, block):
+            chunk = data[offset:min(offset + block, end + 1)]
+            self.wfile.write(chunk)
+            ahead = (offset + len(chunk) - start) / self.server.rate - \
+                (time.time() - began)
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+class Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def run(transport, url, folder, size, segments):
+    file_path = os.path.join(folder, 'band.TIF')
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+    began = time.time()
+    transport.download(url, file_path, size=size, segments=segments)
+    return time.time() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--size', type=int, default=64, help='file MB')
+    parser.add_argument(
+        '--stream-rate', type=float, default=16,
+        help='bandwidth of each connection in MB/s')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    server = Server(('127.0.0.1', 0), ThrottledHandler)
+    server.data = os.urandom(args.size * MB)
+    server.rate = args.stream_rate * MB
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}/band.TIF'.format(server.server_address[1])
+
+    transport = HTTPTransport()
+    folder = tempfile.mkdtemp()
+    size = len(server.data)
+
+    print('{} MB file, {} MB/s per connection'.format(
+        args.size, args.stream_rate))
+    print('{:>10}  {:>10}  {:>10}'.format('segments', 'seconds', 'MB/s'))
+    try:
+        for segments in (1, 2, 4, 8, None):
+            elapsed = min(
+                run(transport, url, folder, size, segments)
+                for _ in range(args.repeat))
+            print('{:>10}  {:>10.2f}  {:>10.1f}'.format(
+                segments or 'auto', elapsed, args.size / elapsed))
+    finally:
+        shutil.rmtree(folder)
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
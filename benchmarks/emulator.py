@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local emulator of landsat-pds and of the EarthExplorer InventoryStream,
+with injected latency, bandwidth limit and errors, for the benchmarks.
+
+Scenes are served as on landsat-pds, <prefix>/PPP/RRR/<id>/ with
+index.html, band TIFs and the MTL file, and the inventory as the
+InventoryStream XML of the records within the path, row and date ranges
+of each query.
+"""
+
+import os
+import sys
+import time
+import random
+import hashlib
+import threading
+import contextlib
+import socketserver
+
+from collections import OrderedDict
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from landsat_downloader import downloader_base  # noqa: E402
+from landsat_downloader.finder import LandsatFinder  # noqa: E402
+
+INVENTORY_PATH = '/EE/InventoryStream/pathrow'
+BLOCK_SIZE = 64 * 1024
+
+
+def make_scene_ids(count, first_date):
+    """count distinct (scene_id, product_id) pairs of Landsat 8 T1
+    scenes, one a day from first_date on tiles 1/1, 2/2...
+    """
+    ids = []
+    for i in range(count):
+        path, row = 1 + i % 233, 1 + i % 248
+        acq_date = first_date + timedelta(days=i // 233)
+        ids.append((
+            'LC8{:03d}{:03d}{}LGN00'.format(
+                path, row, acq_date.strftime('%Y%j')),
+            'LC08_L1TP_{:03d}{:03d}_{}_{}_01_T1'.format(
+                path, row, acq_date.strftime('%Y%m%d'),
+                (acq_date + timedelta(days=12)).strftime('%Y%m%d'))))
+    return ids
+
+
+def make_inventory_record(path, row, acq_date, cloud_cover=10.5):
+    """A metaData record of EarthExplorer for a Landsat 8 scene."""
+    return OrderedDict([
+        ('browseAvailable', 'Y'),
+        ('sceneID', 'LC8{:03d}{:03d}{}LGN00'.format(
+            path, row, acq_date.strftime('%Y%j'))),
+        ('LANDSAT_PRODUCT_ID', 'LC08_L1TP_{:03d}{:03d}_{}_{}_01_T1'.format(
+            path, row, acq_date.strftime('%Y%m%d'),
+            acq_date.strftime('%Y%m%d'))),
+        ('sensor', 'OLI_TIRS'),
+        ('acquisitionDate', acq_date.strftime('%Y-%m-%d')),
+        ('path', path),
+        ('row', row),
+        ('cloudCover', cloud_cover),
+        ('sunElevation', 55.123),
+    ])
+
+
+def inventory_xml(records):
+    """InventoryStream answer with records."""
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<searchResponse xmlns="http://earthexplorer.usgs.gov/'
+        'EE/metadata.xsd">'
+    ]
+    for record in records:
+        lines.append('<metaData>')
+        lines.extend('<{0}>{1}</{0}>'.format(k, v) for k, v in record.items())
+        lines.append('</metaData>')
+    lines.append('</searchResponse>')
+    return '\n'.join(lines).encode()
+
+
+def _filter_inventory(records, query):
+    """Records within the path, row and date ranges of a query."""
+    query = {k: v[0] for k, v in parse_qs(query).items()}
+    selected = []
+    for record in records:
+        if 'start_path' in query and not (
+                int(query['start_path']) <= record['path'] <=
+                int(query['end_path'])):
+            continue
+        if 'start_row' in query and not (
+                int(query['start_row']) <= record['row'] <=
+                int(query['end_row'])):
+            continue
+        if 'start_date' in query and not (
+                query['start_date'] <= record['acquisitionDate'] <=
+                query['end_date']):
+            continue
+        selected.append(record)
+    return selected
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.server.emulator.answer(self, head_only=True)
+
+    def do_GET(self):
+        self.server.emulator.answer(self, head_only=False)
+
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Emulator:
+    """
+    landsat-pds and EarthExplorer served from memory on 127.0.0.1.
+
+    Params:
+        - latency: seconds waited before each answer
+        - bandwidth: bytes per second of each connection, None unlimited
+        - error_rate: share of the requests answered with an error
+        - error_status: status codes of the errors, picked at random
+        - seed: of the errors injected
+    """
+
+    def __init__(
+        self, latency=0.0, bandwidth=None, error_rate=0.0,
+        error_status=(503,), seed=0
+    ):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = tuple(error_status)
+        self.requests = 0
+        self.errors = 0
+        self.sent = 0
+        self._files = {}
+        self._payloads = {}
+        self._records = []
+        self._inventories = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def __repr__(self):
+        return "Emulator ({} files, {} records)".format(
+            len(self._files), len(self._records))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self._server.server_address[1])
+
+    def start(self):
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.emulator = self
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _get_payload(self, size):
+        """Content of size bytes and its ETag, shared by every band of
+        that size.
+        """
+        if size not in self._payloads:
+            data = os.urandom(size)
+            self._payloads[size] = (
+                data, '"{}"'.format(hashlib.md5(data).hexdigest()))
+        return self._payloads[size]
+
+    def add_file(self, path, data):
+        self._files['/' + path.lstrip('/')] = (
+            data, '"{}"'.format(hashlib.md5(data).hexdigest()))
+
+    def publish_scene(self, prefix, considered_id, bands, size):
+        """Serve a scene at <prefix>/PPP/RRR/<considered_id>/ with
+        index.html, bands of size bytes and the MTL file.
+        """
+        path_row = considered_id.split('_')[2] if '_' in considered_id \
+            else considered_id[3:9]
+        folder = '{}/{}/{}/{}/'.format(
+            prefix, path_row[:3], path_row[3:], considered_id)
+
+        self.add_file(folder + 'index.html', b'<html></html>')
+        for band in bands:
+            self._files['/{}{}_{}.TIF'.format(
+                folder, considered_id, band)] = self._get_payload(size)
+        self.add_file(
+            '{}{}_MTL.txt'.format(folder, considered_id),
+            b'GROUP = L1_METADATA_FILE\nEND_GROUP = L1_METADATA_FILE\n')
+
+    def publish_inventory(self, records):
+        """Serve records, dicts as make_inventory_record, as the
+        InventoryStream.
+        """
+        self._records = list(records)
+        self._inventories = {}
+
+    def _get_inventory(self, query):
+        if query not in self._inventories:
+            self._inventories[query] = inventory_xml(
+                _filter_inventory(self._records, query))
+        return self._inventories[query]
+
+    def _inject_error(self):
+        with self._lock:
+            self.requests += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return self._random.choice(self.error_status)
+
+    def answer(self, handler, head_only):
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlparse(handler.path)
+        status = self._inject_error()
+        if status is not None:
+            return self._send_empty(handler, status)
+
+        if url.path == INVENTORY_PATH:
+            data = self._get_inventory(url.query)
+            etag = None
+        elif url.path in self._files:
+            data, etag = self._files[url.path]
+        else:
+            return self._send_empty(handler, 404)
+
+        start, end = 0, len(data) - 1
+        status = 200
+        byte_range = handler.headers.get('Range')
+        if byte_range and byte_range.startswith('bytes='):
+            first, last = byte_range[6:].split('-')
+            start = int(first) if first else 0
+            end = min(int(last), end) if last else end
+            status = 206
+            if start >= len(data):
+                return self._send_empty(handler, 416)
+
+        handler.send_response(status)
+        handler.send_header('Content-Length', str(end - start + 1))
+        handler.send_header('Accept-Ranges', 'bytes')
+        if etag is not None:
+            handler.send_header('ETag', etag)
+        if status == 206:
+            handler.send_header('Content-Range', 'bytes {}-{}/{}'.format(
+                start, end, len(data)))
+        handler.end_headers()
+
+        if not head_only:
+            self._send_body(handler, memoryview(data)[start:end + 1])
+
+    def _send_empty(self, handler, status):
+        handler.send_response(status)
+        handler.send_header('Content-Length', '0')
+        handler.end_headers()
+
+    def _send_body(self, handler, view):
+        """Write view in blocks, at most bandwidth bytes per second."""
+        began = time.monotonic()
+        for offset in range(0, len(view), BLOCK_SIZE):
+            block = view[offset:offset + BLOCK_SIZE]
+            handler.wfile.write(block)
+            with self._lock:
+                self.sent += len(block)
+            if self.bandwidth:
+                ahead = (offset + len(block)) / self.bandwidth - \
+                    (time.monotonic() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "sent": self.sent
+            }
+
+    @contextlib.contextmanager
+    def patch(self):
+        """Point the AWS downloaders and LandsatFinder to the emulator."""
+        urls = [
+            (downloader_base.AWSDownloaderCollection1Tiers, 'c1/L8/'),
+            (downloader_base.AWSDownloaderCollection1RT, 'c1/L8/'),
+            (downloader_base.AWSDownloaderPreCollection, 'L8/'),
+            (LandsatFinder, INVENTORY_PATH.lstrip('/')),
+        ]
+        saved = [(cls, cls.url) for cls, _ in urls]
+        try:
+            for cls, path in urls:
+                cls.url = self.url + path
+            yield self
+        finally:
+            for cls, url in saved:
+                cls.url = url
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+import os
+import asyncio
+import logging
+
+from collections import namedtuple
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from .exceptions import IncompleteDownloadError
+from .metrics import get_default_metrics
+from .retry import Resilience
+from .transport import CHUNK_SIZE, POOL_SIZE, TIMEOUT, commit_part
+
+MAX_CONCURRENCY = 64
+# errors of a request worth trying again
+TRANSIENT_ERRORS = (
+    aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+    asyncio.TimeoutError) if aiohttp is not None else (asyncio.TimeoutError,)
+
+logger = logging.getLogger(__name__)
+
+AsyncResponse = namedtuple('AsyncResponse', 'status_code headers content')
+
+
+class AsyncHTTPTransport:
+    """
+    asyncio counterpart of HTTPTransport, built on aiohttp.
+    Connections are pooled per host and at most max_concurrency requests
+    are in flight at once, so thousands of probes and downloads can be
+    scheduled on the same event loop.
+    Must be used, and closed, inside a running event loop:
+
+        async with AsyncHTTPTransport() as transport:
+            ...
+
+    Params:
+        - max_concurrency: max requests in flight
+        - pool_size: max connections kept open for each host
+        - timeout: seconds as a number or (connect, read) tuple
+        - chunk_size: bytes read from the network at a time on downloads
+        - resilience: Resilience retrying transient failures, see
+          HTTPTransport
+    """
+
+    def __init__(
+        self, max_concurrency=MAX_CONCURRENCY, pool_size=POOL_SIZE,
+        timeout=TIMEOUT, chunk_size=CHUNK_SIZE, resilience=None
+    ):
+        if aiohttp is None:
+            raise ImportError(
+                'aiohttp is required for the asyncio API, install it with '
+                'pip install landsat_downloader[async]')
+
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.resilience = resilience or Resilience()
+        self._session = None
+        self._semaphore = None
+
+    def __repr__(self):
+        return "AsyncHTTPTransport (max concurrency {})".format(
+            self.max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None:
+            connect, read = self.timeout if isinstance(
+                self.timeout, tuple) else (self.timeout, self.timeout)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=0, limit_per_host=self.pool_size),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=connect, sock_read=read),
+                auto_decompress=False
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        return self._session
+
+    async def request(self, method, url, headers=None):
+        """Send a request and read its whole body, retrying transient
+        failures. Returns an AsyncResponse.
+        """
+        return await self.resilience.call_async(
+            url, lambda: self._send(method, url, headers), TRANSIENT_ERRORS)
+
+    async def _send(self, method, url, headers):
+        session = self._get_session()
+        async with self._semaphore:
+            async with session.request(
+                method, url, headers=headers, allow_redirects=False
+            ) as response:
+                content = await response.read()
+                get_default_metrics().increment(
+                    'landsat_received_bytes_total', len(content))
+                return AsyncResponse(
+                    response.status, response.headers, content)
+
+    async def _open(self, url, headers):
+        """Send a GET of url, its body left to be streamed."""
+        return _StreamedResponse(
+            await self._session.get(url, headers=headers))
+
+    async def head(self, url, headers=None):
+        return await self.request('HEAD', url, headers=headers)
+
+    async def get(self, url, headers=None):
+        return await self.request('GET', url, headers=headers)
+
+    async def download(
+        self, url, file_path, chunk_size=None, hashers=(), verify=None
+    ):
+        """Stream url into file_path, see HTTPTransport.download.
+        Returns the size of the file.
+        """
+        part_path = file_path + '.part'
+        chunk_size = chunk_size or self.chunk_size
+        offset = os.path.getsize(part_path) \
+            if os.path.exists(part_path) else 0
+
+        headers = {}
+        if offset:
+            headers['Range'] = 'bytes={}-'.format(offset)
+
+        self._get_session()
+        loop = asyncio.get_event_loop()
+        async with self._semaphore:
+            response = await self.resilience.call_async(
+                url, lambda: self._open(url, headers), TRANSIENT_ERRORS)
+            try:
+                if response.status_code == 416 and offset:
+                    # .part doesn't match the remote file anymore
+                    os.remove(part_path)
+                    offset = None
+                else:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        offset = 0
+
+                    expected = response.headers.get('content-length')
+                    expected = offset + int(expected) if expected else None
+
+                    # file calls may block, they run on the executor
+                    f = await loop.run_in_executor(
+                        None, _open_part, part_path, offset, chunk_size,
+                        hashers)
+                    try:
+                        async for chunk in response.content.iter_chunked(
+                                chunk_size):
+                            await loop.run_in_executor(
+                                None, _write_chunk, f, chunk, hashers)
+                            get_default_metrics().increment(
+                                'landsat_received_bytes_total', len(chunk))
+                        size = await loop.run_in_executor(None, _sync, f)
+                    finally:
+                        f.close()
+            finally:
+                response.close()
+
+        if offset is None:
+            return await self.download(
+                url, file_path, chunk_size, hashers, verify)
+
+        if expected is not None and size != expected:
+            raise IncompleteDownloadError(
+                '{}: got {} of {} bytes'.format(url, size, expected))
+
+        commit_part(part_path, file_path, verify)
+        logger.debug('{} bytes from {} stored at {}'.format(
+            size, url, os.path.dirname(file_path)))
+        return size
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class _StreamedResponse:
+    """aiohttp response with the status_code and close of a requests
+    one, as Resilience expects.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status
+        self.headers = response.headers
+        self.content = response.content
+
+    def raise_for_status(self):
+        self.response.raise_for_status()
+
+    def close(self):
+        self.response.release()
+
+
+def _open_part(part_path, offset, chunk_size, hashers):
+    """Open part_path to be written from offset, hashers updated with the
+    bytes before it.
+    """
+    f = open(part_path, 'r+b' if offset else 'wb')
+    if offset and hashers:
+        _hash(f, offset, chunk_size, hashers)
+    f.seek(offset)
+    f.truncate()
+    return f
+
+
+def _write_chunk(f, chunk, hashers):
+    f.write(chunk)
+    for hasher in hashers:
+        hasher.update(chunk)
+
+
+def _sync(f):
+    """Flush and fsync f. Returns its size."""
+    f.flush()
+    os.fsync(f.fileno())
+    return f.tell()
+
+
+def _hash(f, length, chunk_size, hashers):
+    """Update hashers with the first length bytes of f."""
+    f.seek(0)
+    while length > 0:
+        chunk = f.read(min(length, chunk_size))
+        if not chunk:
+            break
+        for hasher in hashers:
+            hasher.update(chunk)
+        length -= len(chunk)
+
+
+class _TransportContext:
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.owned = transport is None
+
+    async def __aenter__(self):
+        if self.owned:
+            self.transport = AsyncHTTPTransport()
+        return self.transport
+
+    async def __aexit__(self, *exc_info):
+        if self.owned:
+            await self.transport.close()
+
+
+def get_async_transport(transport=None):
+    """Async context manager giving transport, or a new AsyncHTTPTransport
+    closed on exit when transport is None.
+    """
+    return _TransportContext(transport)
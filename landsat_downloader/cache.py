@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+from collections import namedtuple
+
+from .exceptions import RETRY_STATUS, TransientError
+from .metrics import get_default_metrics
+from .scheduler import get_host
+from .tracing import get_default_tracer
+from .transport import TRANSIENT_ERRORS
+
+CACHE_PATH = os.path.join(os.path.expanduser('~'), 'landsat', '.cache.sqlite')
+TTL = 24 * 60 * 60
+NEGATIVE_TTL = 60 * 60
+MAX_ENTRIES = 100000
+# HEAD answers worth caching: the file exists or it is not on the server
+CACHEABLE_STATUS = (200, 403, 404)
+
+logger = logging.getLogger(__name__)
+
+HeadResult = namedtuple('HeadResult', 'exists size etag checked_at')
+
+
+def connect_sqlite(path):
+    """SQLite connection to path usable from any thread, the folder of
+    path created when missing. ':memory:' keeps the database in memory.
+    """
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    return sqlite3.connect(path, check_same_thread=False)
+
+
+class HeadCache:
+    """
+    Persistent cache of HEAD results keyed by URL, stored in SQLite.
+    Positive answers expire after ttl seconds and negative ones (the file
+    is not on the server) after negative_ttl. When more than max_entries
+    are stored the least recently used are evicted. Lookups don't write:
+    their access times are kept in memory and stored with the next set,
+    or on close.
+
+    Params:
+        - path: SQLite database file, ':memory:' keeps it in memory
+        - ttl: lifetime of positive answers in seconds
+        - negative_ttl: lifetime of negative answers in seconds
+        - max_entries: max number of URLs kept
+    """
+
+    def __init__(
+        self, path=CACHE_PATH, ttl=TTL, negative_ttl=NEGATIVE_TTL,
+        max_entries=MAX_ENTRIES
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._accessed = {}
+        self._connection = connect_sqlite(path)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS heads ('
+            'url TEXT PRIMARY KEY, exists_ INTEGER, size INTEGER, '
+            'etag TEXT, checked_at REAL, accessed_at REAL)')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS heads_accessed_at '
+            'ON heads (accessed_at)')
+        self._connection.commit()
+
+    def __repr__(self):
+        return "HeadCache {}".format(self.path)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM heads').fetchone()[0]
+
+    def get(self, url):
+        """Returns the HeadResult stored for url or None when unknown or
+        expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT exists_, size, etag, checked_at FROM heads '
+                'WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                return None
+
+            result = HeadResult(bool(row[0]), row[1], row[2], row[3])
+            ttl = self.ttl if result.exists else self.negative_ttl
+            if now - result.checked_at > ttl:
+                self._accessed.pop(url, None)
+                self._connection.execute(
+                    'DELETE FROM heads WHERE url = ?', (url,))
+                self._connection.commit()
+                return None
+
+            self._accessed[url] = now
+
+        return result
+
+    def _store_accessed(self):
+        """Write the access times of the lookups since the last call,
+        committed by the caller. Called with the lock held.
+        """
+        if self._accessed:
+            self._connection.executemany(
+                'UPDATE heads SET accessed_at = ? WHERE url = ?',
+                [(at, url) for url, at in self._accessed.items()])
+            self._accessed.clear()
+
+    def set(self, url, exists, size=None, etag=None):
+        """Store a HEAD result for url and evict the least recently used
+        entries beyond max_entries. Returns the stored HeadResult.
+        """
+        now = time.time()
+        with self._lock:
+            self._store_accessed()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO heads VALUES (?, ?, ?, ?, ?, ?)',
+                (url, int(exists), size, etag, now, now))
+
+            count = self._connection.execute(
+                'SELECT COUNT(*) FROM heads').fetchone()[0]
+            if count > self.max_entries:
+                self._connection.execute(
+                    'DELETE FROM heads WHERE url IN (SELECT url FROM heads '
+                    'ORDER BY accessed_at, rowid LIMIT ?)',
+                    (count - self.max_entries,))
+            self._connection.commit()
+
+        return HeadResult(exists, size, etag, now)
+
+    def invalidate(self, url):
+        with self._lock:
+            self._accessed.pop(url, None)
+            self._connection.execute('DELETE FROM heads WHERE url = ?', (url,))
+            self._connection.commit()
+
+    def clear(self):
+        with self._lock:
+            self._accessed.clear()
+            self._connection.execute('DELETE FROM heads')
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._store_accessed()
+            self._connection.commit()
+            self._connection.close()
+
+
+def make_head_result(url, status_code, headers, head_cache=None):
+    """Build the HeadResult of a response, stored in head_cache when it is
+    set. Answers that may change when asked again raise TransientError and
+    are never cached.
+    """
+    if status_code in RETRY_STATUS:
+        raise TransientError('{}: HTTP {}'.format(url, status_code))
+
+    exists = status_code == 200
+    size = headers.get('content-length')
+    size = int(size) if exists and size is not None else None
+    etag = headers.get('etag')
+
+    if head_cache is not None and status_code in CACHEABLE_STATUS:
+        return head_cache.set(url, exists, size, etag)
+
+    return HeadResult(exists, size, etag, time.time())
+
+
+def head_url(transport, url, head_cache=None):
+    """HEAD url through transport, answered from head_cache when it is set
+    and the url was checked recently. Returns a HeadResult.
+    Raises TransientError when the server couldn't tell whether the file
+    exists, e.g. on a timeout or a 503 answer once retries are exhausted.
+    """
+    metrics = get_default_metrics()
+    result = None
+    if head_cache is not None:
+        result = head_cache.get(url)
+        metrics.increment(
+            'landsat_head_cache_total', result='miss' if result is None
+            else 'hit')
+
+    if result is None:
+        started = time.monotonic()
+        with get_default_tracer().span('http.head', url=url) as span:
+            try:
+                response = transport.head(url)
+            except TRANSIENT_ERRORS as exc:
+                raise TransientError('{}: {}'.format(url, exc)) from exc
+            span.set_attribute('status', response.status_code)
+        metrics.observe(
+            'landsat_head_seconds', time.monotonic() - started,
+            host=get_host(url))
+        result = make_head_result(
+            url, response.status_code, response.headers, head_cache)
+    return result
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+from datetime import date, datetime
+
+from .cache import connect_sqlite
+from .files import DownloadedFile
+from .manifest import Manifest
+
+CATALOG_PATH = os.path.join(
+    os.path.expanduser('~'), 'landsat', '.catalog.sqlite')
+
+COLUMNS = (
+    'file_path', 'name', 'scene_id', 'product_id', 'considered_id',
+    'collection', 'band', 'path', 'row', 'acq_date', 'size', 'md5',
+    'sha256', 'downloaded_at'
+)
+
+logger = logging.getLogger(__name__)
+
+
+def get_collection(considered_id):
+    """Collection of a downloaded id: RT, T1, T2 or PRE for pre-collection
+    scene ids.
+    """
+    if '_' in considered_id:
+        return considered_id.split('_')[-1]
+    return 'PRE'
+
+
+def _to_date_str(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    return value
+
+
+class Catalog:
+    """
+    Local index of every file downloaded, stored in SQLite, to know which
+    scenes and bands are available without walking the download folder.
+
+    Params:
+        - path: SQLite database file, ':memory:' keeps it in memory
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = connect_sqlite(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'file_path TEXT PRIMARY KEY, name TEXT, scene_id TEXT, '
+            'product_id TEXT, considered_id TEXT, collection TEXT, '
+            'band TEXT, path INTEGER, row INTEGER, acq_date TEXT, '
+            'size INTEGER, md5 TEXT, sha256 TEXT, downloaded_at REAL)')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS files_scene '
+            'ON files (scene_id, product_id)')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS files_path_row '
+            'ON files (path, row, acq_date)')
+        self._connection.commit()
+
+    def __repr__(self):
+        return "Catalog {}".format(self.path)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def add(self, scene_info, considered_id, downloaded):
+        """
+        Record the files returned by a download.
+
+        Params:
+            - scene_info: SceneInfo of the requested scene
+            - considered_id: id of the scene actually downloaded
+            - downloaded: list of {"name", "path", "type", "size"} dicts
+        """
+        now = time.time()
+        manifests = {}
+        rows = []
+
+        for values in downloaded:
+            folder = os.path.dirname(values['path'])
+            if folder not in manifests:
+                manifests[folder] = Manifest(folder)
+            entry = manifests[folder].get(values['name']) or {}
+
+            rows.append((
+                values['path'],
+                values['name'],
+                scene_info.scene_id,
+                scene_info.product_id,
+                considered_id,
+                get_collection(considered_id),
+                values['type'],
+                scene_info.id_info.path,
+                scene_info.id_info.row,
+                _to_date_str(scene_info.id_info.acq_date),
+                values['size'],
+                entry.get('md5'),
+                entry.get('sha256'),
+                now
+            ))
+
+        with self._lock:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO files VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            self._connection.commit()
+
+    def get_scene_files(self, scene_id, product_id, bands, download_dir=None):
+        """
+        Files of a scene previously downloaded, in the same order and shape
+        returned by a download, only if every band in bands is recorded and
+        still on disk with the recorded size.
+
+        Params:
+            - bands: file types, e.g. ['B4', 'BQA', 'MTL']
+            - download_dir: only consider files stored under this folder
+
+        Returns:
+            A list of {"name", "path", "type", "size"} DownloadedFile or
+            None
+        """
+        with self._lock:
+            records = self._connection.execute(
+                'SELECT * FROM files WHERE scene_id = ? AND product_id = ? '
+                'ORDER BY downloaded_at', (scene_id, product_id)).fetchall()
+
+        by_band = {}
+        for record in records:
+            if download_dir and not record['file_path'].startswith(
+                    os.path.join(download_dir, '')):
+                continue
+            by_band[record['band']] = record
+
+        files = []
+        for band in bands:
+            record = by_band.get(band)
+            if record is None or not os.path.exists(record['file_path']) or \
+                    os.path.getsize(record['file_path']) != record['size']:
+                return None
+
+            files.append(DownloadedFile({
+                "name": record['name'],
+                "path": record['file_path'],
+                "type": record['band'],
+                "size": record['size']
+            }))
+
+        return files
+
+    def query(
+        self, path=None, row=None, start_date=None, end_date=None,
+        bands=None, collection=None
+    ):
+        """
+        Search downloaded files. Every param is optional and narrows the
+        results, e.g. the bands of path/row 224/68 from January 2018:
+            catalog.query(path=224, row=68, start_date=datetime(2018, 1, 1),
+                          end_date=datetime(2018, 1, 31))
+
+        Returns:
+            A list of dicts with the recorded columns ordered by date,
+            scene and band
+        """
+        filters = []
+        params = []
+        for column, operator, value in (
+            ('path', '=', path),
+            ('row', '=', row),
+            ('acq_date', '>=', _to_date_str(start_date)),
+            ('acq_date', '<=', _to_date_str(end_date)),
+            ('collection', '=', collection),
+        ):
+            if value is not None:
+                filters.append('{} {} ?'.format(column, operator))
+                params.append(value)
+
+        if bands:
+            filters.append('band IN ({})'.format(','.join('?' * len(bands))))
+            params.extend(bands)
+
+        sql = 'SELECT * FROM files'
+        if filters:
+            sql += ' WHERE ' + ' AND '.join(filters)
+        sql += ' ORDER BY acq_date, scene_id, band'
+
+        with self._lock:
+            records = self._connection.execute(sql, params).fetchall()
+
+        return [dict(zip(COLUMNS, record)) for record in records]
+
+    def remove(self, file_path):
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM files WHERE file_path = ?', (file_path,))
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -1,17 +1,422 @@
 # -*- coding: utf-8 -*-
 
 """Console script for landsat_downloader."""
+import re
 import sys
+import json
+import time
+import logging
+import threading
+
+from itertools import islice
+
 import click
 
+from . import finder
+from .downloader import LandsatDownloader
+from .downloader_base import DOWNLOAD_DIR, MAX_WORKERS
+from .exceptions import BatchDownloadErrors, is_transient
+from .metrics import EVENT, MetricsRegistry, set_default_metrics
+from .scene_info import SceneInfo
+from .throttle import RateLimiter
+from .tracing import SpanRecorder, set_default_tracer
+from .transport import POOL_SIZE, HTTPTransport
+
+BATCH_SIZE = 100
+# exit status when every failure may go away, worth running again
+EX_TEMPFAIL = 75
+VALID_BANDS = ['B{}'.format(i) for i in range(1, 12)] + ['BQA']
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+logger = logging.getLogger(__name__)
+
+
+def parse_size(value):
+    """Bytes of a size such as 512K, 50M or 1.5G, None for None."""
+    if value is None:
+        return None
+    match = re.match(r'^\s*([\d.]+)\s*([KMG]?)i?B?\s*$', str(value), re.I)
+    if not match:
+        raise ValueError('{} is not a size, e.g. 50M'.format(value))
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def parse_bands(values):
+    """Bands of --bands values, each one or comma separated numbers or
+    names, e.g. ('4,5', 'BQA') to [4, 5, 'BQA'].
+    """
+    bands = []
+    for value in values:
+        for band in value.split(','):
+            band = band.strip().upper()
+            if band:
+                bands.append(int(band) if band.isdigit() else band)
+    return bands
+
+
+def read_scenes(lines):
+    """(scene_id, product_id) of each line: a JSON object, e.g. from the
+    search command, or both ids separated by a comma or spaces. Blank
+    lines and lines starting with # are skipped.
+    Raises ValueError on a line that can't be read.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                raise ValueError('line {}: {}'.format(number, exc))
+            ids = (record.get('sceneID') or record.get('scene_id'),
+                   record.get('LANDSAT_PRODUCT_ID') or
+                   record.get('product_id'))
+        else:
+            ids = tuple(re.split(r'[\s,;]+', line))
+
+        if len(ids) != 2 or not all(ids):
+            raise ValueError(
+                'line {}: expected a scene id and a product id'.format(
+                    number))
+        yield ids
+
+
+def read_tiles(lines):
+    """(path, row) of each line, e.g. 222/63, 222,63 or 222 63."""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            path, row = re.split(r'[\s,;/]+', line)
+            yield int(path), int(row)
+        except ValueError:
+            raise ValueError(
+                'line {}: expected a path and a row, e.g. 222/63'.format(
+                    number))
+
+
+def iter_batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Progress:
+    """
+    Aggregated progress of a download written to stderr: scenes done and
+    failed, files and bytes downloaded, throughput. Rewritten in place on
+    a terminal, otherwise a line every interval seconds.
+    Fed by the metrics events of the downloaders, hook being a metrics
+    hook.
+    """
+
+    def __init__(self, enabled=True, interval=None, stream=None):
+        self.enabled = enabled
+        self.stream = stream or sys.stderr
+        self.tty = self.stream.isatty()
+        self.interval = interval or (0.5 if self.tty else 10.0)
+        self.scenes = 0
+        self.failed = 0
+        self.files = 0
+        self.skipped = 0
+        self.bytes = 0
+        self._started = time.monotonic()
+        self._shown = 0.0
+        self._lock = threading.Lock()
+
+    def hook(self, kind, name, value, labels):
+        if kind != EVENT:
+            return
+        with self._lock:
+            if name == 'file_downloaded':
+                self.files += 1
+                self.bytes += labels['size']
+            elif name == 'file_skipped':
+                self.skipped += 1
+            else:
+                return
+        self.show()
+
+    def add_scene(self, failed=False):
+        with self._lock:
+            self.scenes += 1
+            self.failed += failed
+        self.show()
+
+    def format(self):
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        return ('{} scenes ({} failed), {} files ({} skipped), '
+                '{:.1f} MB, {:.1f} MB/s, {:.0f}s').format(
+                    self.scenes, self.failed, self.files, self.skipped,
+                    self.bytes / 1024 ** 2, self.bytes / 1024 ** 2 / elapsed,
+                    elapsed)
+
+    def show(self, force=False):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._shown < self.interval:
+                return
+            self._shown = now
+            line = self.format()
+        if self.tty:
+            self.stream.write('\r\033[K' + line)
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
+
+    def close(self):
+        self.show(force=True)
+        if self.enabled and self.tty:
+            self.stream.write('\n')
+
+
+def emit(output, record):
+    """Write record as a JSON line, flushed so consumers see it at once."""
+    output.write(json.dumps(record, default=str) + '\n')
+    output.flush()
+
+
+def _size_option(ctx, param, value):
+    try:
+        return parse_size(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+
+
+@click.group()
+@click.option('-v', '--verbose', count=True,
+              help='Log progress of each file (-v) and requests (-vv).')
+def main(verbose=0):
+    """Search Landsat 8 scenes on EarthExplorer and download them from
+    landsat-pds. Results are written as JSON lines.
+    """
+    logging.basicConfig(
+        stream=sys.stderr, format='%(asctime)s %(levelname)s %(message)s',
+        level=[logging.WARNING, logging.INFO, logging.DEBUG][min(verbose, 2)])
+
+
+@main.command()
+@click.option('-p', '--path-row', 'path_rows', multiple=True,
+              help='Tile as PATH/ROW, e.g. 222/63. Repeatable.')
+@click.option('--tiles', type=click.File('r'),
+              help='File of tiles, one PATH/ROW a line, - for stdin.')
+@click.option('--start', required=True, type=click.DateTime(['%Y-%m-%d']),
+              help='First acquisition date, YYYY-MM-DD.')
+@click.option('--end', required=True, type=click.DateTime(['%Y-%m-%d']),
+              help='Last acquisition date, YYYY-MM-DD.')
+@click.option('--sensor', default='LANDSAT_8_C1', show_default=True)
+@click.option('--max-cloud', type=float,
+              help='Skip scenes with a higher cloud cover, in percent.')
+@click.option('-w', '--workers', default=finder.MAX_WORKERS,
+              show_default=True, help='Queries sent at once.')
+@click.option('--window-days', type=int,
+              help='Split the dates in queries of this many days.')
+@click.option('-O', '--output', type=click.File('w'), default='-',
+              help='JSON lines output. default: stdout')
+def search(path_rows, tiles, start, end, sensor, max_cloud, workers,
+           window_days, output):
+    """Search scenes of tiles, written as they are found, one JSON
+    object a line, which the download command reads.
+    """
+    try:
+        path_row_list = list(read_tiles(path_rows))
+        if tiles is not None:
+            path_row_list.extend(read_tiles(tiles))
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+    if not path_row_list:
+        raise click.UsageError('Give tiles with --path-row or --tiles.')
+
+    found = 0
+    for record in finder.LandsatFinder.iter_scenes_metadata(
+            path_row_list, start, end, sensor=sensor, max_workers=workers,
+            window_days=window_days):
+        cloud_cover = record.get('cloudCover')
+        if max_cloud is not None and cloud_cover is not None and \
+                cloud_cover > max_cloud:
+            continue
+        emit(output, record)
+        found += 1
+
+    logger.info('{} scenes found'.format(found))
+
+
+@main.command()
+@click.argument('scenes', type=click.File('r'), default='-')
+@click.option('-b', '--bands', multiple=True, required=True,
+              help='Bands, e.g. -b 4 -b 5 or -b 4,5,BQA.')
+@click.option('-o', '--outdir', default=DOWNLOAD_DIR, show_default=True,
+              type=click.Path(file_okay=False),
+              help='Folder of the scene folders.')
+@click.option('-w', '--workers', default=MAX_WORKERS, show_default=True,
+              help='Probes and files requested at once.')
+@click.option('--per-host', type=int,
+              help='Requests at once to the same host. default: workers')
+@click.option('--segments', default=1, show_default=True,
+              help='Byte ranges each file is split in, 0 for auto.')
+@click.option('--rate', callback=_size_option,
+              help='Max bytes received per second, e.g. 50M.')
+@click.option('--requests-per-second', type=float,
+              help='Max requests sent per second.')
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True,
+              help='Scenes read and queued at once.')
+@click.option('--metadata/--no-metadata', default=True, show_default=True,
+              help='Also download the MTL file.')
+@click.option('--manifest/--no-manifest', default=True, show_default=True,
+              help='Keep sizes and hashes in a manifest of each scene.')
+@click.option('--first-available', is_flag=True,
+              help='Stop probing at the first collection found.')
+@click.option('-n', '--dry-run', is_flag=True,
+              help='Only read and check the scenes, request nothing.')
+@click.option('-O', '--output', type=click.File('w'), default='-',
+              help='JSON lines output. default: stdout')
+@click.option('--progress/--no-progress', default=True, show_default=True,
+              help='Aggregated progress on stderr.')
+@click.option('--metrics-file', type=click.Path(dir_okay=False),
+              help='Write the metrics there, Prometheus text format.')
+@click.option('--trace-file', type=click.Path(dir_okay=False),
+              help='Write the spans there, Chrome trace event format.')
+def download(scenes, bands, outdir, workers, per_host, segments, rate,
+             requests_per_second, batch_size, metadata, manifest,
+             first_available, dry_run, output, progress, metrics_file,
+             trace_file):
+    """Download bands of the scenes of SCENES, a file or - for stdin, as
+    written by the search command or a scene id and a product id a
+    line. A JSON object is written for each scene, with its status and
+    files.
+
+    Exits with 1 when a scene failed, 75 when every failure may go away
+    and the command is worth running again.
+    """
+    bands = parse_bands(bands)
+    invalid = [band for band in LandsatDownloader._create_bands_names(bands)
+               if band not in VALID_BANDS]
+    if invalid:
+        raise click.BadParameter(
+            '{} not valid, expected {}'.format(
+                ', '.join(invalid), ', '.join(VALID_BANDS)),
+            param_hint='--bands')
+
+    if dry_run:
+        try:
+            invalid = _check_scenes(
+                _iter_unique(read_scenes(scenes)), bands, outdir, output)
+        except ValueError as exc:
+            raise click.BadParameter(str(exc), param_hint='SCENES')
+        if invalid:
+            sys.exit(1)
+        return
+
+    rate_limiter = RateLimiter(rate, requests_per_second) \
+        if rate or requests_per_second else None
+    transport = HTTPTransport(
+        pool_size=max(POOL_SIZE, workers), rate_limiter=rate_limiter)
+    status = Progress(enabled=progress)
+    registry = MetricsRegistry(hooks=[status.hook])
+    set_default_metrics(registry)
+    tracer = SpanRecorder() if trace_file else None
+    set_default_tracer(tracer)
+
+    failed = []
+    try:
+        for batch in iter_batches(
+                _iter_unique(read_scenes(scenes)), batch_size):
+            failed.extend(_download_batch(
+                batch, bands, outdir, workers, per_host, segments or None,
+                metadata, manifest, first_available, transport, output,
+                status))
+    except ValueError as exc:
+        raise click.BadParameter(str(exc), param_hint='SCENES')
+    finally:
+        status.close()
+        set_default_metrics(None)
+        set_default_tracer(None)
+        transport.close()
+        if metrics_file:
+            registry.write_prometheus(metrics_file)
+        if tracer is not None:
+            tracer.write_chrome_trace(trace_file)
+
+    if failed:
+        sys.exit(EX_TEMPFAIL if all(failed) else 1)
+
+
+def _check_scenes(scenes, bands, outdir, output):
+    """Emit each scene as planned, or invalid when its ids can't be
+    parsed, without any request. Returns the number of invalid scenes.
+    """
+    invalid = 0
+    for scene_id, product_id in scenes:
+        record = {"scene_id": scene_id, "product_id": product_id}
+        try:
+            SceneInfo(scene_id=scene_id, product_id=product_id)
+        except Exception as exc:
+            invalid += 1
+            record.update({
+                "status": "invalid",
+                "error": 'ids not valid: {}: {}'.format(
+                    type(exc).__name__, exc)
+            })
+        else:
+            record.update({
+                "status": "planned", "bands": bands, "download_dir": outdir
+            })
+        emit(output, record)
+    return invalid
+
+
+def _iter_unique(scenes):
+    seen = set()
+    for scene_id, product_id in scenes:
+        if scene_id not in seen:
+            seen.add(scene_id)
+            yield scene_id, product_id
+
+
+def _download_batch(
+    batch, bands, outdir, workers, per_host, segments, metadata, manifest,
+    first_available, transport, output, status
+):
+    """Download the scenes of batch and emit the result of each.
+    Returns whether each scene that failed may succeed later.
+    """
+    try:
+        results = LandsatDownloader.download_scenes(
+            batch, bands, download_dir=outdir, metadata=metadata,
+            max_workers=workers, max_per_host=per_host,
+            first_available=first_available, transport=transport,
+            segments=segments, manifest=manifest)
+        errors = {}
+    except BatchDownloadErrors as exc:
+        results, errors = exc.results, exc.errors
 
-@click.command()
-def main(args=None):
-    """Console script for landsat_downloader."""
-    click.echo("Replace this message by putting your code into "
-               "landsat_downloader.cli.main")
-    click.echo("See click documentation at http://click.pocoo.org/")
-    return 0
+    failed = []
+    for scene_id, product_id in batch:
+        record = {"scene_id": scene_id, "product_id": product_id}
+        if scene_id in errors:
+            error = errors[scene_id]
+            failed.append(is_transient(error))
+            record.update({
+                "status": "failed",
+                "error": str(error),
+                "transient": failed[-1]
+            })
+        else:
+            record.update({
+                "status": "downloaded",
+                "files": [dict(img) for img in results[scene_id]]
+            })
+        emit(output, record)
+        status.add_scene(failed=scene_id in errors)
+    return failed
 
 
 if __name__ == "__main__":
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""Optional dependencies, None when not installed."""
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def require_numpy(purpose):
+    """Raises ImportError when numpy, needed for purpose, is missing."""
+    if np is None:
+        raise ImportError(
+            'numpy is required {}, install it with '
+            'pip install landsat_downloader[numpy]'.format(purpose))
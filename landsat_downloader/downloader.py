@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
 import logging
 
-from .downloader_base import Downloader
+from collections import OrderedDict
+
+from .async_transport import get_async_transport
+from .downloader_base import Downloader, DOWNLOAD_DIR, MAX_WORKERS
+from .exceptions import BatchDownloadErrors
 from .scene_info import SceneInfo
+from .scheduler import Scheduler
+from .tracing import get_default_tracer
 
 
 logger = logging.getLogger(__name__)
@@ -33,8 +39,30 @@ class LandsatDownloader:
     @staticmethod
     def download_scene(
         bands, scene_id=False, product_id=False,
-        download_dir=None, metadata=True
+        download_dir=None, metadata=True, max_workers=MAX_WORKERS,
+        first_available=False, transport=None, head_cache=None, segments=1,
+        manifest=True, catalog=None, sources=None
     ):
+        """
+        Download bands and metadata of a scene
+        returns a list of {"name", "path", "type", "size"} dicts, as
+        DownloadedFile giving the pixels of bands with .array
+        params:
+            bands: list of bands, e.g. [4, 5, 'BQA']
+            scene_id: Landsat scene id
+            product_id: Landsat product id
+            download_dir: destination folder. default: DOWNLOAD_DIR
+            metadata: also download the MTL file
+            max_workers: files downloaded at once
+            first_available: stop probing at the first collection found
+            transport: HTTPTransport used for requests
+            head_cache: HeadCache used for remote probes
+            segments: byte ranges each file is split in, None for auto
+            manifest: keep sizes and hashes in a per-scene manifest
+            catalog: Catalog consulted before and updated after download
+            sources: SourceRegistry of the mirrors to download from,
+                AWS only when None
+        """
 
         if scene_id and product_id:
             try:
@@ -42,13 +70,175 @@ class LandsatDownloader:
             except Exception as exc:
                 raise(exc)
 
+            if catalog is not None:
+                imgs = catalog.get_scene_files(
+                    scene_id, product_id,
+                    bands + ['MTL'] if metadata else bands,
+                    download_dir=download_dir or DOWNLOAD_DIR)
+                if imgs is not None:
+                    return imgs
+
+            with get_default_tracer().span(
+                    'scene', scene_id=scene_id, product_id=product_id):
+                scene = SceneInfo(scene_id=scene_id, product_id=product_id)
+                scene_downloader = Downloader(
+                    scene, first_available=first_available,
+                    transport=transport, head_cache=head_cache,
+                    sources=sources)
+                imgs = scene_downloader.download(
+                    bands=bands,
+                    download_dir=download_dir,
+                    metadata=metadata,
+                    max_workers=max_workers,
+                    segments=segments,
+                    manifest=manifest
+                )
+
+            if catalog is not None:
+                catalog.add(
+                    scene, scene_downloader.downloader.considered_id, imgs)
+            return imgs
+
+        raise ValueError('Expected scene id and product id')
+
+    @staticmethod
+    def download_scenes(
+        scenes, bands, download_dir=None, metadata=True,
+        max_workers=MAX_WORKERS, max_per_host=None, first_available=False,
+        transport=None, head_cache=None, segments=1, manifest=True,
+        catalog=None, sources=None
+    ):
+        """
+        Download bands and metadata of many scenes, sharing one work queue:
+        the probes of every scene are queued first, then the files of each
+        scene as soon as its collection is known.
+        returns an OrderedDict of {"name", "path", "type", "size"} dict
+        lists by scene id, in the same order as scenes
+        raises BatchDownloadErrors, with the failures by scene id and the
+        results of the other scenes, when any scene fails
+        params:
+            scenes: list of (scene_id, product_id)
+            max_workers: probes and files requested at once
+            max_per_host: probes and files requested at once to the same
+                host. default: max_workers
+            other params: see download_scene
+        """
+        bands = LandsatDownloader._create_bands_names(bands)
+        options = {
+            'bands': bands,
+            'download_dir': download_dir,
+            'metadata': metadata,
+            'segments': segments,
+            'manifest': manifest
+        }
+
+        order = []
+        results = {}
+        errors = OrderedDict()
+        jobs = OrderedDict()
+
+        with get_default_tracer().span('batch', scenes=len(scenes)), \
+                Scheduler(max_workers, max_per_host) as scheduler:
+            for scene_id, product_id in scenes:
+                if scene_id in order:
+                    continue
+                order.append(scene_id)
+
+                try:
+                    if catalog is not None:
+                        imgs = catalog.get_scene_files(
+                            scene_id, product_id,
+                            bands + ['MTL'] if metadata else bands,
+                            download_dir=download_dir or DOWNLOAD_DIR)
+                        if imgs is not None:
+                            results[scene_id] = imgs
+                            continue
+
+                    scene = SceneInfo(scene_id=scene_id, product_id=product_id)
+                    scene_downloader = Downloader(
+                        scene, transport=transport, head_cache=head_cache,
+                        probe=False, sources=sources)
+                    jobs[scene_id] = (
+                        scene, scene_downloader,
+                        scene_downloader.submit_probes(scheduler))
+                except Exception as exc:
+                    errors[scene_id] = exc
+
+            for scene_id, (scene, scene_downloader, probes) in \
+                    list(jobs.items()):
+                try:
+                    scene_downloader.resolve_probes(probes, first_available)
+                    jobs[scene_id] = (
+                        scene, scene_downloader,
+                        scene_downloader.downloader.submit_download(
+                            scheduler, **options))
+                except Exception as exc:
+                    errors[scene_id] = exc
+                    del jobs[scene_id]
+
+            for scene_id, (scene, scene_downloader, files) in jobs.items():
+                try:
+                    imgs = [future.result() for future in files]
+                except Exception as exc:
+                    errors[scene_id] = exc
+                    continue
+
+                if catalog is not None:
+                    catalog.add(
+                        scene, scene_downloader.downloader.considered_id, imgs)
+                results[scene_id] = imgs
+
+        results = OrderedDict(
+            (scene_id, results[scene_id])
+            for scene_id in order if scene_id in results)
+
+        if errors:
+            raise BatchDownloadErrors(errors, results)
+
+        return results
+
+    @staticmethod
+    async def download_scene_async(
+        bands, scene_id=False, product_id=False,
+        download_dir=None, metadata=True, first_available=False,
+        transport=None, head_cache=None, manifest=True, catalog=None
+    ):
+        """
+        asyncio counterpart of download_scene: probes and downloads run on
+        the event loop through an AsyncHTTPTransport, which bounds how many
+        requests are in flight. A temporary transport is used when none is
+        given. Files are never split in segments.
+        """
+
+        if scene_id and product_id:
+            bands = LandsatDownloader._create_bands_names(bands)
+
+            if catalog is not None:
+                imgs = catalog.get_scene_files(
+                    scene_id, product_id,
+                    bands + ['MTL'] if metadata else bands,
+                    download_dir=download_dir or DOWNLOAD_DIR)
+                if imgs is not None:
+                    return imgs
+
             scene = SceneInfo(scene_id=scene_id, product_id=product_id)
-            scene_downloader = Downloader(scene)
-            imgs = scene_downloader.download(
-                bands=bands,
-                download_dir=download_dir,
-                metadata=metadata
-            )
+            scene_downloader = Downloader(
+                scene, head_cache=head_cache, probe=False)
+
+            async with get_async_transport(transport) as transport:
+                await scene_downloader.resolve_async(
+                    first_available=first_available, transport=transport)
+                imgs = await scene_downloader.download_async(
+                    bands=bands,
+                    download_dir=download_dir,
+                    metadata=metadata,
+                    manifest=manifest,
+                    transport=transport
+                )
+
+            if catalog is not None:
+                catalog.add(
+                    scene, scene_downloader.downloader.considered_id, imgs)
             return imgs
 
         raise ValueError('Expected scene id and product id')
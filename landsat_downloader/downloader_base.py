@@ -1,16 +1,30 @@
 # -*- coding: utf-8 -*-
 import os
-import requests
+import time
+import asyncio
 import logging
 
-from homura import download as fetch
+from collections import OrderedDict
 
+from .async_transport import TRANSIENT_ERRORS as ASYNC_TRANSIENT_ERRORS
+from .async_transport import get_async_transport
+from .cache import head_url, make_head_result
 from .exceptions import (
-    InvalidBandError, RemoteFileDoesntExist, DownloaderErrors
+    ChecksumMismatchError, InvalidBandError, RemoteFileDoesntExist,
+    DownloaderErrors, TransientError, is_transient
 )
+from .files import DownloadedFile
+from .manifest import Manifest, etag_matches, hash_file, new_hashers
+from .metrics import get_default_metrics
 from .scene_info import SceneInfo
+from .scheduler import Scheduler, get_host
+from .sources import SceneLocation
+from .tiff import MAX_GAP, TiffLayout, read_window
+from .tracing import get_current_span, get_default_tracer
+from .transport import get_default_transport
 
 DOWNLOAD_DIR = os.path.join(os.path.expanduser('~'), 'landsat')
+MAX_WORKERS = 8
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +32,13 @@ logger = logging.getLogger(__name__)
 class DownloaderBase:
     """Base class to download Landsat imagery from AWS or Google servers."""
 
-    def __init__(self, scene_info):
+    def __init__(self, scene_info, transport=None, head_cache=None):
         if not isinstance(scene_info, SceneInfo):
             raise TypeError('scene_info must be a instance of SceneInfo')
 
         self.scene_info = scene_info
+        self.transport = transport or get_default_transport()
+        self.head_cache = head_cache
 
     def check_create_folder(self, folder_path):
         """Check whether a folder exists, if not the folder is created.
@@ -33,48 +49,216 @@ class DownloaderBase:
 
         return folder_path
 
-    def fetch(self, url, path, filename):
+    def fetch(self, url, path, filename, segments=1, manifest=None):
         """Verify if the file is already downloaded and complete. If they don't
-        exists or if are not complete, use homura download function to fetch
-        files. Return a list with the path of the downloaded file and the size
-        of the remote file.
+        exists or if are not complete, stream them through the transport,
+        resuming interrupted transfers. Return a list with the path of the
+        downloaded file and the size of the remote file.
+        With segments other than 1 the file is downloaded as parallel byte
+        ranges, None picks the number of segments from the file size.
+
+        With a Manifest, files it lists are trusted without asking the
+        server, and new files are hashed while downloaded, checked against
+        the remote ETag and added to it.
+        """
+        with self._trace('fetch', filename, url=url):
+            return self._fetch(url, path, filename, segments, manifest)
+
+    def _fetch(self, url, path, filename, segments, manifest):
+        logger.info('Downloading file: {}'.format(filename))
+
+        file_path = os.path.join(path, filename)
+        values = self._get_listed_file(filename, file_path, manifest)
+        if values is not None:
+            return values
+
+        head = self.head(url)
+        values = self._get_existing_file(
+            url, filename, file_path, head, manifest)
+        if values is not None:
+            return values
+
+        hashers = new_hashers() if manifest is not None else {}
+        started = time.monotonic()
+        size = self.transport.download(
+            url, file_path, size=head.size, segments=segments,
+            hashers=list(hashers.values()),
+            verify=self._get_verifier(filename, head, hashers))
+        self._record_download(
+            filename, get_host(url), size, time.monotonic() - started)
+        logger.info('{} stored at {}'.format(filename, path))
+
+        return self._add_downloaded_file(
+            url, filename, file_path, size, head, hashers, manifest)
+
+    async def fetch_async(self, url, path, filename, transport, manifest=None):
+        """asyncio counterpart of fetch, downloading through an
+        AsyncHTTPTransport. Files are never split in segments.
         """
-        print('\nDownloading file:\t{}'.format(filename))
+        logger.info('Downloading file: {}'.format(filename))
 
-        remote_file_size = self.get_remote_file_size(url)
         file_path = os.path.join(path, filename)
+        values = self._get_listed_file(filename, file_path, manifest)
+        if values is not None:
+            return values
+
+        head = await self.head_async(url, transport)
+        # hashing a file on disk would block the event loop
+        values = await asyncio.get_event_loop().run_in_executor(
+            None, get_default_tracer().wrap(self._get_existing_file),
+            url, filename, file_path, head, manifest)
+        if values is not None:
+            return values
 
-        if os.path.exists(os.path.join(path, filename)):
+        hashers = new_hashers() if manifest is not None else {}
+        started = time.monotonic()
+        size = await transport.download(
+            url, file_path, hashers=list(hashers.values()),
+            verify=self._get_verifier(filename, head, hashers))
+        self._record_download(
+            filename, get_host(url), size, time.monotonic() - started)
+        logger.info('{} stored at {}'.format(filename, path))
+
+        return self._add_downloaded_file(
+            url, filename, file_path, size, head, hashers, manifest)
+
+    def _get_listed_file(self, filename, file_path, manifest):
+        """File values when the manifest lists it as complete."""
+        if manifest is not None and manifest.is_complete(filename):
+            self._record_skip(filename, 'manifest')
+            return self._get_file_values(
+                filename, file_path, manifest.get(filename)['size'])
+
+    def _get_existing_file(self, url, filename, file_path, head, manifest):
+        """File values when it is on disk with the remote size and, with
+        a manifest, an MD5 not contradicting the remote ETag. Otherwise
+        None, the file being downloaded again.
+        """
+        if os.path.exists(file_path):
             size = os.path.getsize(file_path)
-            if size == remote_file_size:
-                print('File already exists')
-                values = {
-                    "name": filename,
-                    "path": file_path,
-                    "type": filename.split("_")[-1].split(".")[0],
-                    "size": size
-                }
-                return values
-
-        fetch(url, path)
-        print('stored at {}'.format(path))
-        values = {
+            if size == head.size:
+                if manifest is not None:
+                    hashes = hash_file(file_path)
+                    if etag_matches(head.etag, hashes['md5']) is False:
+                        logger.warning(
+                            '{} MD5 {} does not match ETag {}, downloading '
+                            'it again'.format(
+                                filename, hashes['md5'], head.etag))
+                        return None
+                    manifest.add(filename, size, hashes, head.etag, url)
+                self._record_skip(filename, 'present')
+                return self._get_file_values(filename, file_path, size)
+
+    def _trace(self, name, filename, **attributes):
+        """Span of a phase of the download of filename, see tracing."""
+        return get_default_tracer().span(
+            name, scene_id=getattr(self, 'considered_id', None),
+            band=filename.split("_")[-1].split(".")[0], filename=filename,
+            **attributes)
+
+    def _record_skip(self, filename, reason):
+        """Report a file not downloaded: listed in the manifest or
+        already on disk.
+        """
+        logger.info('{} already exists'.format(filename))
+        span = get_current_span()
+        if span is not None:
+            span.set_attribute('skipped', reason)
+        metrics = get_default_metrics()
+        metrics.increment('landsat_files_skipped_total', reason=reason)
+        metrics.event('file_skipped', filename=filename, reason=reason)
+
+    def _record_download(self, filename, source, size, seconds):
+        """Report a file of size bytes downloaded from source."""
+        metrics = get_default_metrics()
+        metrics.increment('landsat_files_downloaded_total', source=source)
+        metrics.observe('landsat_get_seconds', seconds, source=source)
+        if seconds > 0:
+            metrics.observe(
+                'landsat_get_bytes_per_second', size / seconds, source=source)
+        metrics.event(
+            'file_downloaded', filename=filename, source=source, size=size,
+            seconds=seconds)
+
+    def _get_verifier(self, filename, head, hashers):
+        """Function checking the MD5 in hashers against the remote ETag
+        before the downloaded file replaces filename, see
+        HTTPTransport.download. None without hashers.
+        Raises ChecksumMismatchError when they don't match.
+        """
+        if not hashers:
+            return None
+
+        def verify(part_path):
+            md5 = hashers['md5'].hexdigest()
+            if etag_matches(head.etag, md5) is False:
+                raise ChecksumMismatchError(
+                    '{} MD5 {} does not match ETag {}'.format(
+                        filename, md5, head.etag))
+
+        return verify
+
+    def _add_downloaded_file(
+        self, url, filename, file_path, size, head, hashers, manifest
+    ):
+        """Add a downloaded file, checked by _get_verifier, to the
+        manifest. Returns the file values.
+        """
+        if manifest is not None:
+            hashes = OrderedDict(
+                (name, hasher.hexdigest()) for name, hasher in hashers.items())
+            manifest.add(filename, size, hashes, head.etag, url)
+
+        return self._get_file_values(filename, file_path, head.size)
+
+    def _get_file_values(self, filename, file_path, size):
+        return DownloadedFile({
             "name": filename,
             "path": file_path,
             "type": filename.split("_")[-1].split(".")[0],
-            "size": remote_file_size
-        }
+            "size": size
+        })
 
-        return values
+    def head(self, url):
+        """HEAD url, answered from head_cache when it is set and the url
+        was checked recently. Returns a HeadResult.
+        Raises TransientError when the server couldn't tell whether the
+        file exists, e.g. on a timeout or a 503 answer once retries are
+        exhausted.
+        """
+        return head_url(self.transport, url, self.head_cache)
+
+    async def head_async(self, url, transport):
+        """asyncio counterpart of head, through an AsyncHTTPTransport."""
+        result = self._get_cached_head(url)
+        if result is None:
+            started = time.monotonic()
+            try:
+                response = await transport.head(url)
+            except ASYNC_TRANSIENT_ERRORS as exc:
+                raise TransientError('{}: {}'.format(url, exc)) from exc
+            get_default_metrics().observe(
+                'landsat_head_seconds', time.monotonic() - started,
+                host=get_host(url))
+            result = self._set_head(
+                url, response.status_code, response.headers)
+        return result
+
+    def _get_cached_head(self, url):
+        if self.head_cache is not None:
+            return self.head_cache.get(url)
+
+    def _set_head(self, url, status_code, headers):
+        """Build the HeadResult of a response, see make_head_result."""
+        return make_head_result(url, status_code, headers, self.head_cache)
 
     def remote_file_exists(self, url):
         """Check whether the remote file exists on Storage"""
-        return requests.head(url).status_code == 200
+        return self.head(url).exists
 
     def get_remote_file_size(self, url):
         """Gets the filesize of a remote file """
-        headers = requests.head(url).headers
-        return int(headers['content-length'])
+        return self.head(url).size
 
     def _get_valid_bands(self):
         bands = ["B{}".format(i) for i in range(1, 12)]
@@ -98,16 +282,27 @@ class AWSDownloaderBase(DownloaderBase):
 
     __remote_file_ext = 'TIF'
 
-    def __init__(self, scene_info, considered_id, url):
+    def __init__(
+        self, scene_info, considered_id, url, transport=None, head_cache=None,
+        check=True
+    ):
         self.scene_info = scene_info
+        self.transport = transport or get_default_transport()
+        self.head_cache = head_cache
         self.considered_id = considered_id
+        self._tiff_layouts = {}
         self.base_url = os.path.join(
             url,
             '{0:03d}'.format(scene_info.path),
             '{0:03d}'.format(scene_info.row),
             considered_id
         )
-        self.check_remote_file()
+        if check:
+            self.check_remote_file()
+
+    @property
+    def host(self):
+        return get_host(self.base_url)
 
     def check_remote_file(self):
         if not self.remote_file_exists():
@@ -115,47 +310,169 @@ class AWSDownloaderBase(DownloaderBase):
                 self.considered_id)
             raise RemoteFileDoesntExist(msg)
 
+    async def check_remote_file_async(self, transport):
+        """asyncio counterpart of check_remote_file. Returns self."""
+        if not await self.remote_file_exists_async(transport):
+            msg = '{} is not available on AWS Storage'.format(
+                self.considered_id)
+            raise RemoteFileDoesntExist(msg)
+        return self
+
     def remote_file_exists(self):
         """Verify whether the file (scene) exists on AWS Storage."""
         url = os.path.join(self.base_url, 'index.html')
-        print(url)
+        logger.debug('probing {}'.format(url))
         return super(AWSDownloaderBase, self).remote_file_exists(url)
 
-    def download(self, bands=[], download_dir=None, metadata=True):
-        """Download each specified band and metadata."""
-        super(AWSDownloaderBase, self).validate_bands(bands)
+    async def remote_file_exists_async(self, transport):
+        """asyncio counterpart of remote_file_exists."""
+        url = os.path.join(self.base_url, 'index.html')
+        logger.debug('probing {}'.format(url))
+        return (await self.head_async(url, transport)).exists
+
+    def _get_filenames(self, bands, metadata):
+        """Names of the band files and of the metadata file."""
+        filenames = ['{id}_{band}.{extension}'.format(
+            id=self.considered_id,
+            band=band,
+            extension=self.__remote_file_ext
+        ) for band in bands]
+
+        if metadata:
+            filenames.append('{}_MTL.txt'.format(self.considered_id))
+
+        return filenames
+
+    def download(
+        self, bands=[], download_dir=None, metadata=True,
+        max_workers=MAX_WORKERS, segments=1, manifest=True
+    ):
+        """Download each specified band and metadata.
+        Files are fetched concurrently by up to max_workers threads and
+        returned in the same order as requested, metadata last.
+        Each file can also be split in parallel segments, see fetch.
+        With manifest, sizes and hashes are kept in a manifest.json in the
+        scene folder and trusted on later downloads.
+        """
+        if not max_workers or max_workers < 1:
+            max_workers = 1
+
+        with Scheduler(max_workers=max_workers) as scheduler:
+            futures = self.submit_download(
+                scheduler, bands, download_dir, metadata, segments, manifest)
+            downloaded = [future.result() for future in futures]
+
+        return downloaded
+
+    def submit_download(
+        self, scheduler, bands=[], download_dir=None, metadata=True,
+        segments=1, manifest=True
+    ):
+        """Queue the download of each band and metadata on a Scheduler,
+        see download. Returns a Future for each file, in the same order.
+        """
+        dest_dir, scene_manifest = self._prepare_download(
+            bands, download_dir, manifest)
+
+        return [
+            scheduler.submit(
+                self.host,
+                self.fetch,
+                os.path.join(self.base_url, filename),
+                dest_dir,
+                filename,
+                segments,
+                scene_manifest
+            ) for filename in self._get_filenames(bands, metadata)
+        ]
+
+    def _prepare_download(self, bands, download_dir, manifest):
+        """Validate bands and create the scene folder.
+        Returns the folder and its Manifest, None without manifest.
+        """
+        self.validate_bands(bands)
 
         if not download_dir:
             download_dir = DOWNLOAD_DIR
 
         dest_dir = self.check_create_folder(
             os.path.join(download_dir, self.considered_id))
+        return dest_dir, Manifest(dest_dir) if manifest else None
 
-        downloaded = []
-        if len(bands) > 0:
-            for band in bands:
-                filename = '{id}_{band}.{extension}'.format(
-                    id=self.considered_id,
-                    band=band,
-                    extension=self.__remote_file_ext
-                )
-                band_url = os.path.join(self.base_url, filename)
-                downloaded.append(self.fetch(band_url, dest_dir, filename))
+    def _get_range_reader(self, filename):
+        """Function reading (offset, size) bytes of a remote file."""
+        url = os.path.join(self.base_url, filename)
+        return lambda offset, size: self.transport.get_range(
+            url, offset, size)
 
-        if metadata:
-            filename = '{}_MTL.txt'.format(self.considered_id)
-            url = os.path.join(self.base_url, filename)
-            downloaded.append(self.fetch(url, dest_dir, filename))
+    def _get_tiff_layout(self, band):
+        """Range reader and TiffLayout of the remote file of band, the
+        layout read with range requests once per downloader.
+        """
+        self.validate_bands([band])
+        read = self._get_range_reader(self._get_filenames([band], False)[0])
 
-        return downloaded
+        if band not in self._tiff_layouts:
+            self._tiff_layouts[band] = TiffLayout(read)
+        return read, self._tiff_layouts[band]
+
+    def read_window(
+        self, band, pixel_window, max_gap=MAX_GAP, max_workers=MAX_WORKERS
+    ):
+        """Read a window of band without downloading the whole file.
+        Only the TIFF header and the tiles or strips covering the window
+        are requested, with the ranges of nearby blocks joined.
+
+        Params:
+            - band: e.g. 'B4'
+            - pixel_window: ((row_start, row_stop), (col_start, col_stop))
+              in pixels, stops excluded
+            - max_gap: blocks closer than this many bytes are requested at
+              once
+            - max_workers: max range requests at once
+
+        Returns:
+            A 2D NumPy array with the pixels of the window
+        """
+        read, layout = self._get_tiff_layout(band)
+        return read_window(read, layout, pixel_window, max_gap, max_workers)
+
+    async def download_async(
+        self, bands=[], download_dir=None, metadata=True, manifest=True,
+        transport=None
+    ):
+        """asyncio counterpart of download. Every file is scheduled at once
+        on the event loop, the AsyncHTTPTransport bounds how many are in
+        flight. A temporary transport is used when none is given.
+        """
+        dest_dir, scene_manifest = self._prepare_download(
+            bands, download_dir, manifest)
+
+        async with get_async_transport(transport) as transport:
+            downloaded = await asyncio.gather(*[
+                self.fetch_async(
+                    os.path.join(self.base_url, filename),
+                    dest_dir,
+                    filename,
+                    transport,
+                    scene_manifest
+                ) for filename in self._get_filenames(bands, metadata)
+            ])
+
+        return list(downloaded)
 
 
 class AWSDownloaderCollection1Tiers(AWSDownloaderBase):
     """docstring for AWSDownloaderCollection1."""
 
-    def __init__(self, scene_info):
-        url = 'https://s3-us-west-2.amazonaws.com/landsat-pds/c1/L8/'
-        super().__init__(scene_info.product_info, scene_info.product_id, url)
+    url = 'https://s3-us-west-2.amazonaws.com/landsat-pds/c1/L8/'
+
+    def __init__(
+        self, scene_info, transport=None, head_cache=None, check=True
+    ):
+        super().__init__(
+            scene_info.product_info, scene_info.product_id, self.url,
+            transport=transport, head_cache=head_cache, check=check)
 
     def __repr__(self):
         return "AWS - T1/T2: Scene {}".format(self.considered_id)
@@ -164,9 +481,15 @@ class AWSDownloaderCollection1Tiers(AWSDownloaderBase):
 class AWSDownloaderCollection1RT(AWSDownloaderBase):
     """docstring for AWSDownloaderCollection1."""
 
-    def __init__(self, scene_info):
-        url = 'https://s3-us-west-2.amazonaws.com/landsat-pds/c1/L8/'
-        super().__init__(scene_info.product_info, scene_info.make_rt_product_id(), url)
+    url = 'https://s3-us-west-2.amazonaws.com/landsat-pds/c1/L8/'
+
+    def __init__(
+        self, scene_info, transport=None, head_cache=None, check=True
+    ):
+        super().__init__(
+            scene_info.product_info, scene_info.make_rt_product_id(),
+            self.url, transport=transport, head_cache=head_cache,
+            check=check)
 
     def __repr__(self):
         return "AWS - RT: Scene {}".format(self.considered_id)
@@ -175,54 +498,481 @@ class AWSDownloaderCollection1RT(AWSDownloaderBase):
 class AWSDownloaderPreCollection(AWSDownloaderBase):
     """docstring for AWSDownloaderCollection1."""
 
-    def __init__(self, scene_info):
-        url = 'https://s3-us-west-2.amazonaws.com/landsat-pds/L8/'
-        # url = 'http://landsat-pds.s3.amazonaws.com/L8/'
-        super().__init__(scene_info.id_info, scene_info.scene_id, url)
+    url = 'https://s3-us-west-2.amazonaws.com/landsat-pds/L8/'
+    # url = 'http://landsat-pds.s3.amazonaws.com/L8/'
+
+    def __init__(
+        self, scene_info, transport=None, head_cache=None, check=True
+    ):
+        super().__init__(
+            scene_info.id_info, scene_info.scene_id, self.url,
+            transport=transport, head_cache=head_cache, check=check)
 
     def __repr__(self):
         return "AWS - Pre-Collection: Scene {}".format(self.considered_id)
 
 
+class MirrorDownloader(AWSDownloaderBase):
+    """
+    Download a scene of a collection from the sources of a
+    SourceRegistry, e.g. AWS, GCS, an on-premises mirror or a local
+    folder. Each file goes to the fastest healthy source and fails over
+    to the next one on transient errors, missing files or checksum
+    mismatches; latency and throughput of every transfer are recorded in
+    the registry.
+
+    Params:
+        - scene_info: Product or Identifier of the scene
+        - collection: 'rt', 't1' or 'pre'
+        - considered_id: id of the scene in the collection
+        - sources: SourceRegistry
+    """
+
+    def __init__(
+        self, scene_info, collection, considered_id, sources, check=True
+    ):
+        self.scene_info = scene_info
+        self.considered_id = considered_id
+        self.sources = sources
+        self.head_cache = None
+        self.scene = SceneLocation(
+            collection, considered_id, scene_info.path, scene_info.row)
+        self._tiff_layouts = {}
+        if check:
+            self.check_remote_file()
+
+    def __repr__(self):
+        return "Mirrors - {}: Scene {}".format(
+            self.scene.collection, self.considered_id)
+
+    @property
+    def host(self):
+        """Host of the lowest latency source, the sizes of the files
+        being unknown until they are fetched.
+        """
+        ranked = self.sources.rank(self.scene.collection, size=0)
+        return ranked[0].host if ranked else None
+
+    def remote_file_exists(self):
+        """Whether a source has the scene, asked fastest first."""
+        return self.sources.probe(self.scene) is not None
+
+    def submit_download(
+        self, scheduler, bands=[], download_dir=None, metadata=True,
+        segments=1, manifest=True
+    ):
+        """Queue the download of each band and metadata on a Scheduler,
+        see AWSDownloaderBase.download.
+        """
+        dest_dir, scene_manifest = self._prepare_download(
+            bands, download_dir, manifest)
+
+        return [
+            scheduler.submit(
+                self.host, self.fetch_file, filename, dest_dir, segments,
+                scene_manifest
+            ) for filename in self._get_filenames(bands, metadata)
+        ]
+
+    def fetch_file(self, filename, path, segments=1, manifest=None):
+        """Fetch filename into path from the fastest source having it,
+        see DownloaderBase.fetch. Returns the file values.
+        """
+        with self._trace('fetch', filename):
+            return self._fetch_file(filename, path, segments, manifest)
+
+    def _fetch_file(self, filename, path, segments, manifest):
+        file_path = os.path.join(path, filename)
+        values = self._get_listed_file(filename, file_path, manifest)
+        if values is not None:
+            return values
+
+        errors = []
+        heads = {}
+        for source in self._rank_for_file(filename, heads, errors):
+            try:
+                return self._fetch_from(
+                    source, filename, file_path, segments, manifest,
+                    heads.get(source.name))
+            except Exception as exc:
+                self._add_source_error(source, exc, errors)
+
+        if not errors:
+            raise RemoteFileDoesntExist(
+                'no source has the {} collection'.format(
+                    self.scene.collection))
+        raise errors[-1]
+
+    def _rank_for_file(self, filename, heads, errors):
+        """Sources to fetch filename from, ranked for its size. The size
+        is given by a HEAD of the sources, lowest latency first, until one
+        has the file; the sources asked before are left out. The HEADs are
+        kept in heads by source name, the errors added to errors.
+        """
+        ranked = self.sources.rank(self.scene.collection, size=0)
+        for i, source in enumerate(ranked):
+            try:
+                head = self._head_from(source, filename)
+            except Exception as exc:
+                self._add_source_error(source, exc, errors)
+                continue
+
+            heads[source.name] = head
+            remaining = ranked[i:]
+            return [
+                other for other in self.sources.rank(
+                    self.scene.collection, head.size)
+                if other in remaining]
+        return []
+
+    def _add_source_error(self, source, error, errors):
+        """Add an error of source to errors, recording a failure unless
+        the source hasn't the file. Raises the errors not worth trying
+        another source for.
+        """
+        if not is_transient(error) and not isinstance(
+                error, (RemoteFileDoesntExist, ChecksumMismatchError)):
+            raise error
+        if not isinstance(error, RemoteFileDoesntExist):
+            self.sources.record_failure(source, error)
+        errors.append(error)
+
+    def _head_from(self, source, filename):
+        """HeadResult of filename on source, raises RemoteFileDoesntExist
+        when the source hasn't it.
+        """
+        started = time.monotonic()
+        head = source.head(self.scene, filename)
+        self.sources.record_latency(source, time.monotonic() - started)
+        if not head.exists:
+            raise RemoteFileDoesntExist(
+                '{} is not available on {}'.format(filename, source.name))
+        return head
+
+    def _fetch_from(
+        self, source, filename, file_path, segments, manifest, head=None
+    ):
+        with self._trace('fetch.source', filename, source=source.name):
+            return self._fetch_from_source(
+                source, filename, file_path, segments, manifest, head)
+
+    def _fetch_from_source(
+        self, source, filename, file_path, segments, manifest, head=None
+    ):
+        if head is None:
+            head = self._head_from(source, filename)
+
+        location = source.get_location(self.scene, filename)
+        values = self._get_existing_file(
+            location, filename, file_path, head, manifest)
+        if values is not None:
+            return values
+
+        hashers = new_hashers() if manifest is not None else {}
+        started = time.monotonic()
+        size = source.fetch(
+            self.scene, filename, file_path, size=head.size,
+            segments=segments, hashers=list(hashers.values()),
+            verify=self._get_verifier(filename, head, hashers))
+        seconds = time.monotonic() - started
+        self.sources.record_transfer(source, size, seconds)
+        self._record_download(filename, source.name, size, seconds)
+
+        return self._add_downloaded_file(
+            location, filename, file_path, size, head, hashers, manifest)
+
+    def _get_range_reader(self, filename):
+        # the ranges read are small, the lowest latency source is best
+        ranked = self.sources.rank(self.scene.collection, size=0)
+        if not ranked:
+            raise RemoteFileDoesntExist(
+                'no source has the {} collection'.format(
+                    self.scene.collection))
+        source = ranked[0]
+        return lambda offset, size: source.read_range(
+            self.scene, filename, offset, size)
+
+
 class Downloader:
     """
     Class that calls
-        AWSDownloaderCollection1
-        GoogleDownloader
+        AWSDownloaderCollection1RT
+        AWSDownloaderCollection1Tiers
+        AWSDownloaderPreCollection
+    or, given a SourceRegistry, MirrorDownloader
     to download Landsat imagery.
     """
 
-    def __init__(self, scene_info=False):
+    def __init__(
+        self, scene_info=False, first_available=False, transport=None,
+        head_cache=None, probe=True, sources=None
+    ):
+        """Probe every candidate collection concurrently and keep the
+        downloader of the highest priority one available, i.e.
+        Real-Time, then T1/T2, then Pre-Collection.
+
+        With first_available the lower priority probes are abandoned as
+        soon as the highest priority available collection answers, and
+        their availability flags are left as None.
+
+        A transport shared by every probe and download can be given,
+        otherwise the default one is used. With a head_cache, probes and
+        remote sizes checked recently are not requested again.
+
+        With probe=False nothing is requested until resolve or
+        resolve_async is called.
+
+        With a SourceRegistry as sources, collections are probed and
+        files fetched from its mirrors instead of the AWS downloaders,
+        see MirrorDownloader. resolve_async and download_async raise
+        ValueError then.
+        """
         self.downloader = None
         self.scene_info = scene_info
+        self.transport = transport or get_default_transport()
+        self.head_cache = head_cache
+        self.sources = sources
+        self.availability = OrderedDict(
+            (name, None) for name in ('rt', 't1', 'pre'))
+
+        logger.info('Scene {} ({}), path {} row {}, acquired {}'.format(
+            self.scene_info.scene_id, self.scene_info.product_id,
+            self.scene_info.id_info.path, self.scene_info.id_info.row,
+            self.scene_info.id_info.acq_date))
+        get_default_metrics().event(
+            'scene', scene_id=self.scene_info.scene_id,
+            product_id=self.scene_info.product_id,
+            path=self.scene_info.id_info.path,
+            row=self.scene_info.id_info.row,
+            acq_date=self.scene_info.id_info.acq_date)
+
+        if probe:
+            self.resolve(first_available=first_available)
+
+    @property
+    def rt_available(self):
+        return self.availability['rt']
+
+    @property
+    def t1_available(self):
+        return self.availability['t1']
+
+    @property
+    def pre_available(self):
+        return self.availability['pre']
 
+    def _get_probes(self):
+        """Candidate collections ordered by precedence, highest first."""
+        scene_info = self.scene_info
+        return OrderedDict([
+            ('rt', lambda: self._new_downloader('rt', scene_info)),
+            ('t1', lambda: self._new_downloader('t1', scene_info)),
+            ('pre', self.try_pre_collections),
+        ])
 
-        print('\nScene-ID:\t' + str(self.scene_info.scene_id))
-        print('Product-ID:\t' + str(self.scene_info.product_id))
-        print('Path:\t\t' + str(self.scene_info.id_info.path))
-        print('Row:\t\t' + str(self.scene_info.id_info.row))
-        print('Acq. date:\t' + str(self.scene_info.id_info.acq_date))
+    def _new_downloader(self, name, scene_info):
+        """Downloader of the collection name, checked on creation."""
+        if self.sources is not None:
+            info, considered_id = {
+                'rt': (scene_info.product_info,
+                       scene_info.make_rt_product_id()),
+                't1': (scene_info.product_info, scene_info.product_id),
+                'pre': (scene_info.id_info, scene_info.scene_id),
+            }[name]
+            return MirrorDownloader(
+                info, name, considered_id, self.sources)
 
-        self.t1_available = True
-        self.rt_available = True
-        self.pre_available = True
-        
+        downloader_class = {
+            'rt': AWSDownloaderCollection1RT,
+            't1': AWSDownloaderCollection1Tiers,
+            'pre': AWSDownloaderPreCollection,
+        }[name]
+        return downloader_class(
+            scene_info, transport=self.transport, head_cache=self.head_cache)
+
+    def _get_probe_host(self, name):
+        """Host queried first by the probe of the collection name."""
+        if self.sources is not None:
+            ranked = self.sources.rank(name, size=0)
+            return ranked[0].host if ranked else None
+
+        return get_host({
+            'rt': AWSDownloaderCollection1RT.url,
+            't1': AWSDownloaderCollection1Tiers.url,
+            'pre': AWSDownloaderPreCollection.url,
+        }[name])
+
+    def _get_async_probes(self, transport):
+        """Coroutines probing the candidate collections, see _get_probes."""
+        scene_info = self.scene_info
+        options = {
+            'transport': self.transport,
+            'head_cache': self.head_cache,
+            'check': False
+        }
+        return OrderedDict([
+            ('rt', AWSDownloaderCollection1RT(
+                scene_info, **options).check_remote_file_async(transport)),
+            ('t1', AWSDownloaderCollection1Tiers(
+                scene_info, **options).check_remote_file_async(transport)),
+            ('pre', self.try_pre_collections_async(transport)),
+        ])
+
+    def resolve(self, first_available=False):
+        """Run all collection probes at once and set self.downloader and
+        self.availability, an OrderedDict with the availability of each
+        collection: True, False or None when the probe was abandoned or
+        failed for a transient reason.
+        A collection is only chosen when the ones of higher priority are
+        known not to have the scene: a timeout is never taken for a 404.
+        Raises DownloaderErrors, with the error of each failed probe, when
+        no collection can be chosen.
+        """
+        scheduler = Scheduler(max_workers=len(self._get_probes()))
         try:
-            self.downloader = self.try_pre_collections()
-        except Exception as exc:
-            self.pre_available = False
-            pass
+            with get_default_tracer().span(
+                    'resolve', scene_id=self.scene_info.scene_id):
+                return self.resolve_probes(
+                    self.submit_probes(scheduler), first_available)
+        finally:
+            scheduler.shutdown(wait=not first_available)
+
+    def submit_probes(self, scheduler):
+        """Queue all collection probes on a Scheduler.
+        Returns an OrderedDict of Futures, see resolve_probes.
+        """
+        return OrderedDict(
+            (name, scheduler.submit(
+                self._get_probe_host(name), self._measure_probe, name, probe))
+            for name, probe in self._get_probes().items())
+
+    def _measure_probe(self, name, probe):
+        """Run probe, reporting its duration and outcome for the
+        collection name. Returns the downloader found.
+        """
+        started = time.monotonic()
+        outcome = 'error'
+        with get_default_tracer().span(
+                'probe', scene_id=self.scene_info.scene_id,
+                collection=name) as span:
+            try:
+                downloader = probe()
+                outcome = 'available'
+                return downloader
+            except RemoteFileDoesntExist:
+                outcome = 'missing'
+                raise
+            finally:
+                span.set_attribute('outcome', outcome)
+                self._record_probe(name, outcome, time.monotonic() - started)
+
+    async def _measure_probe_async(self, name, probe):
+        """asyncio counterpart of _measure_probe, probe a coroutine."""
+        started = time.monotonic()
+        outcome = 'error'
         try:
-            self.downloader = AWSDownloaderCollection1Tiers(self.scene_info)
-        except Exception as exc:
-            self.t1_available = False
-            pass
+            downloader = await probe
+            outcome = 'available'
+            return downloader
+        except RemoteFileDoesntExist:
+            outcome = 'missing'
+            raise
+        except asyncio.CancelledError:
+            outcome = 'cancelled'
+            raise
+        finally:
+            self._record_probe(name, outcome, time.monotonic() - started)
+
+    def _record_probe(self, name, outcome, seconds):
+        metrics = get_default_metrics()
+        metrics.observe('landsat_probe_seconds', seconds, collection=name)
+        metrics.increment(
+            'landsat_probes_total', collection=name, outcome=outcome)
+
+    def resolve_probes(self, futures, first_available=False):
+        """Set the downloader from the Futures of submit_probes, see
+        resolve. Probes not needed anymore are cancelled.
+        """
+        availability = OrderedDict((name, None) for name in futures)
+        errors = []
+
         try:
-            self.downloader = AWSDownloaderCollection1RT(self.scene_info)
-        except Exception as exc:
-            self.rt_available = False
-            pass
+            for name, future in futures.items():
+                try:
+                    downloader = future.result()
+                except Exception as exc:
+                    self._add_probe_error(name, exc, availability, errors)
+                    continue
+
+                availability[name] = True
+                if self.downloader is None and all(
+                        isinstance(error, RemoteFileDoesntExist)
+                        for error in errors):
+                    self.downloader = downloader
+                    if first_available:
+                        break
+        finally:
+            for future in futures.values():
+                future.cancel()
 
+        return self._set_availability(availability, errors)
+
+    def _add_probe_error(self, name, exc, availability, errors):
+        """Record a failed probe: the collection doesn't have the scene
+        on RemoteFileDoesntExist, otherwise its availability is unknown.
+        """
+        errors.append(exc)
+        if isinstance(exc, RemoteFileDoesntExist):
+            availability[name] = False
+        else:
+            logger.warning('{} probe failed: {}'.format(name, exc))
+
+    def _check_async(self):
+        """Raises ValueError with sources, which the asyncio API doesn't
+        download from.
+        """
+        if self.sources is not None:
+            raise ValueError(
+                'the asyncio API downloads from AWS only, not from sources')
+
+    async def resolve_async(self, first_available=False, transport=None):
+        """asyncio counterpart of resolve, probing through an
+        AsyncHTTPTransport. A temporary transport is used when none is
+        given.
+        """
+        self._check_async()
+        async with get_async_transport(transport) as transport:
+            tasks = OrderedDict(
+                (name, asyncio.ensure_future(
+                    self._measure_probe_async(name, probe)))
+                for name, probe in self._get_async_probes(transport).items())
+            availability = OrderedDict((name, None) for name in tasks)
+            errors = []
+
+            try:
+                for name, task in tasks.items():
+                    try:
+                        downloader = await task
+                    except Exception as exc:
+                        self._add_probe_error(name, exc, availability, errors)
+                        continue
+
+                    availability[name] = True
+                    if self.downloader is None and all(
+                            isinstance(error, RemoteFileDoesntExist)
+                            for error in errors):
+                        self.downloader = downloader
+                        if first_available:
+                            break
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        return self._set_availability(availability, errors)
+
+    def _set_availability(self, availability, errors=()):
+        self.availability = availability
 
         t1_t2_msg = 'scene is available on AWS:\t{}\t({})'.format(
             self.t1_available, self.scene_info.product_id)
@@ -231,12 +981,22 @@ class Downloader:
         pre_msg = 'scene is available on AWS:\t{}\t({})'.format(
             self.pre_available, self.scene_info.scene_id)
 
-        print('\nT1/T2\t\t{}'.format(t1_t2_msg))
-        print('Real-Time\t{}'.format(rt_msg))
-        print('Pre Collection\t{}'.format(pre_msg))
+        logger.info('T1/T2 {}'.format(t1_t2_msg))
+        logger.info('Real-Time {}'.format(rt_msg))
+        logger.info('Pre Collection {}'.format(pre_msg))
+        get_default_metrics().event(
+            'availability', scene_id=self.scene_info.scene_id,
+            downloader=repr(self.downloader), **availability)
 
         if self.downloader is None:
-            raise DownloaderErrors([])
+            raise DownloaderErrors(
+                list(errors), '{}: no collection available{}'.format(
+                    self.scene_info.scene_id,
+                    '' if all(isinstance(error, RemoteFileDoesntExist)
+                              for error in errors)
+                    else ', some probes failed and may be tried again'))
+
+        return availability
 
     def __replace_version_name(self, scene_id, idx, from_str, to_str='00'):
         """Returns a replace of pre collection version"""
@@ -247,7 +1007,7 @@ class Downloader:
         scene_id = self.scene_info.scene_id
 
         try:
-            downloader = AWSDownloaderPreCollection(self.scene_info)
+            downloader = self._new_downloader('pre', self.scene_info)
         except RemoteFileDoesntExist as exc:
             try:
                 if self.scene_info.id_info.version:
@@ -260,7 +1020,9 @@ class Downloader:
                         scene_id=scene_id, 
                         product_id=self.scene_info.product_id)
                 
-                downloader = AWSDownloaderPreCollection(self.scene_info)
+                with get_default_tracer().span(
+                        'probe.pre_version', scene_id=scene_id):
+                    downloader = self._new_downloader('pre', self.scene_info)
 
             except RemoteFileDoesntExist as e:
                 raise e
@@ -269,6 +1031,41 @@ class Downloader:
 
         return downloader
 
+    async def try_pre_collections_async(self, transport):
+        """asyncio counterpart of try_pre_collections"""
+        options = {
+            'transport': self.transport,
+            'head_cache': self.head_cache,
+            'check': False
+        }
+
+        try:
+            return await AWSDownloaderPreCollection(
+                self.scene_info, **options).check_remote_file_async(transport)
+        except RemoteFileDoesntExist:
+            if self.scene_info.id_info.version:
+                scene_id = self.__replace_version_name(
+                    scene_id=self.scene_info.scene_id, idx=19,
+                    from_str=self.scene_info.id_info.version)
+
+                self.scene_info = SceneInfo(
+                    scene_id=scene_id,
+                    product_id=self.scene_info.product_id)
+
+            return await AWSDownloaderPreCollection(
+                self.scene_info, **options).check_remote_file_async(transport)
+
     def download(self, *args, **kwargs):
-        print("\nUsing {}".format(self.downloader))
-        return self.downloader.download(*args, **kwargs)
+        logger.info("Using {}".format(self.downloader))
+        with get_default_tracer().span(
+                'download', scene_id=self.downloader.considered_id,
+                downloader=repr(self.downloader)):
+            return self.downloader.download(*args, **kwargs)
+
+    async def download_async(self, *args, **kwargs):
+        self._check_async()
+        logger.info("Using {}".format(self.downloader))
+        return await self.downloader.download_async(*args, **kwargs)
+
+    def read_window(self, *args, **kwargs):
+        return self.downloader.read_window(*args, **kwargs)
@@ -1,4 +1,16 @@
 # -*- coding: utf-8 -*-
+import asyncio
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+# answers that may change when asked again: timeouts, throttling and
+# server errors
+RETRY_STATUS = (408, 429, 500, 502, 503, 504)
 
 
 class DownloaderErrors(Exception):
@@ -6,6 +18,33 @@ class DownloaderErrors(Exception):
         super(DownloaderErrors, self).__init__(*args, **kwargs)
         self.errors = errors
 
+    @property
+    def transient(self):
+        """Whether any of the errors may go away when tried again."""
+        errors = self.errors.values() if isinstance(self.errors, dict) \
+            else self.errors
+        return any(is_transient(error) for error in errors)
+
+
+class BatchDownloadErrors(DownloaderErrors):
+    """Scenes of a batch that failed, by scene id, in errors. The scenes
+    downloaded are kept in results.
+    """
+
+    def __init__(self, errors, results=None, *args, **kwargs):
+        if not args:
+            args = ('{} scene(s) failed: {}'.format(
+                len(errors), ', '.join(errors)),)
+        super(BatchDownloadErrors, self).__init__(errors, *args, **kwargs)
+        self.results = results
+
+    def get_transient(self):
+        """Ids of the scenes that failed for a reason that may go away,
+        worth trying again later. The others won't succeed as they are.
+        """
+        return [scene_id for scene_id, error in self.errors.items()
+                if is_transient(error)]
+
 
 class WrongSceneNameError(Exception):
     pass
@@ -17,3 +56,57 @@ class RemoteFileDoesntExist(Exception):
 
 class InvalidBandError(Exception):
     pass
+
+
+class IncompleteDownloadError(Exception):
+    pass
+
+
+class ChecksumMismatchError(Exception):
+    pass
+
+
+class MetadataError(Exception):
+    """EarthExplorer answer that can't be read, an HTTP error or a
+    malformed document.
+    """
+    pass
+
+
+class UnsupportedTiffError(Exception):
+    """TIFF file laid out in a way that can't be read partially or
+    mapped, e.g. an unknown compression.
+    """
+    pass
+
+
+class TransientError(Exception):
+    """Remote call that failed for a reason that may go away, e.g. a
+    timeout or a 503 answer, as opposed to a file not on the server.
+    """
+    pass
+
+
+class CircuitOpenError(TransientError):
+    """Call not sent because its endpoint failed too often lately."""
+    pass
+
+
+def is_transient(error):
+    """Whether error may go away when the call is tried again."""
+    if isinstance(error, DownloaderErrors):
+        return error.transient
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and \
+            error.response.status_code in RETRY_STATUS
+    if aiohttp is not None:
+        # errors of the asyncio API
+        if isinstance(error, aiohttp.ClientResponseError):
+            return error.status in RETRY_STATUS
+        if isinstance(error, (
+                aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+            return True
+    return isinstance(error, (
+        TransientError, IncompleteDownloadError, requests.ConnectionError,
+        requests.Timeout, requests.exceptions.ChunkedEncodingError,
+        asyncio.TimeoutError))
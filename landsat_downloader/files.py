@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from .tiff import memmap_tiff
+
+
+class DownloadedFile(dict):
+    """
+    A downloaded file, the {"name", "path", "type", "size"} dict returned
+    by downloads, giving access to its pixels without reading them:
+
+        for band in downloader.download(['B4', 'B5']):
+            red = band.array[1000:2000, 1000:2000]
+
+    array is mapped on first access, see tiff.memmap_tiff for the
+    layouts supported.
+    """
+
+    @property
+    def array(self):
+        """Read-only numpy.memmap of the pixels, mapped once.
+        Raises UnsupportedTiffError when the file can't be mapped.
+        """
+        if not hasattr(self, '_array'):
+            self._array = self.open_array()
+        return self._array
+
+    def open_array(self, mode='r'):
+        """New numpy.memmap of the pixels, see tiff.memmap_tiff."""
+        return memmap_tiff(self['path'], mode=mode)
+
+    def __reduce__(self):
+        # the mapping is not pickled, it is opened again on access
+        return (DownloadedFile, (dict(self),))
@@ -1,7 +1,24 @@
 # -*- coding: utf-8 -*-
+import queue
+import asyncio
 import logging
-import requests
-import xmltodict
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from .async_transport import get_async_transport
+from .exceptions import MetadataError
+from .inventory import iter_metadata
+from .planner import MAX_OVERFETCH, plan_path_row_ranges
+from .table import SceneTable
+from .tracing import get_default_tracer
+from .transport import get_default_transport
+
+MAX_WORKERS = 8
+CHUNK_SIZE = 64 * 1024
+QUEUE_SIZE = 1024
 
 logger = logging.getLogger(__name__)
 
@@ -9,47 +26,183 @@ logger = logging.getLogger(__name__)
 class LandsatFinder:
     """docstring for LandsatFinder"""
 
+    url = "https://earthexplorer.usgs.gov/EE/InventoryStream/pathrow"
+
     @classmethod
     def __get_ee_url(self):
-        url = "https://earthexplorer.usgs.gov/EE/InventoryStream/pathrow"
-        params = "?start_path={path}" + \
-            "&end_path={path}" + \
-            "&start_row={row}" + \
-            "&end_row={row}" + \
+        url = self.url
+        params = "?start_path={start_path}" + \
+            "&end_path={end_path}" + \
+            "&start_row={start_row}" + \
+            "&end_row={end_row}" + \
             "&sensor={sensor}" + \
             "&start_date={start_date}" + \
             "&end_date={end_date}"
 
         return url + params
 
+    @staticmethod
+    def __split_dates(start_date, end_date, window_days=None):
+        """Split start_date..end_date, both included, in windows of
+        window_days days. Returns a list of (start, end) tuples.
+        """
+        if not window_days:
+            return [(start_date, end_date)]
+
+        windows = []
+        step = timedelta(days=window_days)
+        while start_date <= end_date:
+            windows.append(
+                (start_date, min(start_date + step - timedelta(days=1),
+                                 end_date)))
+            start_date += step
+        return windows
+
     @classmethod
-    def __extract_metadata_info(self, response_metadata):
-
-        try:
-            xml = response_metadata.content.decode()
-            metadata_list = xmltodict.parse(xml)
-            metadata_list = metadata_list['searchResponse']['metaData']
-
-            if type(metadata_list) != list:
-                metadata_list = [metadata_list]
-
-            for i, metadata in enumerate(metadata_list):
-                for k, v in metadata.items():
-                    if v.isdigit():
-                        metadata_list[i][k] = int(v)
-                    else:
-                        try:
-                            metadata_list[i][k] = float(v)
-                        except Exception as exc:
-                            metadata_list[i][k] = str(v)
-        except Exception as exc:
-            metadata_list = []
+    def __get_search_urls(
+        self, path_row_list, start_date, end_date, sensor, window_days=None,
+        max_overfetch=MAX_OVERFETCH
+    ):
+        """Query URLs for each range of path_row_list and each date window,
+        in that order.
+        """
+        return [
+            self.__get_ee_url().format(
+                start_path=path_row_range.start_path,
+                end_path=path_row_range.end_path,
+                start_row=path_row_range.start_row,
+                end_row=path_row_range.end_row,
+                sensor=sensor,
+                start_date=window_start.strftime('%Y-%m-%d'),
+                end_date=window_end.strftime('%Y-%m-%d'),
+            )
+            for path_row_range in plan_path_row_ranges(
+                path_row_list, max_overfetch)
+            for window_start, window_end in self.__split_dates(
+                start_date, end_date, window_days)
+        ]
 
-        return metadata_list
+    @staticmethod
+    def __get_tile_order(path_row_list):
+        order = {}
+        for path_row in path_row_list:
+            order.setdefault((int(path_row[0]), int(path_row[1])), len(order))
+        return order
+
+    @staticmethod
+    def __select_metadata(metadata_list, order, seen):
+        """Metadata of the tiles in order, skipping the sceneID in seen as
+        the same scene may be listed by more than one query. Ranges may
+        cover tiles that weren't requested, they are dropped.
+        """
+        for metadata in metadata_list:
+            if (metadata.get('path'), metadata.get('row')) not in order:
+                continue
+            scene_id = metadata.get('sceneID')
+            if scene_id is not None:
+                if scene_id in seen:
+                    continue
+                seen.add(scene_id)
+            yield metadata
+
+    @staticmethod
+    def __sort_metadata(metadata_list, order):
+        """Order metadata_list as the tiles of path_row_list, keeping the
+        order of the queries for the same tile.
+        """
+        return sorted(
+            metadata_list,
+            key=lambda metadata: order[
+                (metadata.get('path'), metadata.get('row'))])
+
+    @staticmethod
+    def __check_status(status_code, url):
+        if status_code != 200:
+            raise MetadataError(
+                '{}: EarthExplorer answered HTTP {}'.format(url, status_code))
+
+    @classmethod
+    def __extract_metadata_info(self, response_metadata, url=None):
+        self.__check_status(response_metadata.status_code, url)
+        return iter_metadata([response_metadata.content], url)
+
+    @classmethod
+    def __stream_metadata(self, transport, url):
+        """Records of url parsed while the answer is downloaded.
+        Traced as finder.query until the headers are received, then
+        finder.parse while the body is downloaded and parsed.
+        """
+        tracer = get_default_tracer()
+        with tracer.span('finder.query', url=url) as span:
+            r = transport.get(url, stream=True)
+            span.set_attribute('status', r.status_code)
+
+        with r:
+            self.__check_status(r.status_code, url)
+            with tracer.span('finder.parse', url=url) as span:
+                records = 0
+                for metadata in iter_metadata(
+                        r.iter_content(CHUNK_SIZE), url):
+                    records += 1
+                    yield metadata
+                span.set_attribute('records', records)
+
+    @classmethod
+    def __iter_queries(self, transport, search_urls, max_workers):
+        """
+        Stream search_urls, up to max_workers at once, yielding their
+        records in the order of search_urls. Each query buffers at most
+        QUEUE_SIZE records ahead of the consumer, and every query stops
+        when the generator is closed.
+        """
+        done = object()
+        stop = threading.Event()
+        queues = [queue.Queue(QUEUE_SIZE) for _ in search_urls]
+
+        def put(records, item):
+            while not stop.is_set():
+                try:
+                    records.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def run(url, records):
+            if stop.is_set():
+                return
+            try:
+                for metadata in self.__stream_metadata(transport, url):
+                    if not put(records, metadata):
+                        return
+                put(records, done)
+            except Exception as exc:
+                put(records, exc)
+
+        with ThreadPoolExecutor(
+                max_workers=max(1, min(max_workers, len(search_urls)))
+        ) as executor:
+            try:
+                run = get_default_tracer().wrap(run)
+                for url, records in zip(search_urls, queues):
+                    executor.submit(run, url, records)
+
+                for records in queues:
+                    while True:
+                        item = records.get()
+                        if item is done:
+                            break
+                        if isinstance(item, Exception):
+                            raise item
+                        yield item
+            finally:
+                stop.set()
 
     @staticmethod
     def search_scenes_metadata(
-        path_row_list, start_date, end_date, sensor="LANDSAT_8_C1"
+        path_row_list, start_date, end_date, sensor="LANDSAT_8_C1",
+        transport=None, max_workers=MAX_WORKERS, window_days=None,
+        max_overfetch=MAX_OVERFETCH, cache=None
     ):
         """
         Search scenes from EarthExplorer for date range and path row list
@@ -60,6 +213,98 @@ class LandsatFinder:
             path_row_list: must be a list of path and row.
                 E.g.: [(50,50),(200,200)]
             sensor: EarthExplorer sensor mode name. default: Landsat_8_C1
+            transport: HTTPTransport used for requests. default: shared one
+            max_workers: max queries sent at once. default: 8
+            window_days: split the date range in queries of this many days,
+                sent in parallel. default: a single query per path and row
+            max_overfetch: extra tiles a query may cover for each requested
+                one, to request blocks of path and row at once. default: 0,
+                only blocks fully requested
+            cache: FinderCache keeping the scenes found, only the dates
+                not searched before are sent to EarthExplorer
+        returns scenes in the order of path_row_list and date, each
+        sceneID only once
+        raises MetadataError when an answer can't be read
+        """
+
+        if cache is not None:
+            return LandsatFinder.__search_cached(
+                path_row_list, start_date, end_date, sensor, transport,
+                max_workers, window_days, max_overfetch, cache)
+
+        metadata_list = LandsatFinder.iter_scenes_metadata(
+            path_row_list, start_date, end_date, sensor=sensor,
+            transport=transport, max_workers=max_workers,
+            window_days=window_days, max_overfetch=max_overfetch)
+
+        return LandsatFinder.__sort_metadata(
+            metadata_list, LandsatFinder.__get_tile_order(path_row_list))
+
+    @classmethod
+    def __search_cached(
+        self, path_row_list, start_date, end_date, sensor, transport,
+        max_workers, window_days, max_overfetch, cache
+    ):
+        """search_scenes_metadata through cache. Tiles missing the same
+        dates are searched together, then every tile is read from cache.
+        """
+        if type(path_row_list) != list:
+            raise ValueError(
+                "[Error on Search Scenes Metadata] " +
+                "Expected value is: [(path, row), (path, row)...]")
+
+        order = self.__get_tile_order(path_row_list)
+        tiles_by_gaps = OrderedDict()
+        for tile in order:
+            gaps = cache.get_gaps(sensor, tile[0], tile[1], start_date,
+                                  end_date)
+            if gaps:
+                tiles_by_gaps.setdefault(tuple(gaps), []).append(tile)
+
+        search_urls = [
+            search_url
+            for gaps, tiles in tiles_by_gaps.items()
+            for gap_start, gap_end in gaps
+            for search_url in self.__get_search_urls(
+                tiles, gap_start, gap_end, sensor, window_days,
+                max_overfetch)
+        ]
+
+        if search_urls:
+            logger.debug('{} queries for dates not in {}'.format(
+                len(search_urls), cache))
+            cache.add(sensor, list(self.__select_metadata(
+                self.__iter_queries(
+                    transport or get_default_transport(), search_urls,
+                    max_workers),
+                order, set())))
+
+            for gaps, tiles in tiles_by_gaps.items():
+                for tile in tiles:
+                    for gap_start, gap_end in gaps:
+                        cache.add_coverage(
+                            sensor, tile[0], tile[1], gap_start, gap_end)
+
+        metadata_list = []
+        for tile in order:
+            metadata_list.extend(cache.get_scenes(
+                sensor, tile[0], tile[1], start_date, end_date))
+        return metadata_list
+
+    @staticmethod
+    def iter_scenes_metadata(
+        path_row_list, start_date, end_date, sensor="LANDSAT_8_C1",
+        transport=None, max_workers=MAX_WORKERS, window_days=None,
+        max_overfetch=MAX_OVERFETCH
+    ):
+        """
+        Generator version of search_scenes_metadata, yielding each scene
+        as soon as it is parsed while the answers are still downloading,
+        so large searches use constant memory.
+        Scenes come in the order of the queries, path and row blocks and
+        then date windows, instead of the order of path_row_list.
+        params: see search_scenes_metadata
+        raises MetadataError when an answer can't be read
         """
 
         if type(path_row_list) != list:
@@ -67,27 +312,73 @@ class LandsatFinder:
                 "[Error on Search Scenes Metadata] " +
                 "Expected value is: [(path, row), (path, row)...]")
 
-        metadata_dict_list = []
+        transport = transport or get_default_transport()
+        search_urls = LandsatFinder.__get_search_urls(
+            path_row_list, start_date, end_date, sensor, window_days,
+            max_overfetch)
 
-        for path_row in path_row_list:
+        yield from LandsatFinder.__select_metadata(
+            LandsatFinder.__iter_queries(
+                transport, search_urls, max_workers),
+            LandsatFinder.__get_tile_order(path_row_list), set())
 
-            search_url = LandsatFinder.__get_ee_url().format(
-                path=path_row[0],
-                row=path_row[1],
-                sensor=sensor,
-                start_date=start_date.strftime('%Y-%m-%d'),
-                end_date=end_date.strftime('%Y-%m-%d'),
-            )
+    @staticmethod
+    async def search_scenes_metadata_async(
+        path_row_list, start_date, end_date, sensor="LANDSAT_8_C1",
+        transport=None, window_days=None, max_overfetch=MAX_OVERFETCH
+    ):
+        """
+        asyncio counterpart of search_scenes_metadata, every query is sent
+        at once through an AsyncHTTPTransport. A temporary
+        transport is used when none is given.
+        """
 
-            r = requests.get(search_url)
-            metadata_list = LandsatFinder.__extract_metadata_info(r)
+        if type(path_row_list) != list:
+            raise ValueError(
+                "[Error on Search Scenes Metadata] " +
+                "Expected value is: [(path, row), (path, row)...]")
+
+        search_urls = LandsatFinder.__get_search_urls(
+            path_row_list, start_date, end_date, sensor, window_days,
+            max_overfetch)
+
+        async with get_async_transport(transport) as transport:
+            responses = await asyncio.gather(
+                *[transport.get(search_url) for search_url in search_urls])
 
-            metadata_dict_list.extend(metadata_list)
+        order = LandsatFinder.__get_tile_order(path_row_list)
+        seen = set()
+        metadata_list = []
+        for r, search_url in zip(responses, search_urls):
+            metadata_list.extend(LandsatFinder.__select_metadata(
+                LandsatFinder.__extract_metadata_info(r, search_url),
+                order, seen))
 
-        return metadata_dict_list
+        return LandsatFinder.__sort_metadata(metadata_list, order)
 
     @staticmethod
-    def search_scenes_id_list(path_row_list, start_date, end_date):
+    def search_scenes_table(
+        path_row_list, start_date, end_date, sensor="LANDSAT_8_C1",
+        transport=None, max_workers=MAX_WORKERS, window_days=None,
+        max_overfetch=MAX_OVERFETCH, cache=None
+    ):
+        """
+        search_scenes_metadata returning a SceneTable, a columnar NumPy
+        container to filter, sort and group the scenes found.
+        params: see search_scenes_metadata
+        """
+        return SceneTable.from_records(LandsatFinder.search_scenes_metadata(
+            path_row_list, start_date, end_date, sensor=sensor,
+            transport=transport, max_workers=max_workers,
+            window_days=window_days, max_overfetch=max_overfetch,
+            cache=cache))
+
+    @staticmethod
+    def search_scenes_id_list(
+        path_row_list, start_date, end_date, transport=None,
+        max_workers=MAX_WORKERS, window_days=None,
+        max_overfetch=MAX_OVERFETCH, cache=None
+    ):
         """
         Search scenes from EarthExplorer for date range and path row list
         returns a list of scenes with metadata
@@ -97,7 +388,12 @@ class LandsatFinder:
             path_row_list: must be a list of path and row.
                 E.g.: [(50,50),(200,200)]
             sensor: EarthExplorer sensor mode name. default: Landsat_8_C1
+            transport: HTTPTransport used for requests. default: shared one
+            max_workers, window_days, max_overfetch, cache: see
+                search_scenes_metadata
         """
         scene_list = LandsatFinder.search_scenes_metadata(
-            path_row_list, start_date, end_date)
+            path_row_list, start_date, end_date, transport=transport,
+            max_workers=max_workers, window_days=window_days,
+            max_overfetch=max_overfetch, cache=cache)
         return [scene['sceneID'] for scene in scene_list]
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import logging
+import threading
+
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from .cache import connect_sqlite
+
+FINDER_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), 'landsat', '.finder_cache.sqlite')
+REFRESH_DAYS = 30
+
+logger = logging.getLogger(__name__)
+
+ONE_DAY = timedelta(days=1)
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def merge_intervals(intervals):
+    """Sorted union of (start, end) date intervals, both days included,
+    joining the ones that overlap or follow each other.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + ONE_DAY:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(start, end, intervals):
+    """Parts of start..end not covered by intervals, both days included.
+    Returns a sorted list of (start, end).
+    """
+    gaps = []
+    for covered_start, covered_end in merge_intervals(intervals):
+        if covered_end < start or covered_start > end:
+            continue
+        if covered_start > start:
+            gaps.append((start, covered_start - ONE_DAY))
+        start = covered_end + ONE_DAY
+        if start > end:
+            return gaps
+    gaps.append((start, end))
+    return gaps
+
+
+class FinderCache:
+    """
+    Persistent cache of EarthExplorer scenes, stored in SQLite, keyed by
+    sensor, path and row with the date intervals already searched, so a
+    search only asks EarthExplorer for the days it hasn't seen yet.
+    Scenes of the last refresh_days before a search may still change,
+    e.g. Real-Time scenes reprocessed as Tier 1, so those days are stored
+    but searched again next time.
+
+    Params:
+        - path: SQLite database file, ':memory:' keeps it in memory
+        - refresh_days: days before today always searched again
+    """
+
+    def __init__(self, path=FINDER_CACHE_PATH, refresh_days=REFRESH_DAYS):
+        self.path = path
+        self.refresh_days = refresh_days
+        self._lock = threading.Lock()
+        self._connection = connect_sqlite(path)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS coverage ('
+            'sensor TEXT, path INTEGER, row INTEGER, '
+            'start_date TEXT, end_date TEXT)')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS coverage_tile '
+            'ON coverage (sensor, path, row)')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS scenes ('
+            'sensor TEXT, scene_id TEXT, path INTEGER, row INTEGER, '
+            'acq_date TEXT, metadata TEXT, fetched_at REAL, '
+            'PRIMARY KEY (sensor, scene_id))')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS scenes_tile '
+            'ON scenes (sensor, path, row, acq_date)')
+        self._connection.commit()
+
+    def __repr__(self):
+        return "FinderCache {}".format(self.path)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM scenes').fetchone()[0]
+
+    def _get_coverage(self, sensor, path, row):
+        records = self._connection.execute(
+            'SELECT start_date, end_date FROM coverage '
+            'WHERE sensor = ? AND path = ? AND row = ?',
+            (sensor, path, row)).fetchall()
+        return [(_to_date(start), _to_date(end)) for start, end in records]
+
+    def get_gaps(self, sensor, path, row, start_date, end_date):
+        """Date intervals of start_date..end_date not searched yet for the
+        tile. Returns a sorted list of (start, end) dates, both included.
+        """
+        with self._lock:
+            coverage = self._get_coverage(sensor, path, row)
+        return subtract_intervals(
+            _to_date(start_date), _to_date(end_date), coverage)
+
+    def add(self, sensor, metadata_list):
+        """Store scenes as returned by LandsatFinder, replacing the ones
+        with the same sceneID.
+        """
+        now = time.time()
+        records = [
+            (sensor, metadata['sceneID'], metadata['path'], metadata['row'],
+             metadata['acquisitionDate'], json.dumps(metadata), now)
+            for metadata in metadata_list
+        ]
+        with self._lock:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO scenes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                records)
+            self._connection.commit()
+
+    def add_coverage(self, sensor, path, row, start_date, end_date):
+        """Mark start_date..end_date searched for the tile, except the days
+        within refresh_days from today.
+        """
+        end_date = min(
+            _to_date(end_date),
+            date.today() - timedelta(days=self.refresh_days))
+        start_date = _to_date(start_date)
+        if start_date > end_date:
+            return
+
+        with self._lock:
+            coverage = merge_intervals(
+                self._get_coverage(sensor, path, row) +
+                [(start_date, end_date)])
+            self._connection.execute(
+                'DELETE FROM coverage WHERE sensor = ? AND path = ? '
+                'AND row = ?', (sensor, path, row))
+            self._connection.executemany(
+                'INSERT INTO coverage VALUES (?, ?, ?, ?, ?)', [
+                    (sensor, path, row, start.isoformat(), end.isoformat())
+                    for start, end in coverage
+                ])
+            self._connection.commit()
+
+    def get_scenes(self, sensor, path, row, start_date, end_date):
+        """Scenes stored for the tile from start_date to end_date, ordered
+        by date and sceneID.
+        """
+        with self._lock:
+            records = self._connection.execute(
+                'SELECT metadata FROM scenes WHERE sensor = ? AND path = ? '
+                'AND row = ? AND acq_date >= ? AND acq_date <= ? '
+                'ORDER BY acq_date, scene_id', (
+                    sensor, path, row, _to_date(start_date).isoformat(),
+                    _to_date(end_date).isoformat())).fetchall()
+
+        return [
+            json.loads(record[0], object_pairs_hook=OrderedDict)
+            for record in records
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute('DELETE FROM coverage')
+            self._connection.execute('DELETE FROM scenes')
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from collections import OrderedDict
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+from .exceptions import MetadataError
+
+RECORD_TAG = 'metaData'
+
+logger = logging.getLogger(__name__)
+
+
+def parse_value(value):
+    """Typed value of a metadata field: int, float or str, None when
+    empty.
+    """
+    if value is None:
+        return None
+
+    value = value.strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def iter_metadata(chunks, url=None):
+    """
+    Parse an EarthExplorer InventoryStream answer as it arrives, yielding
+    each metaData element as soon as it is complete. Only the record
+    being read is kept in memory.
+
+    Params:
+        - chunks: iterable of bytes, e.g. response.iter_content()
+        - url: queried URL, reported on errors
+
+    Returns:
+        A generator of OrderedDict records with typed values
+
+    Raises:
+        MetadataError when the answer isn't a complete XML document
+    """
+    parser = XMLPullParser(events=('start', 'end'))
+    root = None
+
+    def records():
+        nonlocal root
+        for event, element in parser.read_events():
+            if root is None:
+                root = element
+            if event == 'end' and _local_name(element.tag) == RECORD_TAG:
+                yield OrderedDict(
+                    (_local_name(field.tag), parse_value(field.text))
+                    for field in element)
+                root.clear()
+
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from records()
+        parser.close()
+        yield from records()
+    except ParseError as exc:
+        raise MetadataError('{}: invalid answer, {}'.format(url, exc))
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_NAME = 'manifest.json'
+HASH_ALGORITHMS = ('md5', 'sha256')
+CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def new_hashers():
+    """Returns an OrderedDict of empty hashlib objects by algorithm."""
+    return OrderedDict(
+        (name, hashlib.new(name)) for name in HASH_ALGORITHMS)
+
+
+def hash_file(file_path, chunk_size=CHUNK_SIZE):
+    """Returns a dict with the hex digests of file_path by algorithm."""
+    hashers = new_hashers()
+    buffer = memoryview(bytearray(chunk_size))
+
+    with open(file_path, 'rb') as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            for hasher in hashers.values():
+                hasher.update(buffer[:read])
+
+    return OrderedDict(
+        (name, hasher.hexdigest()) for name, hasher in hashers.items())
+
+
+def etag_matches(etag, md5):
+    """
+    Compare the ETag of a remote file with the MD5 of the local one.
+    The ETag of files uploaded in a single part to S3 is their MD5, the
+    ETag of multipart uploads can't be compared.
+
+    Returns:
+        True or False, or None when the ETag is not a MD5
+    """
+    if not etag:
+        return None
+
+    etag = etag.strip('"')
+    if len(etag) != 32 or '-' in etag:
+        return None
+
+    return etag.lower() == md5
+
+
+class Manifest:
+    """
+    Sidecar manifest with size and hashes of the files of a scene,
+    stored as manifest.json in the scene folder.
+    Files listed with their size are trusted without hashing them again
+    or asking the server. Can be updated from many threads at once.
+
+    Params:
+        - folder: scene folder, <download_dir>/<considered_id>
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self.files = self._load()
+
+    def __repr__(self):
+        return "Manifest {} ({} files)".format(self.path, len(self.files))
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return OrderedDict()
+
+        with open(self.path) as f:
+            return json.load(f, object_pairs_hook=OrderedDict)['files']
+
+    def save(self):
+        """Write the manifest atomically."""
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'files': self.files}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def get(self, filename):
+        return self.files.get(filename)
+
+    def is_complete(self, filename):
+        """Whether filename is listed and still has the listed size."""
+        entry = self.get(filename)
+        file_path = os.path.join(self.folder, filename)
+        return entry is not None and os.path.exists(file_path) and \
+            os.path.getsize(file_path) == entry['size']
+
+    def add(self, filename, size, hashes, etag=None, url=None):
+        """List filename with its size, hashes and remote ETag and URL."""
+        entry = OrderedDict([('size', size)])
+        entry.update(hashes)
+        entry['etag'] = etag
+        entry['url'] = url
+
+        with self._lock:
+            self.files[filename] = entry
+        self.save()
+        return entry
+
+    def verify_file(self, filename):
+        """Hash filename again and compare it with the manifest.
+        Returns None when it matches or the reason it doesn't.
+        """
+        entry = self.get(filename)
+        file_path = os.path.join(self.folder, filename)
+
+        if entry is None:
+            return 'not listed'
+        if not os.path.exists(file_path):
+            return 'missing'
+        if os.path.getsize(file_path) != entry['size']:
+            return 'size'
+
+        hashes = hash_file(file_path)
+        for name in HASH_ALGORITHMS:
+            if name in entry and entry[name] != hashes[name]:
+                return name
+
+        return None
+
+
+def verify(download_dir, max_workers=None):
+    """
+    Hash again, in parallel, every file listed by the manifests found
+    under download_dir.
+
+    Returns:
+        A list of {"path", "error"} dicts for the files that don't match
+        their manifest, empty when all of them do.
+    """
+    jobs = []
+    for folder, _, files in sorted(os.walk(download_dir)):
+        if MANIFEST_NAME in files:
+            manifest = Manifest(folder)
+            jobs.extend(
+                (manifest, filename) for filename in sorted(manifest.files))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        errors = executor.map(
+            lambda job: job[0].verify_file(job[1]), jobs)
+
+        return [
+            {
+                "path": os.path.join(manifest.folder, filename),
+                "error": error
+            }
+            for (manifest, filename), error in zip(jobs, errors) if error
+        ]
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+import os
+import bisect
+import logging
+import threading
+
+from collections import OrderedDict
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+EVENT = 'event'
+
+# seconds
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+    60.0)
+# bytes per second
+THROUGHPUT_BUCKETS = (
+    1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8, 5e8, 1e9)
+
+# metrics reported by the package
+DESCRIPTIONS = {
+    'landsat_head_seconds': 'Latency of HEAD requests',
+    'landsat_head_cache_total': 'HEAD answered from the cache or not',
+    'landsat_get_seconds': 'Duration of file downloads',
+    'landsat_get_bytes_per_second': 'Throughput of file downloads',
+    'landsat_received_bytes_total': 'Bytes received by every transfer',
+    'landsat_files_skipped_total': 'Files not downloaded, already present',
+    'landsat_files_downloaded_total': 'Files downloaded',
+    'landsat_retries_total': 'Requests retried after a transient failure',
+    'landsat_circuit_opened_total': 'Circuits opened on a failing host',
+    'landsat_probe_seconds': 'Duration of collection probes',
+    'landsat_probes_total': 'Collection probes by outcome',
+}
+BUCKETS = {
+    'landsat_get_bytes_per_second': THROUGHPUT_BUCKETS,
+}
+
+logger = logging.getLogger(__name__)
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+class Metrics:
+    """
+    Metrics and events hook API, doing nothing: the default, so the cost
+    on the hot path is a method call. Callers measuring something
+    expensive check enabled first.
+
+        - increment(name, value, **labels): add to a counter
+        - observe(name, value, **labels): add a sample to a histogram
+        - event(name, **fields): report something that happened
+    """
+
+    enabled = False
+
+    def __repr__(self):
+        return "Metrics (disabled)"
+
+    def increment(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def event(self, name, **fields):
+        pass
+
+
+class _Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry(Metrics):
+    """
+    Metrics kept in memory: counters and histograms by name and labels,
+    exported with to_prometheus. Hooks are called with
+    (kind, name, value, labels) for every counter increment, histogram
+    sample and event, kind being COUNTER, HISTOGRAM or EVENT; for events
+    value is None and labels are the fields.
+
+    Params:
+        - hooks: list of functions called on every metric and event
+        - buckets: dict of histogram buckets by metric name, added to
+          BUCKETS, LATENCY_BUCKETS for the others
+    """
+
+    enabled = True
+
+    def __init__(self, hooks=None, buckets=None):
+        self.hooks = list(hooks or [])
+        self.buckets = dict(BUCKETS, **(buckets or {}))
+        self._counters = OrderedDict()
+        self._histograms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "MetricsRegistry ({} counters, {} histograms)".format(
+            len(self._counters), len(self._histograms))
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def _notify(self, kind, name, value, labels):
+        for hook in self.hooks:
+            try:
+                hook(kind, name, value, labels)
+            except Exception as exc:
+                logger.warning('metrics hook {} failed: {}'.format(hook, exc))
+
+    def increment(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, OrderedDict())
+            series[key] = series.get(key, 0) + value
+        if self.hooks:
+            self._notify(COUNTER, name, value, labels)
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, OrderedDict())
+            if key not in series:
+                series[key] = _Histogram(
+                    self.buckets.get(name, LATENCY_BUCKETS))
+            series[key].observe(value)
+        if self.hooks:
+            self._notify(HISTOGRAM, name, value, labels)
+
+    def event(self, name, **fields):
+        if self.hooks:
+            self._notify(EVENT, name, None, fields)
+
+    def get_counter(self, name, **labels):
+        """Value of a counter, 0 when never incremented."""
+        with self._lock:
+            return self._counters.get(name, {}).get(
+                tuple(sorted(labels.items())), 0)
+
+    def get_histogram(self, name, **labels):
+        """(count, sum) of the samples of a histogram."""
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(
+                tuple(sorted(labels.items())))
+            if histogram is None:
+                return 0, 0.0
+            return histogram.count, histogram.sum
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus(self):
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                _add_header(lines, name, COUNTER)
+                for key, value in series.items():
+                    lines.append('{}{} {}'.format(
+                        name, _format_labels(key), _format_value(value)))
+
+            for name, series in self._histograms.items():
+                _add_header(lines, name, HISTOGRAM)
+                for key, histogram in series.items():
+                    cumulative = 0
+                    bounds = [_format_value(bound)
+                              for bound in histogram.buckets] + ['+Inf']
+                    for bound, count in zip(bounds, histogram.counts):
+                        cumulative += count
+                        lines.append('{}_bucket{} {}'.format(
+                            name, _format_labels(key + (('le', bound),)),
+                            cumulative))
+                    lines.append('{}_sum{} {}'.format(
+                        name, _format_labels(key),
+                        _format_value(histogram.sum)))
+                    lines.append('{}_count{} {}'.format(
+                        name, _format_labels(key), histogram.count))
+
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def write_prometheus(self, path):
+        """Write to_prometheus to path, e.g. for the node exporter
+        textfile collector. The file is replaced at once.
+        """
+        with open(path + '.tmp', 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(path + '.tmp', path)
+
+
+def _add_header(lines, name, kind):
+    if name in DESCRIPTIONS:
+        lines.append('# HELP {} {}'.format(name, DESCRIPTIONS[name]))
+    lines.append('# TYPE {} {}'.format(name, kind))
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(label, str(value).replace('\\', r'\\').replace(
+            '"', r'\"').replace('\n', r'\n'))
+        for label, value in key) + '}'
+
+
+def _format_value(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def get_default_metrics():
+    """Returns the metrics every component reports to, a no-op Metrics
+    unless set_default_metrics was called.
+    """
+    global _default_metrics
+
+    if _default_metrics is None:
+        with _default_metrics_lock:
+            if _default_metrics is None:
+                _default_metrics = Metrics()
+
+    return _default_metrics
+
+
+def set_default_metrics(metrics):
+    """Report every metric to metrics, e.g. a MetricsRegistry, or to a
+    no-op Metrics again with None.
+    """
+    global _default_metrics
+
+    with _default_metrics_lock:
+        _default_metrics = metrics or Metrics()
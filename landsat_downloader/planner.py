@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from collections import namedtuple
+
+MAX_OVERFETCH = 0.0
+
+PathRowRange = namedtuple(
+    'PathRowRange', 'start_path end_path start_row end_row tiles')
+
+
+def _merge(rect, other, max_overfetch):
+    """Bounding rectangle of rect and other, which don't share tiles, or
+    None when it would fetch more than max_overfetch extra tiles per
+    requested tile. Returns (start_path, end_path, start_row, end_row,
+    tiles, extra).
+    """
+    start_path, end_path = min(rect[0], other[0]), max(rect[1], other[1])
+    start_row, end_row = min(rect[2], other[2]), max(rect[3], other[3])
+    count = len(rect[4]) + len(other[4])
+    extra = (end_path - start_path + 1) * (end_row - start_row + 1) - count
+    if extra > max_overfetch * count:
+        return None
+    return (start_path, end_path, start_row, end_row,
+            rect[4] | other[4], extra)
+
+
+def _bounds(tiles):
+    paths = [path for path, _ in tiles]
+    rows = [row for _, row in tiles]
+    return min(paths), max(paths), min(rows), max(rows)
+
+
+def _extra(tiles):
+    """Tiles in the bounding rectangle of tiles that weren't requested."""
+    start_path, end_path, start_row, end_row = _bounds(tiles)
+    return (end_path - start_path + 1) * (end_row - start_row + 1) - \
+        len(tiles)
+
+
+def _split(tiles, max_overfetch):
+    """Cut the bounding rectangle of tiles along a path or a row, where
+    the two halves waste the least, until every part is within
+    max_overfetch.
+    """
+    if _extra(tiles) <= max_overfetch * len(tiles):
+        return [_bounds(tiles) + (frozenset(tiles),)]
+
+    best = None
+    for axis in (0, 1):
+        values = sorted(set(tile[axis] for tile in tiles))
+        for cut in values[:-1]:
+            low = [tile for tile in tiles if tile[axis] <= cut]
+            high = [tile for tile in tiles if tile[axis] > cut]
+            extra = _extra(low) + _extra(high)
+            if best is None or extra < best[0]:
+                best = (extra, low, high)
+
+    return _split(best[1], max_overfetch) + _split(best[2], max_overfetch)
+
+
+def plan_path_row_ranges(path_row_list, max_overfetch=MAX_OVERFETCH):
+    """
+    Group path_row_list in rectangular path and row ranges, so each range
+    is requested from EarthExplorer at once. The bounding rectangle of
+    the tiles is cut in two, along the path or row that wastes the
+    least, until each part is within max_overfetch. Parts that fit
+    together are then joined again.
+
+    Params:
+        - path_row_list: list of (path, row)
+        - max_overfetch: extra tiles a range may cover for each requested
+          one, e.g. 0.25 allows a range of 5 tiles for 4 requested. 0 only
+          joins tiles that fill their rectangle.
+
+    Returns:
+        A list of PathRowRange, ordered by path and row, with the set of
+        requested tiles inside each range
+    """
+    tiles = sorted(set((int(p), int(r)) for p, r in path_row_list))
+    if not tiles:
+        return []
+
+    rects = _split(tiles, max_overfetch)
+
+    # join the parts split apart that fit together, cheapest first
+    while True:
+        best = None
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                merged = _merge(rects[i], rects[j], max_overfetch)
+                if merged and (best is None or merged[5] < best[2][5]):
+                    best = (i, j, merged)
+
+        if best is None:
+            break
+        rects[best[0]] = best[2][:5]
+        del rects[best[1]]
+
+    return [
+        PathRowRange(*rect)
+        for rect in sorted(rects, key=lambda rect: (rect[0], rect[2]))
+    ]
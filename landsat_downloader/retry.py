@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+import time
+import random
+import asyncio
+import logging
+import threading
+
+from .exceptions import RETRY_STATUS, CircuitOpenError
+from .metrics import get_default_metrics
+from .scheduler import get_host
+
+ATTEMPTS = 4
+BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+FAILURES = 5
+RESET_TIMEOUT = 30.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """
+    How a request is retried: up to attempts times in all, waiting a
+    random delay between 0 and backoff * 2 ** retry seconds (exponential
+    backoff with full jitter), at most max_backoff, or the Retry-After
+    given by the server.
+
+    Params:
+        - attempts: max tries of a request, 1 to never retry
+        - backoff: seconds of the first delay before jitter
+        - max_backoff: max seconds between two tries
+        - retry_status: HTTP status codes tried again
+    """
+
+    def __init__(
+        self, attempts=ATTEMPTS, backoff=BACKOFF, max_backoff=MAX_BACKOFF,
+        retry_status=RETRY_STATUS
+    ):
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_status = frozenset(retry_status)
+
+    def __repr__(self):
+        return "RetryPolicy ({} attempts)".format(self.attempts)
+
+    def is_retryable(self, status_code):
+        return status_code in self.retry_status
+
+    def get_delay(self, retry, retry_after=None):
+        """Seconds to wait before the retry-th retry, counted from 0."""
+        delay = random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** retry))
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+        return min(delay, self.max_backoff)
+
+
+class CircuitBreaker:
+    """
+    Fails fast while an endpoint is down: after failures consecutive
+    failures the circuit opens and every call raises CircuitOpenError for
+    reset_timeout seconds. Then a single trial call is let through
+    (half-open), closing the circuit when it succeeds and opening it
+    again when it fails. A trial cancelled, or not reporting within
+    reset_timeout, lets the next call through as a new trial.
+
+    Params:
+        - name: endpoint, reported on errors
+        - failures: consecutive failures opening the circuit
+        - reset_timeout: seconds the circuit stays open
+    """
+
+    def __init__(
+        self, name, failures=FAILURES, reset_timeout=RESET_TIMEOUT,
+        clock=time.monotonic
+    ):
+        self.name = name
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._clock = clock
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "CircuitBreaker {} ({})".format(self.name, self.state)
+
+    def check(self):
+        """Raises CircuitOpenError unless a call is allowed."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+
+            now = self._clock()
+            remaining = self._opened_at + self.reset_timeout - now
+            if remaining <= 0:
+                self.state = HALF_OPEN
+                self._opened_at = now
+                return
+
+            raise CircuitOpenError(
+                '{}: circuit open after {} failures, retry in {:.0f}s'.format(
+                    self.name, self.consecutive_failures, max(0, remaining)))
+
+    def is_open(self):
+        """Whether calls would be refused now, without changing state."""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            return self._clock() < self._opened_at + self.reset_timeout
+
+    def cancel_trial(self):
+        """A call ended without an answer, e.g. cancelled: when it was
+        the half-open trial, the next call is let through as a new one.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self._opened_at = self._clock() - self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or \
+                    self.consecutive_failures >= self.failures:
+                if self.state != OPEN:
+                    logger.warning('{}: circuit open after {} failures'.format(
+                        self.name, self.consecutive_failures))
+                    get_default_metrics().increment(
+                        'landsat_circuit_opened_total', host=self.name)
+                self.state = OPEN
+                self._opened_at = self._clock()
+
+
+class Resilience:
+    """
+    Retry policy and circuit breaker of each endpoint, i.e. host, shared
+    by every call of a transport.
+
+    Params:
+        - retry: RetryPolicy of the hosts not in policies
+        - policies: dict of RetryPolicy by host
+        - failures, reset_timeout: see CircuitBreaker
+    """
+
+    def __init__(
+        self, retry=None, policies=None, failures=FAILURES,
+        reset_timeout=RESET_TIMEOUT, sleep=time.sleep, clock=time.monotonic
+    ):
+        self.retry = retry or RetryPolicy()
+        self.policies = dict(policies or {})
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._sleep = sleep
+        self._clock = clock
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "Resilience ({} endpoints)".format(len(self._breakers))
+
+    def get_policy(self, url):
+        return self.policies.get(get_host(url), self.retry)
+
+    def get_breaker(self, url):
+        host = get_host(url)
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(
+                    host, self.failures, self.reset_timeout, self._clock)
+            return self._breakers[host]
+
+    def reset(self):
+        """Close every circuit, forgetting the failures recorded."""
+        with self._lock:
+            self._breakers.clear()
+
+    def _attempts(self, url, exceptions):
+        """Generator driving the tries of a call to url, shared by call and
+        call_async. It is sent the (response, exception) of each try and
+        yields the delay before the next one, or None when done.
+        """
+        policy = self.get_policy(url)
+        breaker = self.get_breaker(url)
+        retry = 0
+        while True:
+            breaker.check()
+            response, exc = yield
+            last = retry + 1 >= policy.attempts
+
+            if exc is not None:
+                if not isinstance(exc, exceptions):
+                    # not a sign of the endpoint being down
+                    breaker.record_success()
+                    raise exc
+                breaker.record_failure()
+                if last:
+                    raise exc
+                reason = exc
+                label = type(exc).__name__
+                delay = policy.get_delay(retry)
+            elif policy.is_retryable(response.status_code):
+                breaker.record_failure()
+                if last:
+                    yield None
+                    return
+                reason = 'HTTP {}'.format(response.status_code)
+                label = str(response.status_code)
+                delay = policy.get_delay(
+                    retry, response.headers.get('retry-after'))
+            else:
+                breaker.record_success()
+                yield None
+                return
+
+            logger.debug('{}: {}, retry {} in {:.2f}s'.format(
+                url, reason, retry + 1, delay))
+            get_default_metrics().increment(
+                'landsat_retries_total', host=breaker.name, reason=label)
+            yield delay
+            retry += 1
+
+    def call(self, url, send, exceptions):
+        """Call send(), a function requesting url, until it returns an
+        answer not worth retrying, it raises an error not in exceptions
+        or the attempts run out. Returns the last response.
+        Raises CircuitOpenError while the circuit of the host is open.
+        """
+        attempts = self._attempts(url, exceptions)
+        next(attempts)
+        while True:
+            try:
+                response, exc = send(), None
+            except Exception as error:
+                response, exc = None, error
+            except BaseException:
+                self.get_breaker(url).cancel_trial()
+                raise
+            delay = attempts.send((response, exc))
+            if delay is None:
+                return response
+            if response is not None:
+                response.close()
+            self._sleep(delay)
+            next(attempts)
+
+    async def call_async(self, url, send, exceptions):
+        """asyncio counterpart of call, send() returning a coroutine."""
+        attempts = self._attempts(url, exceptions)
+        next(attempts)
+        while True:
+            try:
+                response, exc = await send(), None
+            except Exception as error:
+                response, exc = None, error
+            except BaseException:
+                # e.g. CancelledError, neither a success nor a failure
+                self.get_breaker(url).cancel_trial()
+                raise
+            delay = attempts.send((response, exc))
+            if delay is None:
+                return response
+            if hasattr(response, 'close'):
+                # a streamed response, see AsyncHTTPTransport.download
+                response.close()
+            await asyncio.sleep(delay)
+            next(attempts)
+
+    def stats(self):
+        """State of the circuit of each host, for monitoring."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {
+            breaker.name: {
+                "state": breaker.state,
+                "failures": breaker.consecutive_failures
+            } for breaker in breakers
+        }
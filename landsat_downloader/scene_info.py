@@ -1,9 +1,192 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from collections import OrderedDict
+from functools import lru_cache
 
+from .compat import np
 from .finder import LandsatFinder
 
+PARSE_CACHE_SIZE = 64 * 1024
+SCENE_ID_LENGTH = 21
+PRODUCT_ID_LENGTH = 40
+
+
+def _check_digits(value, size, date_format):
+    if len(value) != size or not value.isdigit():
+        raise ValueError("time data {!r} does not match format {!r}".format(
+            value, date_format))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def julian_to_date(julian_date):
+    """Returns a YYYYDDD julian date as date, as
+    datetime.strptime(julian_date, '%Y%j').date() does.
+    """
+    _check_digits(julian_date, 7, '%Y%j')
+    year, day = int(julian_date[:4]), int(julian_date[4:])
+    if not 1 <= day <= 366:
+        raise ValueError("day of year out of range: {}".format(julian_date))
+    return date(year, 1, 1) + timedelta(days=day - 1)
+
+
+def _parse_datetime(value):
+    """Returns a YYYYMMDD date as datetime, as
+    datetime.strptime(value, '%Y%m%d') does.
+    """
+    _check_digits(value, 8, '%Y%m%d')
+    return datetime(int(value[:4]), int(value[4:6]), int(value[6:]))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_scene_id(scene_id):
+    """
+    Params:
+        - scene_id as LC82240682018069LGN00
+
+    Returns:
+        (sat, path, row, year, acq_date, gsi, version)
+    """
+    return (
+        scene_id[:3],
+        int(scene_id[3:6]),
+        int(scene_id[6:9]),
+        int(scene_id[9:13]),
+        julian_to_date(scene_id[9:16]),
+        scene_id[16:19],
+        scene_id[19:]
+    )
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_product_id(product_id):
+    """
+    Params:
+        - product_id as LC08_L1GT_224068_20180310_20180320_01_T2
+
+    Returns:
+        (sat, correction_level, path, row, acq_date, process_date,
+         collection, category)
+    """
+    product = product_id.split("_")
+    return (
+        product[0],
+        product[1],
+        int(product[2][:3]),
+        int(product[2][3:]),
+        _parse_datetime(product[3]),
+        _parse_datetime(product[4]),
+        product[5],
+        product[6]
+    )
+
+
+def _digits(ids, size):
+    """Characters of ids, all with size characters, as a matrix of their
+    digit values. None when numpy is missing or ids can't be encoded.
+    """
+    if np is None or not ids or any(len(i) != size for i in ids):
+        return None
+    try:
+        data = np.array(ids, dtype='S{}'.format(size))
+    except UnicodeEncodeError:
+        return None
+    return np.frombuffer(data.tobytes(), dtype=np.uint8).reshape(
+        len(ids), size).astype(np.int32) - ord('0')
+
+
+def _number(digits, start, end):
+    """Integers written by the columns start:end of a digits matrix."""
+    value = np.zeros(len(digits), dtype=np.int32)
+    for column in range(start, end):
+        value = value * 10 + digits[:, column]
+    return value
+
+
+def _all_digits(digits, *columns):
+    selected = digits[:, list(columns)]
+    return bool(((selected >= 0) & (selected <= 9)).all())
+
+
+def parse_scene_ids(scene_ids):
+    """
+    parse_scene_id of every scene id at once, with NumPy when available.
+    The numbers and dates of all ids are computed as arrays; ids that
+    don't fit the fixed layout are parsed one by one, reporting the same
+    errors as parse_scene_id.
+
+    Returns:
+        A list of parse_scene_id tuples
+    """
+    digits = _digits(scene_ids, SCENE_ID_LENGTH)
+    if digits is None or not _all_digits(digits, *range(3, 16)):
+        return [parse_scene_id(scene_id) for scene_id in scene_ids]
+
+    year = _number(digits, 9, 13)
+    day = _number(digits, 13, 16)
+    if not ((day >= 1) & (day <= 366)).all():
+        return [parse_scene_id(scene_id) for scene_id in scene_ids]
+    acq_date = (year - 1970).astype('datetime64[Y]').astype(
+        'datetime64[D]') + (day - 1)
+
+    return list(zip(
+        [scene_id[:3] for scene_id in scene_ids],
+        _number(digits, 3, 6).tolist(),
+        _number(digits, 6, 9).tolist(),
+        year.tolist(),
+        acq_date.tolist(),
+        [scene_id[16:19] for scene_id in scene_ids],
+        [scene_id[19:] for scene_id in scene_ids]
+    ))
+
+
+def _to_datetimes(digits, start):
+    """datetime64 array of the YYYYMMDD dates at column start of digits,
+    or None when one of them is not a valid date.
+    """
+    year = _number(digits, start, start + 4)
+    month = _number(digits, start + 4, start + 6)
+    day = _number(digits, start + 6, start + 8)
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (day - 1)
+    if not ((month >= 1) & (month <= 12) & (day >= 1) &
+            (dates.astype('datetime64[M]') == months)).all():
+        return None
+    return dates.astype('datetime64[us]')
+
+
+def parse_product_ids(product_ids):
+    """
+    parse_product_id of every product id at once, see parse_scene_ids.
+
+    Returns:
+        A list of parse_product_id tuples
+    """
+    digits = _digits(product_ids, PRODUCT_ID_LENGTH)
+    underscore = ord('_') - ord('0')
+    if digits is None or not (
+            (digits[:, [4, 9, 16, 25, 34, 37]] == underscore).all() and
+            _all_digits(digits, *(list(range(10, 16)) +
+                                  list(range(17, 25)) +
+                                  list(range(26, 34))))):
+        return [parse_product_id(product_id) for product_id in product_ids]
+
+    acq_date = _to_datetimes(digits, 17)
+    process_date = _to_datetimes(digits, 26)
+    if acq_date is None or process_date is None:
+        return [parse_product_id(product_id) for product_id in product_ids]
+
+    return list(zip(
+        [product_id[:4] for product_id in product_ids],
+        [product_id[5:9] for product_id in product_ids],
+        _number(digits, 10, 13).tolist(),
+        _number(digits, 13, 16).tolist(),
+        acq_date.tolist(),
+        process_date.tolist(),
+        [product_id[35:37] for product_id in product_ids],
+        [product_id[38:] for product_id in product_ids]
+    ))
+
+
 class Product:
     """
     Get info from product as sat info, path, row, acq_date
@@ -19,6 +202,11 @@ class Product:
 
     """
 
+    __slots__ = (
+        'product_id', 'info', 'sat', 'correction_level', 'path', 'row',
+        'acq_date', 'process_date', 'collection', 'category'
+    )
+
     def __init__(self, product_id=False):
 
         if not product_id:
@@ -28,7 +216,6 @@ class Product:
         self.product_id = product_id
         self.info = self.get_info()
 
-
     def get_info(self):
         if self.product_id:
             self.get_info_from_product_id(self.product_id)
@@ -50,17 +237,13 @@ class Product:
             OrderedDict with info from product_id
         """
 
-        product = product_id.split("_")
-
         self.product_id = product_id
-        self.sat = product[0]
-        self.correction_level = product[1]
-        self.path = int(product[2][:3])
-        self.row = int(product[2][3:])
-        self.acq_date = datetime.strptime(product[3], "%Y%m%d")
-        self.process_date = datetime.strptime(product[4], "%Y%m%d")
-        self.collection = product[5]
-        self.category = product[6]
+        self._set_info(parse_product_id(product_id))
+
+    def _set_info(self, info):
+        (self.sat, self.correction_level, self.path, self.row,
+         self.acq_date, self.process_date, self.collection,
+         self.category) = info
 
 
 class Identifier:
@@ -77,6 +260,11 @@ class Identifier:
         - A instance for Info with attrs for info
     """
 
+    __slots__ = (
+        'scene_id', 'scene', 'sat', 'path', 'row', 'year', 'acq_date',
+        'gsi', 'version'
+    )
+
     def __init__(self, scene_id=False):
         if not scene_id:
             raise ValueError("[Error on Scene Info\n\
@@ -87,7 +275,7 @@ class Identifier:
 
     def julian_2_date(self, julian_date):
         """ Returns julian date in datetime """
-        return datetime.strptime(julian_date, '%Y%j').date()
+        return julian_to_date(julian_date)
 
     def get_info(self):
         """
@@ -110,14 +298,11 @@ class Identifier:
             return False
 
         self.scene = scene_id
-        self.sat = scene_id[:3]
-        self.path = int(scene_id[3:6])
-        self.row = int(scene_id[6:9])
-        self.year = int(scene_id[9:13])
-        self.acq_date = self.julian_2_date(scene_id[9:16])
-        self.gsi = scene_id[16:19]
-        self.version = scene_id[19:]
+        self._set_info(parse_scene_id(scene_id))
 
+    def _set_info(self, info):
+        (self.sat, self.path, self.row, self.year, self.acq_date,
+         self.gsi, self.version) = info
 
 
 class SceneInfo:
@@ -128,6 +313,8 @@ class SceneInfo:
         - update_scene: update scene_id with metadata info
     """
 
+    __slots__ = ('scene_id', 'product_id', 'id_info', 'product_info')
+
     def __repr__(self):
         return "Scene {} - {}".format(self.scene_id, self.product_id)
 
@@ -146,6 +333,52 @@ class SceneInfo:
         self.id_info = self.get_scene_info()
         self.product_info = self.get_product_info()
 
+    @classmethod
+    def from_ids(cls, scene_ids, product_ids):
+        """
+        SceneInfo of each scene_id and product_id pair, parsing all of
+        them at once, much faster than one SceneInfo at a time for large
+        inventories.
+
+        Params:
+            - scene_ids: list of scene ids
+            - product_ids: list of product ids, same length of scene_ids
+
+        Returns:
+            A list of SceneInfo
+        """
+        scene_ids = list(scene_ids)
+        product_ids = list(product_ids)
+        if len(scene_ids) != len(product_ids):
+            raise ValueError(
+                "[Error on Scene Info] Expected the same number of "
+                "scene_ids and product_ids")
+        if not all(scene_ids) or not all(product_ids):
+            raise ValueError("[Error on Scene Info\n\
+                Expected value is scene_id and product_id")
+
+        scenes = []
+        for scene_id, product_id, id_info, product_info in zip(
+                scene_ids, product_ids, parse_scene_ids(scene_ids),
+                parse_product_ids(product_ids)):
+            identifier = Identifier.__new__(Identifier)
+            identifier.scene_id = identifier.scene = scene_id
+            identifier._set_info(id_info)
+
+            product = Product.__new__(Product)
+            product.product_id = product_id
+            product.info = None
+            product._set_info(product_info)
+
+            scene = cls.__new__(cls)
+            scene.scene_id = scene_id
+            scene.product_id = product_id
+            scene.id_info = identifier
+            scene.product_info = product
+            scenes.append(scene)
+
+        return scenes
+
     def __validate_rt_scene_date(self, product_id):
         """
         Internal validation for RT scene, that creates a RT product
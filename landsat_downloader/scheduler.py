@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_for
+from urllib.parse import urlparse
+
+from .tracing import get_default_tracer
+
+MAX_WORKERS = 8
+
+logger = logging.getLogger(__name__)
+
+
+def get_host(url):
+    """Host of url, used as key for per-host limits."""
+    return urlparse(url).netloc
+
+
+class Scheduler:
+    """
+    Work queue running tasks on a thread pool with a global and a per-host
+    concurrency limit. Tasks of a host beyond max_per_host wait in its
+    queue without holding a worker, so a slow host doesn't starve the
+    others.
+
+    Params:
+        - max_workers: max tasks running at once
+        - max_per_host: max tasks running at once for the same host
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_per_host=None):
+        self.max_workers = max(1, max_workers or 1)
+        self.max_per_host = max_per_host or self.max_workers
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._queues = OrderedDict()
+        self._running = Counter()
+        self._pending = set()
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return "Scheduler ({} workers, {} per host)".format(
+            self.max_workers, self.max_per_host)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def submit(self, host, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) for host. Returns a Future.
+        fn runs in the span of the caller, see tracing.
+        """
+        fn = get_default_tracer().wrap(fn)
+        future = Future()
+        future.add_done_callback(self._discard)
+        with self._lock:
+            self._pending.add(future)
+            self._queues.setdefault(host, deque()).append(
+                (future, fn, args, kwargs))
+            self._dispatch()
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def _dispatch(self):
+        """Start queued tasks while their hosts are under the limit.
+        Must be called holding self._lock.
+        """
+        for host, queue in self._queues.items():
+            while queue and self._running[host] < self.max_per_host:
+                task = queue.popleft()
+                self._running[host] += 1
+                self._executor.submit(self._run, host, *task)
+
+    def _run(self, host, future, fn, args, kwargs):
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as exc:
+                    future.set_exception(exc)
+        finally:
+            with self._lock:
+                self._running[host] -= 1
+                self._dispatch()
+
+    def shutdown(self, wait=True):
+        """Stop the pool once every task is done, or cancel the queued
+        ones right away when not waiting.
+        """
+        if wait:
+            with self._lock:
+                pending = list(self._pending)
+            wait_for(pending)
+        else:
+            with self._lock:
+                for queue in self._queues.values():
+                    for task in queue:
+                        task[0].cancel()
+                    queue.clear()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import abc
+import time
+import logging
+import threading
+
+from collections import OrderedDict, namedtuple
+
+from .cache import HeadResult, head_url
+from .exceptions import TransientError, is_transient
+from .retry import CircuitBreaker
+from .scheduler import get_host
+from .tracing import get_default_tracer
+from .transport import (
+    CHUNK_SIZE, TRANSIENT_ERRORS, commit_part, get_default_transport
+)
+
+# collections a scene can be found in, highest priority first
+COLLECTIONS = ('rt', 't1', 'pre')
+# consecutive failures making a source unhealthy, and for how long
+FAILURES = 3
+RESET_TIMEOUT = 60.0
+# weight of the last measure in the moving averages of a source
+SMOOTHING = 0.3
+
+AWS_URLS = {
+    'rt': 'https://s3-us-west-2.amazonaws.com/landsat-pds/c1/L8/',
+    't1': 'https://s3-us-west-2.amazonaws.com/landsat-pds/c1/L8/',
+    'pre': 'https://s3-us-west-2.amazonaws.com/landsat-pds/L8/',
+}
+GCS_BUCKET = 'gcp-public-data-landsat'
+GCS_URLS = {
+    't1': 'https://storage.googleapis.com/gcp-public-data-landsat/LC08/01/',
+    'pre': 'https://storage.googleapis.com/gcp-public-data-landsat/LC08/PRE/',
+}
+GCS_LIST_URL = 'https://storage.googleapis.com/storage/v1/b/{}/o'
+LOCAL_FOLDERS = {
+    'rt': os.path.join('c1', 'L8'),
+    't1': os.path.join('c1', 'L8'),
+    'pre': 'L8',
+}
+HREF_PATTERN = re.compile(r'href="([^"?#]+)"', re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+SceneLocation = namedtuple(
+    'SceneLocation', 'collection considered_id path row')
+
+
+class Source(abc.ABC):
+    """
+    A mirror of landsat-pds. Scenes are laid out as
+    <collection folder>/<path>/<row>/<considered id>/ and every source
+    answers the same calls, whatever the storage behind it:
+
+        - probe(scene): whether the source has the scene
+        - list(scene): names of the files of the scene
+        - head(scene, filename): HeadResult of a file
+        - fetch(scene, filename, file_path, ...): copy a file to disk
+        - read_range(scene, filename, offset, size): bytes of a file
+
+    scene is a SceneLocation. Unknown answers, e.g. a timeout, raise
+    TransientError.
+    """
+
+    name = None
+    host = None
+
+    def __repr__(self):
+        return "{} {}".format(type(self).__name__, self.name)
+
+    @abc.abstractmethod
+    def has_collection(self, collection):
+        pass
+
+    @abc.abstractmethod
+    def get_location(self, scene, filename):
+        """URL or path of a file, as recorded in manifests."""
+
+    @abc.abstractmethod
+    def probe(self, scene):
+        pass
+
+    @abc.abstractmethod
+    def list(self, scene):
+        pass
+
+    @abc.abstractmethod
+    def head(self, scene, filename):
+        pass
+
+    @abc.abstractmethod
+    def fetch(
+        self, scene, filename, file_path, size=None, segments=1, hashers=(),
+        verify=None
+    ):
+        pass
+
+    @abc.abstractmethod
+    def read_range(self, scene, filename, offset, size):
+        pass
+
+
+class HTTPSource(Source):
+    """
+    Mirror served over HTTP, e.g. an on-premises copy of landsat-pds.
+
+    Params:
+        - name: unique name of the source
+        - urls: dict of the URL of each collection folder, collections
+          missing are not mirrored
+        - probe_filename: file checked by probe, formatted with id
+        - transport: HTTPTransport, the default one when None
+        - head_cache: HeadCache used for probes and remote sizes
+    """
+
+    def __init__(
+        self, name, urls, probe_filename='index.html', transport=None,
+        head_cache=None
+    ):
+        self.name = name
+        self.urls = dict(urls)
+        self.probe_filename = probe_filename
+        self.transport = transport or get_default_transport()
+        self.head_cache = head_cache
+        self.host = get_host(next(iter(self.urls.values()), ''))
+
+    def has_collection(self, collection):
+        return collection in self.urls
+
+    def get_url(self, scene, filename=''):
+        return '{}{:03d}/{:03d}/{}/{}'.format(
+            self.urls[scene.collection], scene.path, scene.row,
+            scene.considered_id, filename)
+
+    def get_location(self, scene, filename):
+        return self.get_url(scene, filename)
+
+    def probe(self, scene):
+        if not self.has_collection(scene.collection):
+            return False
+        return self.head(scene, self.probe_filename.format(
+            id=scene.considered_id)).exists
+
+    def list(self, scene):
+        """Files linked from the index.html of the scene folder."""
+        url = self.get_url(scene, 'index.html')
+        try:
+            response = self.transport.get(url)
+        except TRANSIENT_ERRORS as exc:
+            raise TransientError('{}: {}'.format(url, exc)) from exc
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+
+        names = [href.rsplit('/', 1)[-1]
+                 for href in HREF_PATTERN.findall(response.text)]
+        return sorted(set(name for name in names if name))
+
+    def head(self, scene, filename):
+        return head_url(
+            self.transport, self.get_url(scene, filename), self.head_cache)
+
+    def fetch(
+        self, scene, filename, file_path, size=None, segments=1, hashers=(),
+        verify=None
+    ):
+        return self.transport.download(
+            self.get_url(scene, filename), file_path, size=size,
+            segments=segments, hashers=hashers, verify=verify)
+
+    def read_range(self, scene, filename, offset, size):
+        return self.transport.get_range(
+            self.get_url(scene, filename), offset, size)
+
+
+class AWSSource(HTTPSource):
+    """landsat-pds on AWS S3, every collection."""
+
+    def __init__(self, transport=None, head_cache=None, urls=AWS_URLS):
+        super(AWSSource, self).__init__(
+            'aws', urls, transport=transport, head_cache=head_cache)
+
+
+class GCSSource(HTTPSource):
+    """Google Cloud public Landsat bucket: Collection 1 and
+    Pre-Collection, no Real-Time scenes. Folders have no index.html, the
+    MTL file is probed and files are listed with the storage JSON API.
+    """
+
+    def __init__(self, transport=None, head_cache=None, urls=GCS_URLS):
+        super(GCSSource, self).__init__(
+            'gcs', urls, probe_filename='{id}_MTL.txt', transport=transport,
+            head_cache=head_cache)
+
+    def list(self, scene):
+        folder = self.get_url(scene)
+        prefix = folder.split('/{}/'.format(GCS_BUCKET), 1)[-1]
+        url = GCS_LIST_URL.format(GCS_BUCKET)
+        try:
+            response = self.transport.get(
+                url, params={'prefix': prefix, 'fields': 'items/name'})
+        except TRANSIENT_ERRORS as exc:
+            raise TransientError('{}: {}'.format(url, exc)) from exc
+        response.raise_for_status()
+
+        return sorted(
+            item['name'][len(prefix):]
+            for item in response.json().get('items', []))
+
+
+class LocalSource(Source):
+    """
+    Mirror on a local or mounted folder, laid out as landsat-pds.
+
+    Params:
+        - root: folder holding the collection folders
+        - name: unique name of the source
+        - folders: dict of the folder of each collection, relative to root
+        - chunk_size: bytes copied at a time
+    """
+
+    host = 'localhost'
+
+    def __init__(
+        self, root, name='local', folders=LOCAL_FOLDERS,
+        chunk_size=CHUNK_SIZE
+    ):
+        self.root = root
+        self.name = name
+        self.folders = dict(folders)
+        self.chunk_size = chunk_size
+
+    def has_collection(self, collection):
+        return collection in self.folders
+
+    def get_path(self, scene, filename=''):
+        return os.path.join(
+            self.root, self.folders[scene.collection],
+            '{:03d}'.format(scene.path), '{:03d}'.format(scene.row),
+            scene.considered_id, filename)
+
+    def get_location(self, scene, filename):
+        return self.get_path(scene, filename)
+
+    def probe(self, scene):
+        return self.has_collection(scene.collection) and \
+            os.path.isdir(self.get_path(scene))
+
+    def list(self, scene):
+        folder = self.get_path(scene)
+        return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+    def head(self, scene, filename):
+        path = self.get_path(scene, filename)
+        exists = os.path.isfile(path)
+        size = os.path.getsize(path) if exists else None
+        return HeadResult(exists, size, None, time.time())
+
+    def fetch(
+        self, scene, filename, file_path, size=None, segments=1, hashers=(),
+        verify=None
+    ):
+        """Copy the file to <file_path>.part, renamed to file_path once
+        complete and accepted by verify, see HTTPTransport.download.
+        Returns the size of the file.
+        """
+        part_path = file_path + '.part'
+        with get_default_tracer().span('fs.copy', path=part_path), \
+                open(self.get_path(scene, filename), 'rb') as src, \
+                open(part_path, 'wb') as dst:
+            while True:
+                chunk = src.read(self.chunk_size)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                for hasher in hashers:
+                    hasher.update(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+            size = dst.tell()
+
+        commit_part(part_path, file_path, verify)
+        return size
+
+    def read_range(self, scene, filename, offset, size):
+        with open(self.get_path(scene, filename), 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
+
+
+class SourceRegistry:
+    """
+    Sources a scene can be downloaded from, with the latency and
+    throughput measured on each. Files go to the fastest healthy source
+    first: the one with the least expected time, latency plus size over
+    throughput, sources not measured yet being tried first. A source
+    failing failures times in a row is left aside for reset_timeout
+    seconds, unless no other source is left.
+
+    Params:
+        - sources: list of Source, AWS only by default
+        - failures, reset_timeout: see CircuitBreaker
+    """
+
+    def __init__(
+        self, sources=None, failures=FAILURES, reset_timeout=RESET_TIMEOUT
+    ):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.sources = OrderedDict()
+        self._stats = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+        for source in sources if sources is not None else [AWSSource()]:
+            self.register(source)
+
+    def __repr__(self):
+        return "SourceRegistry ({})".format(', '.join(self.sources))
+
+    def __len__(self):
+        return len(self.sources)
+
+    def register(self, source):
+        """Add source, replacing the one with the same name."""
+        with self._lock:
+            self.sources[source.name] = source
+            self._stats[source.name] = {
+                "latency": None,
+                "throughput": None,
+                "successes": 0,
+                "failures": 0,
+                "bytes": 0,
+            }
+            self._breakers[source.name] = CircuitBreaker(
+                source.name, self.failures, self.reset_timeout)
+
+    def unregister(self, name):
+        with self._lock:
+            del self.sources[name]
+            del self._stats[name]
+            del self._breakers[name]
+
+    def is_healthy(self, name):
+        return not self._breakers[name].is_open()
+
+    def _get_expected_time(self, name, size):
+        stats = self._stats[name]
+        seconds = stats['latency'] or 0
+        if size and stats['throughput']:
+            seconds += size / stats['throughput']
+        return seconds
+
+    def rank(self, collection=None, size=None):
+        """Sources having collection, the fastest healthy first and the
+        unhealthy last, for a file of size bytes. Without size, e.g. for
+        probes, they are ranked on latency alone.
+        """
+        with self._lock:
+            names = [name for name, source in self.sources.items()
+                     if collection is None or
+                     source.has_collection(collection)]
+            names.sort(key=lambda name: (
+                not self.is_healthy(name),
+                self._get_expected_time(name, size)))
+            return [self.sources[name] for name in names]
+
+    def _average(self, stats, key, value):
+        stats[key] = value if stats[key] is None else \
+            SMOOTHING * value + (1 - SMOOTHING) * stats[key]
+
+    def record_latency(self, source, seconds):
+        """Record a probe or HEAD answered by source in seconds."""
+        with self._lock:
+            stats = self._stats[source.name]
+            self._average(stats, 'latency', seconds)
+            stats['successes'] += 1
+        self._breakers[source.name].record_success()
+
+    def record_transfer(self, source, size, seconds):
+        """Record size bytes fetched from source in seconds."""
+        with self._lock:
+            stats = self._stats[source.name]
+            if seconds > 0:
+                self._average(stats, 'throughput', size / seconds)
+            stats['successes'] += 1
+            stats['bytes'] += size
+        self._breakers[source.name].record_success()
+
+    def record_failure(self, source, error=None):
+        logger.warning('{} failed: {}'.format(source.name, error))
+        with self._lock:
+            self._stats[source.name]['failures'] += 1
+        self._breakers[source.name].record_failure()
+
+    def probe(self, scene):
+        """Ask the sources having the collection of scene, fastest first,
+        until one has it.
+        Returns the name of that source, None when every source answered
+        it doesn't have the scene. Raises TransientError when no source
+        has it and some couldn't tell.
+        """
+        errors = []
+        for source in self.rank(scene.collection, size=0):
+            started = time.monotonic()
+            try:
+                exists = source.probe(scene)
+            except Exception as exc:
+                if not is_transient(exc):
+                    raise
+                self.record_failure(source, exc)
+                errors.append(exc)
+                continue
+
+            self.record_latency(source, time.monotonic() - started)
+            if exists:
+                return source.name
+
+        if errors:
+            raise TransientError('{}: {} source(s) failed, {}'.format(
+                scene.considered_id, len(errors), errors[-1]))
+        return None
+
+    def stats(self):
+        """Latency, throughput and health of each source, for monitoring."""
+        with self._lock:
+            names = list(self.sources)
+            stats = {name: dict(self._stats[name]) for name in names}
+        for name in names:
+            stats[name]['healthy'] = self.is_healthy(name)
+        return stats
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+import re
+import csv
+import logging
+
+from collections import OrderedDict
+
+from .compat import np, require_numpy
+
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+INT = 'int'
+NULLABLE_INT = 'nullable_int'
+FLOAT = 'float'
+DATE = 'date'
+STR = 'str'
+
+logger = logging.getLogger(__name__)
+
+
+def _get_kind(values):
+    """Column kind of values, a list of values typed by parse_value."""
+    present = [value for value in values if value is not None]
+    if present and all(
+            isinstance(value, int) and not isinstance(value, bool)
+            for value in present):
+        return INT if len(present) == len(values) else NULLABLE_INT
+    if present and all(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for value in present):
+        return FLOAT
+    if present and all(
+            isinstance(value, str) and DATE_PATTERN.match(value)
+            for value in present):
+        return DATE
+    return STR
+
+
+def _to_array(values, kind):
+    """Returns the column array of values and its categories, None
+    unless kind is STR.
+    """
+    if kind == INT:
+        return np.array(values, dtype=np.int64), None
+    if kind in (NULLABLE_INT, FLOAT):
+        return np.array(
+            [np.nan if value is None else value for value in values],
+            dtype=np.float64), None
+    if kind == DATE:
+        return np.array(
+            ['NaT' if value is None else value for value in values],
+            dtype='datetime64[D]'), None
+
+    # strings are stored once, each row keeps the index of its string;
+    # categories are sorted so indexes sort as the strings do
+    categories = sorted(set(str(value) for value in values
+                            if value is not None))
+    index = {value: i for i, value in enumerate(categories)}
+    codes = np.array(
+        [-1 if value is None else index[str(value)] for value in values],
+        dtype=np.int32)
+    return codes, np.array(categories, dtype=object)
+
+
+class SceneTable:
+    """
+    Columnar container of scenes metadata, one NumPy array per field, to
+    filter, sort and group thousands of scenes without Python loops.
+    Text fields are interned: each distinct value is stored once in the
+    categories of the column and rows keep its index.
+
+        table = LandsatFinder.search_scenes_table(...)
+        clear = table[table['cloudCover'] < 10].sort('acquisitionDate')
+        for (path, row), scenes in clear.group_by_path_row().items():
+            ...
+
+    Columns are read with table[name], as int64, float64 (NaN when
+    missing), datetime64[D] for dates or an object array of str.
+    A boolean mask, slice or index array gives a new SceneTable.
+
+    Params:
+        - columns: OrderedDict of arrays by field name
+        - kinds: OrderedDict of column kinds by field name
+        - categories: dict of the interned values of text columns
+    """
+
+    def __init__(self, columns, kinds, categories):
+        require_numpy('for SceneTable')
+
+        self.columns = columns
+        self.kinds = kinds
+        self.categories = categories
+
+    @classmethod
+    def from_records(cls, metadata_list):
+        """Build a SceneTable from an iterable of metadata dicts, as
+        returned by LandsatFinder. Fields missing in a record are empty.
+        """
+        require_numpy('for SceneTable')
+
+        values = OrderedDict()
+        size = 0
+        for metadata in metadata_list:
+            for name, value in metadata.items():
+                values.setdefault(name, [None] * size).append(value)
+            size += 1
+            for column in values.values():
+                if len(column) < size:
+                    column.append(None)
+
+        columns = OrderedDict()
+        kinds = OrderedDict()
+        categories = {}
+        for name, column in values.items():
+            kinds[name] = _get_kind(column)
+            columns[name], column_categories = _to_array(column, kinds[name])
+            if column_categories is not None:
+                categories[name] = column_categories
+
+        return cls(columns, kinds, categories)
+
+    def __repr__(self):
+        return "SceneTable ({} scenes, {} columns)".format(
+            len(self), len(self.columns))
+
+    def __len__(self):
+        if not self.columns:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    @property
+    def names(self):
+        return list(self.columns)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.get_column(key)
+
+        return SceneTable(
+            OrderedDict(
+                (name, column[key]) for name, column in self.columns.items()),
+            self.kinds, self.categories)
+
+    def get_column(self, name):
+        """Values of column name, text columns decoded as str."""
+        column = self.columns[name]
+        if self.kinds[name] != STR:
+            return column
+
+        categories = self.categories[name]
+        if not len(categories):
+            # every value is empty
+            return np.full(len(column), None, dtype=object)
+
+        values = categories.take(np.maximum(column, 0))
+        values[column < 0] = None
+        return values
+
+    def isin(self, name, values):
+        """Boolean mask of the rows whose name is one of values, compared
+        on the interned indexes for text columns.
+        """
+        if self.kinds[name] != STR:
+            return np.isin(self.columns[name], values)
+
+        codes = np.flatnonzero(np.isin(self.categories[name], list(values)))
+        return np.isin(self.columns[name], codes)
+
+    def sort(self, *names):
+        """New SceneTable sorted by names, the first being the primary
+        key. Empty values go last.
+        """
+        keys = []
+        for name in reversed(names):
+            column = self.columns[name]
+            if self.kinds[name] == STR:
+                column = np.where(column < 0, np.iinfo(np.int32).max, column)
+            keys.append(column)
+        return self[np.lexsort(keys)] if keys else self
+
+    def group_by_path_row(self):
+        """
+        Returns:
+            An OrderedDict of SceneTable by (path, row), sorted by path and
+            row, keeping the order of the rows in each group
+        """
+        pairs = np.stack([self.columns['path'], self.columns['row']], axis=1)
+        keys, inverse, counts = np.unique(
+            pairs, axis=0, return_inverse=True, return_counts=True)
+        order = np.argsort(inverse.ravel(), kind='stable')
+        groups = np.split(order, np.cumsum(counts)[:-1])
+
+        return OrderedDict(
+            ((int(key[0]), int(key[1])), self[indexes])
+            for key, indexes in zip(keys, groups)
+        )
+
+    def _get_values(self, name):
+        """Column name as a list of Python values, as parsed."""
+        kind = self.kinds[name]
+        values = self.get_column(name).tolist()
+        if kind == NULLABLE_INT:
+            return [None if value != value else int(value)
+                    for value in values]
+        if kind == FLOAT:
+            return [None if value != value else value for value in values]
+        if kind == DATE:
+            return [None if value is None else value.isoformat()
+                    for value in values]
+        return values
+
+    def to_dict_list(self):
+        """Rows as a list of OrderedDict, as returned by
+        LandsatFinder.search_scenes_metadata.
+        """
+        names = self.names
+        columns = [self._get_values(name) for name in names]
+        return [OrderedDict(zip(names, row)) for row in zip(*columns)]
+
+    def to_numpy(self):
+        """Rows as a NumPy structured array, text columns holding the
+        interned indexes.
+        """
+        array = np.empty(len(self), dtype=[
+            (name, column.dtype) for name, column in self.columns.items()])
+        for name, column in self.columns.items():
+            array[name] = column
+        return array
+
+    def to_arrow(self):
+        """
+        Returns:
+            A pyarrow.Table. Numeric columns share their memory with the
+            table and text columns are dictionary encoded with the same
+            indexes.
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError(
+                'pyarrow is required to export a SceneTable, install it '
+                'with pip install landsat_downloader[arrow]')
+
+        arrays = []
+        for name, column in self.columns.items():
+            kind = self.kinds[name]
+            if kind == STR:
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(column, mask=column < 0),
+                    pa.array(self.categories[name].tolist(),
+                             type=pa.string())))
+            elif kind in (NULLABLE_INT, FLOAT):
+                arrays.append(pa.array(column, from_pandas=True))
+            else:
+                arrays.append(pa.array(column))
+
+        return pa.Table.from_arrays(arrays, names=self.names)
+
+    def to_parquet(self, path, **kwargs):
+        """Write the table to a Parquet file, kwargs are passed to
+        pyarrow.parquet.write_table.
+        """
+        table = self.to_arrow()
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path, **kwargs)
+
+    def to_csv(self, path_or_file):
+        """Write the table to a CSV file with a header, empty values as
+        empty cells.
+        """
+        if isinstance(path_or_file, str):
+            with open(path_or_file, 'w', newline='') as f:
+                return self.to_csv(f)
+
+        writer = csv.writer(path_or_file)
+        writer.writerow(self.names)
+        writer.writerows(
+            zip(*[self._get_values(name) for name in self.names]))
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+import time
+import logging
+import threading
+
+from collections import deque
+
+# answers meaning the server is overloaded, e.g. S3 503 SlowDown
+OVERLOAD_STATUS = (429, 500, 502, 503, 504)
+# seconds of transfers used to measure the current throughput
+RATE_WINDOW = 10.0
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled with rate tokens per second, holding at most
+    burst tokens. Callers take tokens in advance and wait for the debt
+    to be paid, so concurrent callers share rate fairly.
+
+    Params:
+        - rate: tokens per second
+        - burst: tokens available at once, rate by default
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "TokenBucket ({}/s)".format(self.rate)
+
+    def acquire(self, amount=1):
+        """Take amount tokens, sleeping until they are available.
+        Returns the seconds waited.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.burst,
+                self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait:
+            self._sleep(wait)
+        return wait
+
+
+class RateLimiter:
+    """
+    Global limit of bytes and requests per second shared by every
+    transfer and probe of an HTTPTransport, and counters of what went
+    through it.
+
+    Params:
+        - bytes_per_second: max bytes received per second, None for no
+          limit
+        - requests_per_second: max requests sent per second, None for no
+          limit
+    """
+
+    def __init__(self, bytes_per_second=None, requests_per_second=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.bytes_per_second = bytes_per_second
+        self.requests_per_second = requests_per_second
+        self._bytes = TokenBucket(
+            bytes_per_second, clock=clock, sleep=sleep) \
+            if bytes_per_second else None
+        self._requests = TokenBucket(
+            requests_per_second, clock=clock, sleep=sleep) \
+            if requests_per_second else None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.requests = 0
+        self.bytes = 0
+        self.waited = 0.0
+
+    def __repr__(self):
+        return "RateLimiter ({} bytes/s, {} requests/s)".format(
+            self.bytes_per_second, self.requests_per_second)
+
+    def request(self):
+        """Wait for a request to be allowed."""
+        waited = self._requests.acquire() if self._requests else 0
+        with self._lock:
+            self.requests += 1
+            self.waited += waited
+
+    def consume(self, size):
+        """Count size bytes received, waiting when over the limit."""
+        waited = self._bytes.acquire(size) if self._bytes else 0
+        now = self._clock()
+        with self._lock:
+            self.bytes += size
+            self.waited += waited
+            self._recent.append((now, size))
+            while self._recent and now - self._recent[0][0] > RATE_WINDOW:
+                self._recent.popleft()
+
+    def get_throughput(self):
+        """Bytes per second received over the last RATE_WINDOW seconds."""
+        now = self._clock()
+        with self._lock:
+            recent = [size for at, size in self._recent
+                      if now - at <= RATE_WINDOW]
+        return sum(recent) / RATE_WINDOW
+
+    def stats(self):
+        return {
+            "bytes_per_second_limit": self.bytes_per_second,
+            "requests_per_second_limit": self.requests_per_second,
+            "bytes": self.bytes,
+            "requests": self.requests,
+            "throughput": self.get_throughput(),
+            "waited": self.waited,
+        }
+
+
+class _Slot:
+    """A request in flight, see AdaptiveConcurrency.slot."""
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency
+        self.failed = False
+        self.latency = None
+        self.size = 0
+
+    def __enter__(self):
+        if self.concurrency is not None:
+            self.concurrency.acquire()
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if self.concurrency is not None:
+            self.concurrency.release()
+            latency = self.latency
+            if latency is None:
+                latency = time.monotonic() - self.started
+            self.concurrency.record(
+                exc_type is None and not self.failed, latency, self.size)
+
+
+def null_slot():
+    """A slot that doesn't limit nor record anything."""
+    return _Slot()
+
+
+class AdaptiveConcurrency:
+    """
+    Limit of requests in flight adjusted AIMD style: after each round of
+    limit successful requests it grows by increase while the throughput
+    doesn't drop, and on an error, an overloaded answer or latency rising
+    above latency_tolerance times the best seen, it is multiplied by
+    decrease.
+
+    Params:
+        - initial: starting limit
+        - minimum, maximum: bounds of the limit
+        - increase: added to the limit after a good round
+        - decrease: factor applied to the limit on congestion
+        - latency_tolerance: latency over the best one seen taken as
+          congestion
+    """
+
+    def __init__(
+        self, initial=8, minimum=1, maximum=64, increase=1, decrease=0.5,
+        latency_tolerance=3.0
+    ):
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.successes = 0
+        self.errors = 0
+        self._condition = threading.Condition()
+        self._best_latency = None
+        self._latency = None
+        self._last_throughput = None
+        self._reset_round()
+
+    def __repr__(self):
+        return "AdaptiveConcurrency (limit {})".format(int(self.limit))
+
+    def _reset_round(self):
+        self._round_count = 0
+        self._round_size = 0
+        self._round_started = time.monotonic()
+
+    def slot(self):
+        """Context manager holding a request slot, waiting for one when
+        limit requests are in flight, and recording the outcome: set
+        failed on the slot for overloaded answers, latency to the time
+        until the headers arrived and size to the bytes received.
+        """
+        return _Slot(self)
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def _shrink(self, reason):
+        limit = max(self.minimum, self.limit * self.decrease)
+        if int(limit) != int(self.limit):
+            logger.debug('concurrency {} -> {}: {}'.format(
+                int(self.limit), int(limit), reason))
+        self.limit = limit
+        self._last_throughput = None
+        self._reset_round()
+
+    def record(self, success, latency=None, size=0):
+        """Adjust the limit with the outcome of a request."""
+        with self._condition:
+            if not success:
+                self.errors += 1
+                self._shrink('error')
+                return
+
+            self.successes += 1
+            if latency is not None:
+                self._latency = latency if self._latency is None else \
+                    0.8 * self._latency + 0.2 * latency
+                if self._best_latency is None or latency < self._best_latency:
+                    self._best_latency = latency
+                if self._best_latency and self._latency > \
+                        self.latency_tolerance * self._best_latency:
+                    self._latency = None
+                    self._shrink('latency')
+                    return
+
+            self._round_count += 1
+            self._round_size += size
+            if self._round_count < int(self.limit):
+                return
+
+            elapsed = time.monotonic() - self._round_started
+            throughput = self._round_size / elapsed if elapsed > 0 else 0
+            if self._last_throughput is None or \
+                    throughput >= 0.95 * self._last_throughput:
+                self.limit = min(self.maximum, self.limit + self.increase)
+                self._condition.notify_all()
+            self._last_throughput = throughput
+            self._reset_round()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "successes": self.successes,
+                "errors": self.errors,
+                "latency": self._latency,
+            }
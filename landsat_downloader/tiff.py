@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+import zlib
+import struct
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .compat import np, require_numpy
+from .exceptions import UnsupportedTiffError
+
+# bytes read at once from the start of a file, enough for the header and
+# the offset tables of a Landsat band
+HEADER_SIZE = 64 * 1024
+# ranges closer than this are read with a single request
+MAX_GAP = 16 * 1024
+MAX_WORKERS = 8
+
+IMAGE_WIDTH = 256
+IMAGE_LENGTH = 257
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+STRIP_OFFSETS = 273
+SAMPLES_PER_PIXEL = 277
+ROWS_PER_STRIP = 278
+STRIP_BYTE_COUNTS = 279
+PLANAR_CONFIGURATION = 284
+PREDICTOR = 317
+TILE_WIDTH = 322
+TILE_LENGTH = 323
+TILE_OFFSETS = 324
+TILE_BYTE_COUNTS = 325
+SAMPLE_FORMAT = 339
+
+NO_COMPRESSION = 1
+DEFLATE = (8, 32946)
+
+# struct format of each TIFF field type
+FIELD_TYPES = {
+    1: 'B', 2: 's', 3: 'H', 4: 'I', 6: 'b', 7: 'B', 8: 'h', 9: 'i',
+    11: 'f', 12: 'd', 16: 'Q', 17: 'q',
+}
+SAMPLE_KINDS = {1: 'u', 2: 'i', 3: 'f'}
+
+logger = logging.getLogger(__name__)
+
+
+class TiffLayout:
+    """
+    Layout of the first image of a TIFF file: size, data type and where
+    each tile or strip, called blocks here, is stored. Strips are handled
+    as tiles as wide as the image.
+
+    Params:
+        - read: function(offset, size) returning size bytes of the file
+          from offset, e.g. through HTTP range requests
+        - header_size: bytes read at once from the start of the file
+    """
+
+    def __init__(self, read, header_size=HEADER_SIZE):
+        require_numpy('to read rasters')
+        self._read = read
+        self._header = read(0, header_size)
+
+        order = self._header[:2]
+        if order not in (b'II', b'MM'):
+            raise UnsupportedTiffError('not a TIFF file')
+        self.byte_order = '<' if order == b'II' else '>'
+
+        version, ifd_offset = struct.unpack(
+            self.byte_order + 'HI', self._get(2, 6))
+        if version == 43:
+            raise UnsupportedTiffError('BigTIFF files are not supported')
+        if version != 42:
+            raise UnsupportedTiffError('not a TIFF file')
+
+        tags = self._read_ifd(ifd_offset)
+        self._header = None
+
+        def tag(code, default=None):
+            value = tags.get(code, default)
+            if value is None:
+                raise UnsupportedTiffError('TIFF tag {} missing'.format(code))
+            return value
+
+        self.width = tag(IMAGE_WIDTH)[0]
+        self.height = tag(IMAGE_LENGTH)[0]
+        self.samples = tag(SAMPLES_PER_PIXEL, [1])[0]
+        self.compression = tag(COMPRESSION, [NO_COMPRESSION])[0]
+        self.predictor = tag(PREDICTOR, [1])[0]
+        self.planar = tag(PLANAR_CONFIGURATION, [1])[0]
+        bits = tag(BITS_PER_SAMPLE, [1])
+        sample_format = tag(SAMPLE_FORMAT, [1])[0]
+
+        if self.samples != 1:
+            raise UnsupportedTiffError(
+                '{} samples per pixel, only single band rasters are '
+                'supported'.format(self.samples))
+        if bits[0] % 8 or sample_format not in SAMPLE_KINDS:
+            raise UnsupportedTiffError(
+                'unsupported sample type: {} bits, format {}'.format(
+                    bits[0], sample_format))
+        if self.compression != NO_COMPRESSION and \
+                self.compression not in DEFLATE:
+            raise UnsupportedTiffError(
+                'unsupported compression {}'.format(self.compression))
+        if self.predictor not in (1, 2):
+            raise UnsupportedTiffError(
+                'unsupported predictor {}'.format(self.predictor))
+
+        self.dtype = np.dtype('{}{}{}'.format(
+            self.byte_order, SAMPLE_KINDS[sample_format], bits[0] // 8))
+
+        if TILE_OFFSETS in tags:
+            self.tiled = True
+            self.block_width = tag(TILE_WIDTH)[0]
+            self.block_height = tag(TILE_LENGTH)[0]
+            self.offsets = tag(TILE_OFFSETS)
+            self.byte_counts = tag(TILE_BYTE_COUNTS)
+        else:
+            self.tiled = False
+            self.block_width = self.width
+            self.block_height = min(
+                tag(ROWS_PER_STRIP, [self.height])[0], self.height)
+            self.offsets = tag(STRIP_OFFSETS)
+            self.byte_counts = tag(STRIP_BYTE_COUNTS)
+
+        self.blocks_across = -(-self.width // self.block_width)
+        self.blocks_down = -(-self.height // self.block_height)
+        if len(self.offsets) < self.blocks_across * self.blocks_down:
+            raise UnsupportedTiffError('incomplete block offsets')
+
+    def __repr__(self):
+        return "TiffLayout ({}x{} {}, {} {}x{} blocks)".format(
+            self.width, self.height, self.dtype.name,
+            'tiled' if self.tiled else 'stripped', self.block_width,
+            self.block_height)
+
+    @property
+    def shape(self):
+        return (self.height, self.width)
+
+    def _get(self, offset, size):
+        """size bytes from offset, from the header when already read."""
+        if self._header is not None and offset + size <= len(self._header):
+            return self._header[offset:offset + size]
+        return self._read(offset, size)
+
+    def _read_ifd(self, offset):
+        """Tags of the IFD at offset, as a dict of value lists."""
+        order = self.byte_order
+        count = struct.unpack(order + 'H', self._get(offset, 2))[0]
+        entries = self._get(offset + 2, count * 12)
+
+        tags = {}
+        for i in range(count):
+            code, field_type, values_count, value = struct.unpack(
+                order + 'HHI4s', entries[i * 12:i * 12 + 12])
+            if field_type not in FIELD_TYPES:
+                continue
+
+            fmt = FIELD_TYPES[field_type]
+            size = struct.calcsize(fmt) * values_count
+            if size > 4:
+                value = self._get(
+                    struct.unpack(order + 'I', value)[0], size)
+            if fmt == 's':
+                tags[code] = [value[:values_count]]
+            else:
+                tags[code] = list(struct.unpack(
+                    '{}{}{}'.format(order, values_count, fmt),
+                    value[:size]))
+        return tags
+
+    def get_block_rows(self, index):
+        """Rows stored by block index, less than block_height for the last
+        strip.
+        """
+        if self.tiled:
+            return self.block_height
+        return min(self.block_height,
+                   self.height - (index // self.blocks_across) *
+                   self.block_height)
+
+    def get_block_indexes(self, window):
+        """Indexes of the blocks covering window, see check_window."""
+        (row_start, row_stop), (col_start, col_stop) = window
+        return [
+            block_row * self.blocks_across + block_col
+            for block_row in range(row_start // self.block_height,
+                                   (row_stop - 1) // self.block_height + 1)
+            for block_col in range(col_start // self.block_width,
+                                   (col_stop - 1) // self.block_width + 1)
+        ]
+
+    def check_window(self, window):
+        """
+        Params:
+            - window: ((row_start, row_stop), (col_start, col_stop)) in
+              pixels, stops excluded, as rasterio windows
+
+        Returns:
+            The window as a tuple of int tuples
+
+        Raises:
+            ValueError when the window is empty or out of the image
+        """
+        try:
+            (row_start, row_stop), (col_start, col_stop) = window
+        except (TypeError, ValueError):
+            raise ValueError(
+                'window must be ((row_start, row_stop), '
+                '(col_start, col_stop))')
+
+        window = ((int(row_start), int(row_stop)),
+                  (int(col_start), int(col_stop)))
+        for (start, stop), size in zip(window, self.shape):
+            if not 0 <= start < stop <= size:
+                raise ValueError('window {} out of the {}x{} image'.format(
+                    window, self.height, self.width))
+        return window
+
+    def decode_block(self, data, index):
+        """Pixels of block index from its stored bytes, as a 2D array."""
+        rows = self.get_block_rows(index)
+        if self.compression in DEFLATE:
+            data = zlib.decompress(data)
+
+        block = np.frombuffer(data, dtype=self.dtype)
+        block = block[:rows * self.block_width].reshape(
+            rows, self.block_width)
+
+        if self.predictor == 2:
+            # horizontal differencing, integer sums wrap as the encoder's
+            block = np.cumsum(block, axis=1, dtype=self.dtype)
+        return block
+
+
+def coalesce_ranges(ranges, max_gap=MAX_GAP):
+    """
+    Join byte ranges closer than max_gap bytes.
+
+    Params:
+        - ranges: list of (offset, size, key)
+
+    Returns:
+        A list of (offset, size, members) sorted by offset, with members
+        the (offset, size, key) of the ranges joined
+    """
+    merged = []
+    for offset, size, key in sorted(ranges, key=lambda item: item[:2]):
+        if merged and offset - (merged[-1][0] + merged[-1][1]) <= max_gap:
+            start = merged[-1][0]
+            end = max(merged[-1][0] + merged[-1][1], offset + size)
+            merged[-1] = (start, end - start, merged[-1][2])
+            merged[-1][2].append((offset, size, key))
+        else:
+            merged.append((offset, size, [(offset, size, key)]))
+    return merged
+
+
+def read_window(
+    read, layout, window, max_gap=MAX_GAP, max_workers=MAX_WORKERS
+):
+    """
+    Read the pixels of window fetching only the blocks covering it, with
+    the ranges of nearby blocks joined and fetched in parallel.
+
+    Params:
+        - read: function(offset, size) returning bytes, see TiffLayout
+        - layout: TiffLayout of the file
+        - window: ((row_start, row_stop), (col_start, col_stop))
+        - max_gap: ranges closer than this many bytes are read at once
+        - max_workers: max ranges read at once
+
+    Returns:
+        A 2D NumPy array with the pixels of window
+    """
+    window = layout.check_window(window)
+    (row_start, row_stop), (col_start, col_stop) = window
+    out = np.zeros(
+        (row_stop - row_start, col_stop - col_start),
+        dtype=layout.dtype.newbyteorder('='))
+
+    ranges = [
+        (layout.offsets[index], layout.byte_counts[index], index)
+        for index in layout.get_block_indexes(window)
+        if layout.byte_counts[index]
+    ]
+    merged = coalesce_ranges(ranges, max_gap)
+    logger.debug('{} blocks read with {} requests'.format(
+        len(ranges), len(merged)))
+
+    def fetch(merged_range):
+        return read(merged_range[0], merged_range[1])
+
+    with ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(merged)))) as executor:
+        for (start, _, members), data in zip(
+                merged, executor.map(fetch, merged)):
+            for offset, size, index in members:
+                block = layout.decode_block(
+                    data[offset - start:offset - start + size], index)
+                _copy_block(out, block, index, layout, window)
+
+    return out
+
+
+def _copy_block(out, block, index, layout, window):
+    """Copy the part of block inside window into out."""
+    (row_start, row_stop), (col_start, col_stop) = window
+    top = (index // layout.blocks_across) * layout.block_height
+    left = (index % layout.blocks_across) * layout.block_width
+
+    rows = slice(max(row_start, top),
+                 min(row_stop, top + block.shape[0]))
+    cols = slice(max(col_start, left),
+                 min(col_stop, left + block.shape[1], layout.width))
+    out[rows.start - row_start:rows.stop - row_start,
+        cols.start - col_start:cols.stop - col_start] = \
+        block[rows.start - top:rows.stop - top,
+              cols.start - left:cols.stop - left]
+
+
+def memmap_tiff(path, mode='r'):
+    """
+    Memory-map the pixels of a local TIFF as a 2D NumPy array without
+    reading them. Pages are loaded on access and shared by every process
+    mapping the same file.
+    Only uncompressed files stored in strips one after the other can be
+    mapped; Cloud Optimized GeoTIFFs, tiled and compressed, can be read
+    with read_window instead.
+
+    Params:
+        - mode: 'r' read only, 'c' copy on write or 'r+' to write the file
+
+    Returns:
+        A numpy.memmap of shape (height, width)
+
+    Raises:
+        UnsupportedTiffError when the layout can't be mapped
+    """
+    with open(path, 'rb') as f:
+        def read(offset, size):
+            f.seek(offset)
+            return f.read(size)
+
+        try:
+            layout = TiffLayout(read)
+        except UnsupportedTiffError as exc:
+            raise UnsupportedTiffError('{}: {}'.format(path, exc))
+
+    if layout.compression != NO_COMPRESSION:
+        raise UnsupportedTiffError(
+            '{}: compressed ({}) files can\'t be memory-mapped, use '
+            'read_window'.format(path, layout.compression))
+    if layout.predictor != 1:
+        raise UnsupportedTiffError(
+            '{}: files with a predictor can\'t be memory-mapped'.format(path))
+    if layout.tiled:
+        raise UnsupportedTiffError(
+            '{}: tiled files can\'t be memory-mapped as a single array, '
+            'use read_window'.format(path))
+
+    row_size = layout.width * layout.dtype.itemsize
+    position = layout.offsets[0]
+    for index in range(layout.blocks_down):
+        size = layout.get_block_rows(index) * row_size
+        if layout.offsets[index] != position or \
+                layout.byte_counts[index] < size:
+            raise UnsupportedTiffError(
+                '{}: strips are not stored one after the other'.format(path))
+        position += size
+
+    return np.memmap(
+        path, dtype=layout.dtype, mode=mode, offset=layout.offsets[0],
+        shape=layout.shape)
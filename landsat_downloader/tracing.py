@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import random
+import threading
+
+from collections import deque
+
+SERVICE_NAME = 'landsat_downloader'
+
+# OpenTelemetry status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_default_tracer = None
+_default_tracer_lock = threading.Lock()
+_local = threading.local()
+
+
+class _NullSpan:
+    """Span of the no-op Tracer."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_null_span = _NullSpan()
+
+
+class Tracer:
+    """
+    Span tracing API, doing nothing: the default. Its spans are a shared
+    no-op, and enabled is False so callers skip timing only reported as
+    span attributes, e.g. the writes of a download.
+
+        - span(name, **attributes): context manager timing a phase, a
+          child of the span the thread is in
+        - wrap(fn): fn running in the span of the calling thread, to be
+          run by another thread
+    """
+
+    enabled = False
+
+    def __repr__(self):
+        return "Tracer (disabled)"
+
+    def span(self, name, **attributes):
+        return _null_span
+
+    def wrap(self, fn):
+        return fn
+
+
+class Span:
+    """
+    A timed phase: name, attributes, e.g. scene_id or band, and the span
+    it is part of. Spans are created by Tracer.span, and recorded by the
+    tracer once done.
+
+    Params:
+        - tracer: SpanRecorder the span is recorded by
+        - name: phase
+        - parent: enclosing Span, None for a root span
+        - attributes: dict of str, int, float or bool by name
+    """
+
+    def __init__(self, tracer, name, parent=None, attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.trace_id = parent.trace_id if parent else random.getrandbits(128)
+        self.span_id = random.getrandbits(64)
+        self.status = STATUS_UNSET
+        self.start = None
+        self.duration = None
+        self.thread = threading.current_thread()
+        self._started = None
+
+    def __repr__(self):
+        return "Span {} ({})".format(self.name, self.attributes)
+
+    @property
+    def parent_id(self):
+        return self.parent.span_id if self.parent else None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        _push(self)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.duration = time.perf_counter() - self._started
+        _pop(self)
+        if exc_type is None or issubclass(exc_type, GeneratorExit):
+            # a generator closed early isn't an error
+            self.status = STATUS_OK
+        else:
+            self.status = STATUS_ERROR
+            self.attributes['error'] = '{}: {}'.format(
+                exc_type.__name__, exc)
+        self.tracer.record(self)
+
+
+def _stack():
+    if not hasattr(_local, 'spans'):
+        _local.spans = []
+    return _local.spans
+
+
+def _push(span):
+    _stack().append(span)
+
+
+def _pop(span):
+    spans = _stack()
+    if spans and spans[-1] is span:
+        spans.pop()
+    elif span in spans:
+        spans.remove(span)
+
+
+def get_current_span():
+    """Innermost span the calling thread is in, None outside of any."""
+    spans = _stack()
+    return spans[-1] if spans else None
+
+
+class SpanRecorder(Tracer):
+    """
+    Tracer keeping the spans in memory once done, exported as Chrome
+    trace events, to open in chrome://tracing or Perfetto, or as
+    OpenTelemetry (OTLP JSON) records.
+
+    Params:
+        - max_spans: spans kept, the oldest dropped beyond, None for all
+    """
+
+    enabled = True
+
+    def __init__(self, max_spans=None):
+        self.max_spans = max_spans
+        self.dropped = 0
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "SpanRecorder ({} spans)".format(len(self._spans))
+
+    def span(self, name, **attributes):
+        return Span(self, name, get_current_span(), attributes)
+
+    def wrap(self, fn):
+        parent = get_current_span()
+        if parent is None:
+            return fn
+
+        def run(*args, **kwargs):
+            _push(parent)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _pop(parent)
+
+        return run
+
+    def record(self, span):
+        with self._lock:
+            if len(self._spans) == self.max_spans:
+                self.dropped += 1
+            self._spans.append(span)
+
+    def get_spans(self, name=None):
+        """Done spans in the order they ended, only the name ones if
+        given.
+        """
+        with self._lock:
+            spans = list(self._spans)
+        if name is not None:
+            spans = [span for span in spans if span.name == name]
+        return spans
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self.dropped = 0
+
+    def to_chrome_trace(self):
+        """
+        Done spans in the Chrome trace event format: a complete ("X")
+        event by span, in microseconds, and the name of each thread.
+        """
+        events = []
+        threads = {}
+        pid = os.getpid()
+        for span in self.get_spans():
+            tid = span.thread.ident
+            if tid not in threads:
+                threads[tid] = span.thread.name
+                events.append({
+                    "name": "thread_name", "ph": "M", "pid": pid,
+                    "tid": tid, "args": {"name": span.thread.name}
+                })
+            args = dict(span.attributes)
+            args["span_id"] = '{:016x}'.format(span.span_id)
+            if span.parent is not None:
+                args["parent_id"] = '{:016x}'.format(span.parent_id)
+            events.append({
+                "name": span.name,
+                "cat": span.name.split('.')[0],
+                "ph": "X",
+                "ts": span.start * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": args
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        """Write to_chrome_trace to path as JSON."""
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+    def to_otlp(self, service_name=SERVICE_NAME):
+        """
+        Done spans as an OTLP JSON ExportTraceServiceRequest, to post to
+        an OpenTelemetry collector (/v1/traces) or load with its file
+        receiver.
+        """
+        spans = []
+        for span in self.get_spans():
+            end = span.start + span.duration
+            record = {
+                "traceId": '{:032x}'.format(span.trace_id),
+                "spanId": '{:016x}'.format(span.span_id),
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(int(span.start * 1e9)),
+                "endTimeUnixNano": str(int(end * 1e9)),
+                "attributes": _to_otlp_attributes(dict(
+                    span.attributes, **{"thread.name": span.thread.name})),
+                "status": {"code": span.status}
+            }
+            if span.parent is not None:
+                record["parentSpanId"] = '{:016x}'.format(span.parent_id)
+            spans.append(record)
+
+        return {"resourceSpans": [{
+            "resource": {"attributes": _to_otlp_attributes(
+                {"service.name": service_name})},
+            "scopeSpans": [{
+                "scope": {"name": SERVICE_NAME},
+                "spans": spans
+            }]
+        }]}
+
+    def write_otlp(self, path, service_name=SERVICE_NAME):
+        """Write to_otlp to path as JSON."""
+        with open(path, 'w') as f:
+            json.dump(self.to_otlp(service_name), f)
+
+
+def _to_otlp_attributes(attributes):
+    result = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            value = {"boolValue": value}
+        elif isinstance(value, int):
+            value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            value = {"doubleValue": value}
+        else:
+            value = {"stringValue": str(value)}
+        result.append({"key": key, "value": value})
+    return result
+
+
+def get_default_tracer():
+    """Returns the tracer every component records its spans with, a no-op
+    Tracer unless set_default_tracer was called.
+    """
+    global _default_tracer
+
+    if _default_tracer is None:
+        with _default_tracer_lock:
+            if _default_tracer is None:
+                _default_tracer = Tracer()
+
+    return _default_tracer
+
+
+def set_default_tracer(tracer):
+    """Record every span with tracer, e.g. a SpanRecorder, or with a no-op
+    Tracer again with None.
+    """
+    global _default_tracer
+
+    with _default_tracer_lock:
+        _default_tracer = tracer or Tracer()
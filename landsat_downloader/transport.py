@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from .exceptions import IncompleteDownloadError
+from .metrics import get_default_metrics
+from .retry import Resilience
+from .throttle import OVERLOAD_STATUS, null_slot
+from .tracing import get_current_span, get_default_tracer
+
+POOL_SIZE = 16
+TIMEOUT = (10, 60)
+CHUNK_SIZE = 1024 * 1024
+SEGMENT_SIZE = 16 * 1024 * 1024
+MAX_SEGMENTS = 8
+# errors of a request worth trying again
+TRANSIENT_ERRORS = (
+    requests.ConnectionError, requests.Timeout,
+    requests.exceptions.ChunkedEncodingError)
+
+logger = logging.getLogger(__name__)
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+_buffers = threading.local()
+
+
+def _get_buffer(size):
+    """Returns a buffer of size bytes, reused by every download of the
+    calling thread.
+    """
+    buffer = getattr(_buffers, 'buffer', None)
+    if buffer is None or len(buffer) != size:
+        buffer = _buffers.buffer = bytearray(size)
+    return buffer
+
+
+def _read_body(response, view):
+    """Read the next bytes of a streamed response into view. Returns the
+    count read, 0 at the end. A connection dropped or timing out
+    mid-body raises the requests error, as iter_content does, rather
+    than the urllib3 one.
+    """
+    try:
+        return response.raw.readinto(view)
+    except ProtocolError as e:
+        raise requests.ConnectionError(e, response=response)
+    except ReadTimeoutError as e:
+        raise requests.exceptions.ReadTimeout(e, response=response)
+
+
+def commit_part(part_path, file_path, verify=None):
+    """Rename the complete part_path to file_path. With verify, it is
+    called with part_path first, and part_path is removed, file_path left
+    as it was, when it raises.
+    """
+    if verify is not None:
+        try:
+            verify(part_path)
+        except Exception:
+            os.remove(part_path)
+            raise
+    os.replace(part_path, file_path)
+
+
+def get_segments_count(size, max_segments=MAX_SEGMENTS):
+    """Number of segments for a file of size bytes: one for each
+    SEGMENT_SIZE bytes, at least one and at most max_segments.
+    """
+    return max(1, min(max_segments, size // SEGMENT_SIZE))
+
+
+def split_ranges(size, segments):
+    """Split size bytes into segments (start, end) inclusive ranges."""
+    step = -(-size // segments)
+    return [(start, min(start + step, size) - 1)
+            for start in range(0, size, step)]
+
+
+class HTTPTransport:
+    """
+    HTTP client shared by finder and downloaders.
+    Connections are kept alive and pooled per host, so every HEAD/GET to
+    the same server reuses an open TCP/TLS connection.
+    One instance is meant to be shared by every thread of a program, and
+    so are the Resilience, RateLimiter, AdaptiveConcurrency, HeadCache,
+    SourceRegistry and other helpers given to it or to downloads: all of
+    them lock their own state.
+
+    Params:
+        - pool_connections: number of hosts with a connection pool
+        - pool_size: max connections kept open for each host
+        - timeout: seconds as a number or (connect, read) tuple
+        - chunk_size: bytes read from the network at a time on downloads
+        - rate_limiter: RateLimiter of the bytes and requests per second of
+          every transfer and probe, None for no limit
+        - concurrency: AdaptiveConcurrency limiting the requests in flight
+          from every thread, None for no limit
+        - resilience: Resilience with the retry policy and circuit breaker
+          of each host, retrying timeouts, connection errors and 408, 429
+          and 5xx answers by default
+    """
+
+    def __init__(
+        self, pool_connections=POOL_SIZE, pool_size=POOL_SIZE,
+        timeout=TIMEOUT, chunk_size=CHUNK_SIZE, rate_limiter=None,
+        concurrency=None, resilience=None
+    ):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.chunk_size = chunk_size
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.resilience = resilience or Resilience()
+        self.session = requests.Session()
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_size,
+            pool_block=True
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __repr__(self):
+        return "HTTPTransport (pool size {})".format(self.pool_size)
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the pooled session, within the rate and
+        concurrency limits. Streamed responses don't hold a concurrency
+        slot, callers reading the body take one with _slot.
+
+        Transient failures are retried following the policy of the host,
+        the last answer is returned or the last error raised. Raises
+        CircuitOpenError without sending anything while the host is down.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.resilience.call(
+            url, lambda: self._send(method, url, **kwargs), TRANSIENT_ERRORS)
+
+    def _send(self, method, url, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.request()
+        if kwargs.get('stream'):
+            return self.session.request(method, url, **kwargs)
+
+        with self._slot() as slot:
+            response = self.session.request(method, url, **kwargs)
+            self._track(slot, response)
+            slot.size = len(response.content)
+            self._consume(slot.size)
+        return response
+
+    def _slot(self):
+        if self.concurrency is None:
+            return null_slot()
+        return self.concurrency.slot()
+
+    def _track(self, slot, response):
+        """Record the latency and status of response on slot."""
+        slot.latency = response.elapsed.total_seconds()
+        slot.failed = response.status_code in OVERLOAD_STATUS
+
+    def _consume(self, size):
+        """Count size bytes received, waiting when over the rate limit."""
+        get_default_metrics().increment('landsat_received_bytes_total', size)
+        if self.rate_limiter is not None and size:
+            self.rate_limiter.consume(size)
+
+    def stats(self):
+        """Current limits and throughput, for monitoring."""
+        return {
+            "rate": self.rate_limiter.stats()
+            if self.rate_limiter is not None else None,
+            "concurrency": self.concurrency.stats()
+            if self.concurrency is not None else None,
+            "circuits": self.resilience.stats(),
+        }
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def get_range(self, url, offset, size):
+        """Returns size bytes of url from offset, or fewer at the end of
+        the file, with a Range request.
+        """
+        response = self.get(url, headers={
+            'Range': 'bytes={}-{}'.format(offset, offset + size - 1)})
+        if response.status_code == 416:
+            return b''
+        response.raise_for_status()
+        if response.status_code == 206:
+            return response.content
+        # the server ignored the range and sent the whole file
+        return response.content[offset:offset + size]
+
+    def download(
+        self, url, file_path, chunk_size=None, size=None, segments=1,
+        hashers=(), verify=None
+    ):
+        """Stream url into file_path. Returns the size of the file.
+
+        Bytes are written to <file_path>.part, which is fsynced and renamed
+        to file_path only once complete, so file_path is never truncated.
+        When a .part file is left by an interrupted transfer, the download
+        resumes from its end with a Range request.
+
+        When the remote size is given and segments is not 1, the file is
+        split in byte ranges downloaded in parallel instead, see
+        download_segmented. segments=None picks the count from the size.
+
+        Every hashlib-like object in hashers is updated with the whole
+        content of the file as it is written. verify, when given, is
+        called with the complete .part path before the rename and can
+        reject it by raising, see commit_part.
+        """
+        part_path = file_path + '.part'
+        if size and segments != 1:
+            if segments is None:
+                segments = get_segments_count(size)
+            if segments > 1:
+                return self.download_segmented(
+                    url, file_path, size, segments, chunk_size, hashers,
+                    verify)
+
+        offset = os.path.getsize(part_path) \
+            if os.path.exists(part_path) else 0
+
+        headers = {}
+        if offset:
+            headers['Range'] = 'bytes={}-'.format(offset)
+
+        with get_default_tracer().span(
+                'http.get', url=url, offset=offset) as span, \
+                self._slot() as slot, \
+                self.get(url, headers=headers, stream=True) as response:
+            self._track(slot, response)
+            span.set_attribute('status', response.status_code)
+            # with an offset, .part doesn't match the remote file anymore
+            restart = response.status_code == 416 and offset > 0
+            if not restart:
+                response.raise_for_status()
+
+                if response.status_code != 206:
+                    offset = 0
+
+                expected = response.headers.get('content-length')
+                expected = offset + int(expected) if expected else None
+
+                size = self._write(
+                    response, part_path, offset,
+                    chunk_size or self.chunk_size, hashers)
+                slot.size = size - offset
+
+        if restart:
+            os.remove(part_path)
+            return self.download(
+                url, file_path, chunk_size, hashers=hashers, verify=verify)
+
+        if expected is not None and size != expected:
+            raise IncompleteDownloadError(
+                '{}: got {} of {} bytes'.format(url, size, expected))
+
+        commit_part(part_path, file_path, verify)
+        logger.debug('{} bytes from {} stored at {}'.format(
+            size, url, os.path.dirname(file_path)))
+        return size
+
+    def download_segmented(
+        self, url, file_path, size, segments, chunk_size=None, hashers=(),
+        verify=None
+    ):
+        """Download url as segments byte ranges fetched in parallel and
+        written in place into a preallocated <file_path>.part, renamed to
+        file_path once complete. Falls back to a single stream when the
+        server ignores Range requests. Returns the size of the file.
+
+        As segments arrive out of order, hashers are updated by reading
+        the file once all of them are written.
+        """
+        part_path = file_path + '.part'
+        chunk_size = chunk_size or self.chunk_size
+
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+
+        tracer = get_default_tracer()
+        fd = os.open(part_path, os.O_WRONLY)
+        try:
+            with tracer.span('http.get', url=url, segments=segments), \
+                    ThreadPoolExecutor(max_workers=segments) as executor:
+                download_range = tracer.wrap(self._download_range)
+                futures = [
+                    executor.submit(
+                        download_range, url, fd, start, end, chunk_size)
+                    for start, end in split_ranges(size, segments)
+                ]
+                ranged = all([future.result() for future in futures])
+            with tracer.span('fs.sync'):
+                os.fsync(fd)
+            if ranged and hashers:
+                with open(part_path, 'rb') as f:
+                    self._hash(f, size, chunk_size, hashers)
+        except Exception:
+            os.close(fd)
+            os.remove(part_path)
+            raise
+
+        os.close(fd)
+        if not ranged:
+            os.remove(part_path)
+            return self.download(
+                url, file_path, chunk_size, hashers=hashers, verify=verify)
+
+        commit_part(part_path, file_path, verify)
+        logger.debug('{} bytes from {} stored at {} in {} segments'.format(
+            size, url, os.path.dirname(file_path), segments))
+        return size
+
+    def _download_range(self, url, fd, start, end, chunk_size):
+        """Write bytes start-end of url at the same position of fd.
+        Returns False when the server doesn't answer with the range.
+        """
+        headers = {'Range': 'bytes={}-{}'.format(start, end)}
+        tracer = get_default_tracer()
+        with tracer.span(
+                'http.get_range', url=url, start=start, end=end) as span, \
+                self._slot() as slot, \
+                self.get(url, headers=headers, stream=True) as response:
+            self._track(slot, response)
+            span.set_attribute('status', response.status_code)
+            response.raise_for_status()
+            if response.status_code != 206:
+                return False
+
+            view = memoryview(_get_buffer(chunk_size))
+            position = start
+            writing = 0.0
+            while True:
+                read = _read_body(response, view)
+                if not read:
+                    break
+                if tracer.enabled:
+                    started = time.perf_counter()
+                written = 0
+                while written < read:
+                    written += os.pwrite(
+                        fd, view[written:read], position + written)
+                if tracer.enabled:
+                    writing += time.perf_counter() - started
+                position += read
+                self._consume(read)
+            slot.size = position - start
+            if tracer.enabled:
+                span.set_attribute('fs.write_seconds', writing)
+
+        if position != end + 1:
+            raise IncompleteDownloadError(
+                '{}: got bytes {}-{} of {}-{}'.format(
+                    url, start, position - 1, start, end))
+        return True
+
+    def _write(self, response, part_path, offset, chunk_size, hashers=()):
+        """Copy the response body into part_path starting at offset,
+        through a reused buffer. Returns the size of part_path.
+        When tracing, the seconds spent writing are set as
+        fs.write_seconds of the current span, the fsync is traced as
+        fs.sync.
+        """
+        buffer = _get_buffer(chunk_size)
+        view = memoryview(buffer)
+        tracer = get_default_tracer()
+        writing = 0.0
+
+        with open(part_path, 'r+b' if offset else 'wb') as f:
+            if offset and hashers:
+                self._hash(f, offset, chunk_size, hashers)
+            f.seek(offset)
+            f.truncate()
+            while True:
+                read = _read_body(response, view)
+                if not read:
+                    break
+                if tracer.enabled:
+                    started = time.perf_counter()
+                f.write(view[:read])
+                if tracer.enabled:
+                    writing += time.perf_counter() - started
+                for hasher in hashers:
+                    hasher.update(view[:read])
+                self._consume(read)
+
+            span = get_current_span()
+            if span is not None:
+                span.set_attribute('fs.write_seconds', writing)
+            with tracer.span('fs.sync', path=part_path):
+                f.flush()
+                os.fsync(f.fileno())
+            return f.tell()
+
+    def _hash(self, f, length, chunk_size, hashers):
+        """Update hashers with the first length bytes of f."""
+        view = memoryview(_get_buffer(chunk_size))
+        f.seek(0)
+        while length > 0:
+            read = f.readinto(view[:min(length, chunk_size)])
+            if not read:
+                break
+            for hasher in hashers:
+                hasher.update(view[:read])
+            length -= read
+
+    def close(self):
+        self.session.close()
+
+
+def get_default_transport():
+    """Returns the transport shared by every call without one.
+    Its Resilience is shared too: a circuit opened by the failures of a
+    caller fails the calls of every other one to that host, until it
+    recovers or transport.resilience.reset() is called.
+    """
+    global _default_transport
+
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = HTTPTransport()
+
+    return _default_transport
+
+
+def set_default_transport(transport):
+    """Replace the shared transport, e.g. to change pool size or timeout."""
+    global _default_transport
+
+    with _default_transport_lock:
+        _default_transport = transport
@@ -13,8 +13,6 @@ with open('HISTORY.rst') as history_file:
 
 requirements = [
     'Click>=6.0',
-    'homura==0.1.5',
-    'xmltodict==0.11.0',
     'requests==2.18.4'
 ]
 
@@ -22,6 +20,12 @@ setup_requirements = ['pytest-runner', ]
 
 test_requirements = ['pytest', ]
 
+extras_requirements = {
+    'async': ['aiohttp>=3.0'],
+    'numpy': ['numpy>=1.13'],
+    'arrow': ['numpy>=1.13', 'pyarrow>=0.9'],
+}
+
 setup(
     author="Dagnaldo Silva",
     author_email='dagnaldo.silva@hexgis.com',
@@ -31,7 +35,6 @@ setup(
         'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
         'Natural Language :: English',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
     ],
@@ -39,9 +42,11 @@ setup(
     entry_points={
         'console_scripts': [
             'landsat_downloader=landsat_downloader.cli:main',
+            'landsat-downloader=landsat_downloader.cli:main',
         ],
     },
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="GNU General Public License v3",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+
+"""Shared fixtures for `landsat_downloader` tests."""
+
+import os
+import json
+import hashlib
+import threading
+import socketserver
+
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+from http.server import SimpleHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from landsat_downloader.transport import get_default_transport
+
+
+INVENTORY_PATH = 'EE/InventoryStream/pathrow'
+
+
+def _inventory_xml(records):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<searchResponse xmlns="http://earthexplorer.usgs.gov/'
+        'EE/metadata.xsd">'
+    ]
+    for record in records:
+        lines.append('<metaData>')
+        lines.extend('<{0}>{1}</{0}>'.format(k, v) for k, v in record.items())
+        lines.append('</metaData>')
+    lines.append('</searchResponse>')
+    return '\n'.join(lines)
+
+
+def _filter_inventory(records, query):
+    """Records within the path, row and date ranges of an InventoryStream
+    query, as EarthExplorer does.
+    """
+    query = {k: v[0] for k, v in parse_qs(query).items()}
+    selected = []
+    for record in records:
+        if 'start_path' in query and not (
+                int(query['start_path']) <= record['path'] <=
+                int(query['end_path'])):
+            continue
+        if 'start_row' in query and not (
+                int(query['start_row']) <= record['row'] <=
+                int(query['end_row'])):
+            continue
+        if 'start_date' in query and not (
+                query['start_date'] <= record['acquisitionDate'] <=
+                query['end_date']):
+            continue
+        selected.append(record)
+    return selected
+
+
+class _RangeRequestHandler(SimpleHTTPRequestHandler):
+    """Serve files from `server.root` with HEAD, GET, Range and ETag,
+    and the EarthExplorer inventory published by publish_inventory.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def translate_path(self, path):
+        path = path.split('?', 1)[0].split('#', 1)[0].lstrip('/')
+        return os.path.join(self.server.root, *path.split('/'))
+
+    def _send_file(self, head_only):
+        self.server.hits.append((self.command, self.path))
+        self.server.clients.add(self.client_address)
+        file_path = self.translate_path(self.path)
+        url = urlparse(self.path)
+        failures = self.server.failures.get(url.path)
+        if failures:
+            self.send_response(failures.pop(0))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if url.path.lstrip('/') == INVENTORY_PATH and \
+                os.path.isfile(file_path + '.json'):
+            with open(file_path + '.json') as f:
+                records = json.load(f, object_pairs_hook=OrderedDict)
+            data = _inventory_xml(
+                _filter_inventory(records, url.query)).encode()
+        elif not os.path.isfile(file_path):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        else:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+
+        start, end = 0, len(data) - 1
+        status = 200
+        byte_range = self.headers.get('Range')
+        if byte_range and byte_range.startswith('bytes='):
+            first, last = byte_range[6:].split('-')
+            start = int(first) if first else 0
+            end = min(int(last), end) if last else end
+            status = 206
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+        self.send_response(status)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', '"{}"'.format(hashlib.md5(data).hexdigest()))
+        if status == 206:
+            self.send_header(
+                'Content-Range',
+                'bytes {}-{}/{}'.format(start, end, len(data)))
+        self.end_headers()
+
+        if not head_only:
+            self.wfile.write(data[start:end + 1])
+
+    def do_HEAD(self):
+        self._send_file(head_only=True)
+
+    def do_GET(self):
+        self._send_file(head_only=False)
+
+
+class _Server(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture(autouse=True)
+def reset_default_circuits():
+    """Close the circuits of the shared transport after each test, so
+    failures injected by one don't fail the next ones.
+    """
+    yield
+    get_default_transport().resilience.reset()
+
+
+@pytest.fixture
+def http_server(tmpdir):
+    """A local HTTP server serving `server.root`, a temporary folder.
+    Every request is recorded in `server.hits` as (method, path) and
+    every client connection in `server.clients`. The next requests of a
+    path are answered with the status codes listed in
+    `server.failures[path]`, e.g. {'/file.bin': [503, 503]}.
+    """
+    server = _Server(('127.0.0.1', 0), _RangeRequestHandler)
+    server.root = str(tmpdir.mkdir('remote'))
+    server.hits = []
+    server.clients = set()
+    server.failures = {}
+    server.url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_pds(http_server, monkeypatch):
+    """Point every AWS downloader to the local HTTP server."""
+    from landsat_downloader import downloader_base
+
+    monkeypatch.setattr(
+        downloader_base.AWSDownloaderCollection1Tiers, 'url',
+        http_server.url + 'c1/L8/')
+    monkeypatch.setattr(
+        downloader_base.AWSDownloaderCollection1RT, 'url',
+        http_server.url + 'c1/L8/')
+    monkeypatch.setattr(
+        downloader_base.AWSDownloaderPreCollection, 'url',
+        http_server.url + 'L8/')
+    return http_server
+
+
+@pytest.fixture
+def local_ee(http_server, monkeypatch):
+    """Point LandsatFinder to the local HTTP server."""
+    from landsat_downloader.finder import LandsatFinder
+
+    monkeypatch.setattr(
+        LandsatFinder, 'url', http_server.url + 'EE/InventoryStream/pathrow')
+    return http_server
+
+
+def publish_scene(root, prefix, considered_id, bands, size=1024):
+    """Create a fake scene folder as laid out on landsat-pds,
+    i.e. <prefix>/<path>/<row>/<id>/ with index.html, bands and MTL.
+    Returns the scene folder.
+    """
+    path_row = considered_id.split('_')[2] if '_' in considered_id \
+        else considered_id[3:9]
+    scene_dir = os.path.join(
+        root, prefix, path_row[:3], path_row[3:], considered_id)
+    os.makedirs(scene_dir)
+
+    with open(os.path.join(scene_dir, 'index.html'), 'w') as f:
+        f.write('<html></html>')
+
+    for i, band in enumerate(bands):
+        filename = '{}_{}.TIF'.format(considered_id, band)
+        with open(os.path.join(scene_dir, filename), 'wb') as f:
+            f.write(bytes([i % 256]) * (size + i))
+
+    with open(os.path.join(scene_dir, considered_id + '_MTL.txt'), 'w') as f:
+        f.write('GROUP = L1_METADATA_FILE\nEND_GROUP = L1_METADATA_FILE\n')
+
+    return scene_dir
+
+
+def make_downloader(server, scene_id, product_id, bands, size=1024):
+    """AWSDownloaderBase of a Collection 1 scene published on server
+    with bands, see publish_scene.
+    """
+    from landsat_downloader.downloader_base import AWSDownloaderBase
+    from landsat_downloader.scene_info import SceneInfo
+
+    publish_scene(server.root, 'c1/L8', product_id, bands, size=size)
+    scene_info = SceneInfo(scene_id=scene_id, product_id=product_id)
+    return AWSDownloaderBase(
+        scene_info.product_info, product_id, server.url + 'c1/L8/')
+
+
+class FakeClock:
+    """Clock for time.monotonic and time.sleep, moved only by sleep or
+    by setting now.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def publish_inventory(root, records):
+    """Serve records, a list of dicts, as the EarthExplorer InventoryStream
+    at <root>/EE/InventoryStream/pathrow. Each query gets the records
+    within its path, row and date ranges.
+    """
+    folder = os.path.join(root, 'EE', 'InventoryStream')
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    with open(os.path.join(folder, 'pathrow.json'), 'w') as f:
+        json.dump(records, f)
+
+
+def make_inventory_record(path, row, acq_date, cloud_cover=10.5):
+    """A metaData record of EarthExplorer for a Landsat 8 scene."""
+    julian = acq_date.strftime('%Y%j')
+    return OrderedDict([
+        ('browseAvailable', 'Y'),
+        ('sceneID', 'LC8{:03d}{:03d}{}LGN00'.format(path, row, julian)),
+        ('LANDSAT_PRODUCT_ID', 'LC08_L1TP_{:03d}{:03d}_{}_{}_01_T1'.format(
+            path, row, acq_date.strftime('%Y%m%d'),
+            acq_date.strftime('%Y%m%d'))),
+        ('sensor', 'OLI_TIRS'),
+        ('acquisitionDate', acq_date.strftime('%Y-%m-%d')),
+        ('path', path),
+        ('row', row),
+        ('cloudCover', cloud_cover),
+        ('sunElevation', 55.123),
+    ])
+
+
+def write_tiff(
+    path, array, tile=None, rows_per_strip=None, compression=1,
+    predictor=1, byte_order='<'
+):
+    """Write a single band 2D NumPy array as a baseline TIFF, tiled with
+    tile x tile blocks or in strips of rows_per_strip rows, uncompressed
+    (1) or deflate (8). The IFD and its arrays come first, as in a Cloud
+    Optimized GeoTIFF.
+    Returns the (offset, size) of each block.
+    """
+    import zlib
+    import struct
+    import numpy as np
+
+    height, width = array.shape
+    dtype = array.dtype.newbyteorder(byte_order)
+
+    blocks = []
+    if tile:
+        for top in range(0, height, tile):
+            for left in range(0, width, tile):
+                block = np.zeros((tile, tile), dtype=array.dtype)
+                part = array[top:top + tile, left:left + tile]
+                block[:part.shape[0], :part.shape[1]] = part
+                blocks.append(block)
+    else:
+        rows_per_strip = rows_per_strip or height
+        blocks = [array[top:top + rows_per_strip]
+                  for top in range(0, height, rows_per_strip)]
+
+    encoded = []
+    for block in blocks:
+        block = block.astype(dtype)
+        if predictor == 2:
+            block = block.copy()
+            block[:, 1:] = block[:, 1:] - block[:, :-1]
+        data = block.tobytes()
+        if compression == 8:
+            data = zlib.compress(data)
+        encoded.append(data)
+
+    entries = [
+        (256, 4, [width]),
+        (257, 4, [height]),
+        (258, 3, [array.dtype.itemsize * 8]),
+        (259, 3, [compression]),
+        (262, 3, [1]),
+        (277, 3, [1]),
+        (284, 3, [1]),
+        (317, 3, [predictor]),
+        (339, 3, [{'u': 1, 'i': 2, 'f': 3}[array.dtype.kind]]),
+    ]
+    counts = [len(data) for data in encoded]
+    if tile:
+        entries += [(322, 3, [tile]), (323, 3, [tile]),
+                    (324, 4, [0] * len(encoded)), (325, 4, counts)]
+    else:
+        entries += [(273, 4, [0] * len(encoded)), (278, 4, [rows_per_strip]),
+                    (279, 4, counts)]
+    entries.sort()
+
+    sizes = {3: 2, 4: 4}
+    extra_offset = 8 + 2 + 12 * len(entries) + 4
+    extra_size = sum(sizes[kind] * len(values) for _, kind, values in entries
+                     if sizes[kind] * len(values) > 4)
+    offset = extra_offset + extra_size
+    offsets = []
+    for data in encoded:
+        offsets.append(offset)
+        offset += len(data)
+    entries = [(code, kind, offsets if code in (273, 324) else values)
+               for code, kind, values in entries]
+
+    fmt = {3: 'H', 4: 'I'}
+    ifd = struct.pack(byte_order + 'H', len(entries))
+    extra = b''
+    for code, kind, values in entries:
+        packed = struct.pack(
+            '{}{}{}'.format(byte_order, len(values), fmt[kind]), *values)
+        if len(packed) > 4:
+            value = struct.pack(byte_order + 'I', extra_offset + len(extra))
+            extra += packed
+        else:
+            value = packed.ljust(4, b'\0')
+        ifd += struct.pack(byte_order + 'HHI', code, kind, len(values)) + \
+            value
+    ifd += struct.pack(byte_order + 'I', 0)
+
+    with open(path, 'wb') as f:
+        f.write((b'II' if byte_order == '<' else b'MM') +
+                struct.pack(byte_order + 'HI', 42, 8))
+        f.write(ifd)
+        f.write(extra)
+        for data in encoded:
+            f.write(data)
+
+    return list(zip(offsets, counts))
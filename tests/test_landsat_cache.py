@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import os
+import time
+
+from conftest import publish_scene
+from landsat_downloader.cache import HeadCache
+from landsat_downloader.catalog import Catalog
+from landsat_downloader.finder_cache import FinderCache
+from landsat_downloader.downloader import LandsatDownloader
+
+SCENE_ID = 'LC82240692018053LGN00'
+PRODUCT_ID = 'LC08_L1GT_224069_20180222_20180308_01_T2'
+PRODUCT_ID_RT = 'LC08_L1GT_224069_20180222_20180222_01_RT'
+URL = 'https://example.com/file.TIF'
+
+
+def test_head_cache_get_set(tmpdir):
+    cache = HeadCache(path=str(tmpdir.join('cache.sqlite')))
+    assert(cache.get(URL) is None)
+
+    cache.set(URL, True, 100, '"etag"')
+    result = cache.get(URL)
+    assert(result.exists is True)
+    assert(result.size == 100)
+    assert(result.etag == '"etag"')
+
+    # persisted on disk
+    cache.close()
+    assert(HeadCache(path=cache.path).get(URL).size == 100)
+
+
+def test_databases_in_relative_and_new_folders(tmpdir):
+    with tmpdir.as_cwd():
+        for cls, name in ((HeadCache, 'heads.sqlite'),
+                          (Catalog, 'cat.sqlite'),
+                          (FinderCache, 'fc.sqlite')):
+            cls(name).close()
+            cls(os.path.join('new', name)).close()
+            assert(os.path.exists(name))
+            assert(os.path.exists(os.path.join('new', name)))
+
+
+def test_head_cache_ttl():
+    cache = HeadCache(path=':memory:', ttl=60, negative_ttl=0)
+    cache.set(URL, True, 100)
+    cache.set(URL + '.missing', False)
+    time.sleep(0.01)
+
+    assert(cache.get(URL).exists is True)
+    assert(cache.get(URL + '.missing') is None)
+    assert(len(cache) == 1)
+
+
+def test_head_cache_lru():
+    cache = HeadCache(path=':memory:', max_entries=2)
+    cache.set(URL + '1', True, 1)
+    cache.set(URL + '2', True, 2)
+    cache.get(URL + '1')
+    cache.set(URL + '3', True, 3)
+
+    assert(len(cache) == 2)
+    assert(cache.get(URL + '2') is None)
+    assert(cache.get(URL + '1').size == 1)
+    assert(cache.get(URL + '3').size == 3)
+
+
+def test_head_cache_lookups_are_stored_lazily(tmpdir):
+    path = str(tmpdir.join('cache.sqlite'))
+    cache = HeadCache(path=path, max_entries=2)
+    cache.set(URL + '1', True, 1)
+    cache.set(URL + '2', True, 2)
+    changes = cache._connection.total_changes
+    cache.get(URL + '1')
+    assert(cache._connection.total_changes == changes)
+    cache.close()
+
+    cache = HeadCache(path=path, max_entries=2)
+    cache.set(URL + '3', True, 3)
+    assert(cache.get(URL + '2') is None)
+    assert(cache.get(URL + '1').size == 1)
+
+
+def test_synced_scene_makes_no_requests(local_pds, tmpdir):
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID_RT, ['BQA'])
+    cache = HeadCache(path=str(tmpdir.join('cache.sqlite')))
+    options = {
+        'bands': ['BQA'],
+        'scene_id': SCENE_ID,
+        'product_id': PRODUCT_ID,
+        'download_dir': str(tmpdir),
+        'head_cache': cache
+    }
+
+    imgs = LandsatDownloader.download_scene(**options)
+    assert(len(imgs) == 2)
+    assert(('GET', '/c1/L8/224/069/{0}/{0}_BQA.TIF'.format(PRODUCT_ID_RT))
+           in local_pds.hits)
+
+    del local_pds.hits[:]
+    assert(LandsatDownloader.download_scene(**options) == imgs)
+    assert(local_pds.hits == [])
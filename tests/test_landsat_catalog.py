@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import os
+
+from datetime import datetime
+
+from conftest import publish_scene
+from landsat_downloader.catalog import Catalog, get_collection
+from landsat_downloader.downloader import LandsatDownloader
+from landsat_downloader.manifest import hash_file
+
+SCENE_ID = 'LC82240692018053LGN00'
+PRODUCT_ID = 'LC08_L1GT_224069_20180222_20180308_01_T2'
+PRODUCT_ID_RT = 'LC08_L1GT_224069_20180222_20180222_01_RT'
+
+
+def download(tmpdir, catalog, bands, metadata=True):
+    return LandsatDownloader.download_scene(
+        bands=bands, scene_id=SCENE_ID, product_id=PRODUCT_ID,
+        download_dir=str(tmpdir), metadata=metadata, catalog=catalog)
+
+
+def test_get_collection():
+    assert(get_collection(PRODUCT_ID) == 'T2')
+    assert(get_collection(PRODUCT_ID_RT) == 'RT')
+    assert(get_collection(SCENE_ID) == 'PRE')
+
+
+def test_catalog_records_downloads(local_pds, tmpdir):
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID_RT, ['B4', 'BQA'])
+    catalog = Catalog(path=str(tmpdir.join('catalog.sqlite')))
+
+    imgs = download(tmpdir, catalog, [4, 'BQA'])
+    assert(len(catalog) == 3)
+
+    records = catalog.query(path=224, row=69)
+    assert([r['band'] for r in records] == ['B4', 'BQA', 'MTL'])
+    for record in records:
+        assert(record['scene_id'] == SCENE_ID)
+        assert(record['considered_id'] == PRODUCT_ID_RT)
+        assert(record['collection'] == 'RT')
+        assert(record['acq_date'] == '2018-02-22')
+        assert(record['sha256'] == hash_file(record['file_path'])['sha256'])
+
+    assert([(r['name'], r['size']) for r in records] ==
+           [(i['name'], i['size']) for i in imgs])
+
+
+def test_catalog_query_filters(local_pds, tmpdir):
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID_RT, ['B4', 'BQA'])
+    catalog = Catalog(path=':memory:')
+    download(tmpdir, catalog, [4, 'BQA'])
+
+    assert(len(catalog.query(bands=['B4'])) == 1)
+    assert(len(catalog.query(
+        start_date=datetime(2018, 2, 1), end_date=datetime(2018, 2, 28))) == 3)
+    assert(catalog.query(start_date=datetime(2018, 3, 1)) == [])
+    assert(catalog.query(path=224, row=68) == [])
+    assert(catalog.query(collection='T1') == [])
+
+
+def test_download_scene_consults_catalog(local_pds, tmpdir):
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID_RT, ['B4', 'BQA'])
+    catalog = Catalog(path=':memory:')
+    imgs = download(tmpdir, catalog, [4, 'BQA'])
+
+    del local_pds.hits[:]
+    assert(download(tmpdir, catalog, [4, 'BQA']) == imgs)
+    assert(download(tmpdir, catalog, ['BQA'], metadata=False) == imgs[1:2])
+    assert(local_pds.hits == [])
+
+    os.remove(imgs[0]['path'])
+    assert(download(tmpdir, catalog, [4, 'BQA']) == imgs)
+    assert(local_pds.hits != [])
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import os
+import json
+
+from datetime import datetime
+
+import pytest
+
+from click.testing import CliRunner
+
+from conftest import make_inventory_record, publish_inventory, publish_scene
+from landsat_downloader import cli
+
+
+SCENE_ID = 'LC82240692018053LGN00'
+PRODUCT_ID = 'LC08_L1GT_224069_20180222_20180308_01_T2'
+MISSING_ID = 'LC82240682018069LGN00'
+MISSING_PRODUCT_ID = 'LC08_L1TP_224068_20180310_20180320_01_T1'
+
+
+def read_jsonl(output):
+    return [json.loads(line) for line in output.splitlines()]
+
+
+def test_read_inputs():
+    lines = [
+        '# scenes',
+        '',
+        '{"sceneID": "a", "LANDSAT_PRODUCT_ID": "b", "path": 1}',
+        'c,d',
+        'e  f',
+    ]
+    assert(list(cli.read_scenes(lines)) == [('a', 'b'), ('c', 'd'),
+                                            ('e', 'f')])
+    with pytest.raises(ValueError) as exc:
+        list(cli.read_scenes(['a b', 'only-one']))
+    assert('line 2' in str(exc.value))
+
+    assert(list(cli.read_tiles(['222/63', '1,2', '3 4'])) ==
+           [(222, 63), (1, 2), (3, 4)])
+    assert(cli.parse_bands(('4,5', 'bqa')) == [4, 5, 'BQA'])
+    assert(cli.parse_size('50M') == 50 * 1024 ** 2)
+    assert(cli.parse_size('1.5k') == 1536)
+    with pytest.raises(ValueError):
+        cli.parse_size('fast')
+
+
+def test_search(local_ee):
+    publish_inventory(local_ee.root, [
+        make_inventory_record(222, 63, datetime(2018, 1, 5)),
+        make_inventory_record(222, 63, datetime(2018, 1, 21), 0.5),
+        make_inventory_record(223, 63, datetime(2018, 1, 12), 1.5),
+    ])
+
+    result = CliRunner().invoke(cli.main, [
+        'search', '-p', '222/63', '--tiles', '-', '--start', '2018-01-01',
+        '--end', '2018-01-31', '--max-cloud', '5'], input='223 63\n')
+
+    assert(result.exit_code == 0)
+    assert([record['sceneID'] for record in read_jsonl(result.stdout)] ==
+           ['LC82220632018021LGN00', 'LC82230632018012LGN00'])
+
+
+def test_download_from_stdin(local_pds, tmpdir):
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID, ['B4', 'B5'])
+    metrics_file = str(tmpdir.join('metrics.prom'))
+    trace_file = str(tmpdir.join('trace.json'))
+    scenes = '\n'.join([
+        json.dumps({'sceneID': SCENE_ID, 'LANDSAT_PRODUCT_ID': PRODUCT_ID}),
+        '{} {}'.format(MISSING_ID, MISSING_PRODUCT_ID),
+        '{} {}'.format(SCENE_ID, PRODUCT_ID),
+    ])
+
+    result = CliRunner().invoke(cli.main, [
+        'download', '-b', '4,5', '--no-metadata', '-o', str(tmpdir),
+        '-w', '2', '--rate', '10M', '--batch-size', '1',
+        '--metrics-file', metrics_file, '--trace-file', trace_file, '-'],
+        input=scenes)
+
+    downloaded, failed = read_jsonl(result.stdout)
+    assert(result.exit_code == 1)
+    assert(downloaded['status'] == 'downloaded')
+    assert([f['type'] for f in downloaded['files']] == ['B4', 'B5'])
+    assert(all(os.path.getsize(f['path']) == f['size']
+               for f in downloaded['files']))
+    assert(failed['scene_id'] == MISSING_ID)
+    assert(failed['status'] == 'failed' and failed['transient'] is False)
+    assert('2 scenes (1 failed), 2 files' in result.stderr)
+    with open(metrics_file) as f:
+        assert('landsat_files_downloaded_total' in f.read())
+    with open(trace_file) as f:
+        assert(json.load(f)['traceEvents'])
+
+
+def test_download_dry_run(local_pds, tmpdir):
+    scenes = tmpdir.join('scenes.txt')
+    scenes.write('{},{}\nbad,ids\n'.format(SCENE_ID, PRODUCT_ID))
+
+    result = CliRunner().invoke(cli.main, [
+        'download', '-b', '4', '--dry-run', str(scenes)])
+
+    planned, invalid = read_jsonl(result.stdout)
+    assert(result.exit_code == 1)
+    assert(planned['status'] == 'planned' and planned['bands'] == [4])
+    assert(invalid['status'] == 'invalid')
+    assert(local_pds.hits == [])
+
+    result = CliRunner().invoke(cli.main, [
+        'download', '-b', 'B13', '--dry-run', str(scenes)])
+    assert(result.exit_code == 2)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import os
+import asyncio
+import pytest
+
+from collections import OrderedDict
+
+from conftest import make_downloader, publish_scene
+from landsat_downloader.downloader_base import (
+    AWSDownloaderCollection1RT, AWSDownloaderCollection1Tiers,
+    AWSDownloaderPreCollection, Downloader
+)
+from landsat_downloader.downloader import LandsatDownloader
+from landsat_downloader.exceptions import (
+    BatchDownloadErrors, DownloaderErrors
+)
+from landsat_downloader.scene_info import SceneInfo
+from landsat_downloader.transport import HTTPTransport
+
+
+SCENE_ID = 'LC82240692018053LGN00'
+PRODUCT_ID = 'LC08_L1GT_224069_20180222_20180308_01_T2'
+BANDS = ['B{}'.format(i) for i in range(1, 12)] + ['BQA']
+
+
+def test_concurrent_download_keeps_order(http_server, tmpdir):
+    downloader = make_downloader(http_server, SCENE_ID, PRODUCT_ID, BANDS)
+    imgs = downloader.download(
+        bands=BANDS, download_dir=str(tmpdir), max_workers=4)
+
+    assert([i['type'] for i in imgs] == BANDS + ['MTL'])
+    for i, img in enumerate(imgs[:-1]):
+        assert(img['name'] == '{}_{}.TIF'.format(PRODUCT_ID, BANDS[i]))
+        assert(img['size'] == 1024 + i)
+        assert(os.path.getsize(img['path']) == img['size'])
+
+
+def test_serial_download_matches_concurrent(http_server, tmpdir):
+    downloader = make_downloader(http_server, SCENE_ID, PRODUCT_ID, BANDS)
+    serial = downloader.download(
+        bands=['B4', 'BQA'], download_dir=str(tmpdir.mkdir('serial')),
+        max_workers=1)
+    concurrent = downloader.download(
+        bands=['B4', 'BQA'], download_dir=str(tmpdir.mkdir('concurrent')),
+        max_workers=8)
+
+    assert([i['name'] for i in serial] == [i['name'] for i in concurrent])
+    assert([i['size'] for i in serial] == [i['size'] for i in concurrent])
+
+
+def test_downloader_prefers_rt(local_pds):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID, ['BQA'])
+    publish_scene(
+        local_pds.root, 'c1/L8', scene_info.make_rt_product_id(), ['BQA'])
+
+    downloader = Downloader(scene_info)
+    assert(isinstance(downloader.downloader, AWSDownloaderCollection1RT))
+    assert(downloader.availability ==
+           OrderedDict([('rt', True), ('t1', True), ('pre', False)]))
+    assert(downloader.pre_available is False)
+
+
+def test_downloader_falls_back_to_pre_collection(local_pds):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    publish_scene(local_pds.root, 'L8', SCENE_ID, ['BQA'])
+
+    downloader = Downloader(scene_info)
+    assert(isinstance(downloader.downloader, AWSDownloaderPreCollection))
+    assert(list(downloader.availability.values()) == [False, False, True])
+
+
+def test_downloader_first_available(local_pds):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    publish_scene(
+        local_pds.root, 'c1/L8', scene_info.make_rt_product_id(), ['BQA'])
+
+    downloader = Downloader(scene_info, first_available=True)
+    assert(isinstance(downloader.downloader, AWSDownloaderCollection1RT))
+    assert(downloader.rt_available is True)
+
+
+def test_downloader_without_collections(local_pds):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    with pytest.raises(DownloaderErrors):
+        Downloader(scene_info)
+
+
+def test_downloader_shares_transport(local_pds, tmpdir):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    publish_scene(
+        local_pds.root, 'c1/L8', scene_info.make_rt_product_id(), ['BQA'])
+    transport = HTTPTransport(pool_size=1)
+
+    downloader = Downloader(scene_info, transport=transport)
+    assert(downloader.downloader.transport is transport)
+
+    imgs = downloader.download(bands=['BQA'], download_dir=str(tmpdir))
+    assert(len(imgs) == 2)
+    assert(len(local_pds.clients) == 1)
+
+
+def test_downloader_resolve_async(local_pds):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID, ['BQA'])
+
+    downloader = Downloader(scene_info, probe=False)
+    assert(local_pds.hits == [])
+
+    availability = asyncio.run(downloader.resolve_async())
+    assert(isinstance(downloader.downloader, AWSDownloaderCollection1Tiers))
+    assert(list(availability.values()) == [False, True, False])
+
+
+def test_download_scene_async(local_pds, tmpdir):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    publish_scene(
+        local_pds.root, 'c1/L8', scene_info.make_rt_product_id(), BANDS)
+
+    imgs = asyncio.run(LandsatDownloader.download_scene_async(
+        bands=[4, 5, 'BQA'], scene_id=SCENE_ID, product_id=PRODUCT_ID,
+        download_dir=str(tmpdir.mkdir('async'))))
+    expected = LandsatDownloader.download_scene(
+        bands=[4, 5, 'BQA'], scene_id=SCENE_ID, product_id=PRODUCT_ID,
+        download_dir=str(tmpdir.mkdir('sync')))
+
+    assert([i['name'] for i in imgs] == [i['name'] for i in expected])
+    assert([i['size'] for i in imgs] == [i['size'] for i in expected])
+    for img in imgs:
+        assert(os.path.getsize(img['path']) == img['size'])
+
+
+def test_download_scenes(local_pds, tmpdir):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID, BANDS)
+    other_scene = SceneInfo(
+        scene_id='LC82240682018069LGN00',
+        product_id='LC08_L1GT_224068_20180310_20180320_01_T2')
+    publish_scene(
+        local_pds.root, 'c1/L8', other_scene.make_rt_product_id(), BANDS)
+    missing = ('LC82240702018069LGN00',
+               'LC08_L1GT_224070_20180310_20180320_01_T2')
+
+    with pytest.raises(BatchDownloadErrors) as exc:
+        LandsatDownloader.download_scenes(
+            [(SCENE_ID, PRODUCT_ID), missing,
+             (other_scene.scene_id, other_scene.product_id)],
+            bands=[4, 'BQA'], download_dir=str(tmpdir),
+            max_workers=4, max_per_host=2)
+
+    assert(list(exc.value.errors) == [missing[0]])
+    assert(isinstance(exc.value.errors[missing[0]], DownloaderErrors))
+
+    results = exc.value.results
+    assert(list(results) == [SCENE_ID, other_scene.scene_id])
+    assert([i['name'] for i in results[SCENE_ID]] ==
+           ['{}_{}'.format(PRODUCT_ID, name)
+            for name in ('B4.TIF', 'BQA.TIF', 'MTL.txt')])
+    assert(results[other_scene.scene_id][0]['name'].startswith(
+        other_scene.make_rt_product_id()))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader.files`."""
+
+import os
+import json
+import pickle
+
+import pytest
+
+from conftest import publish_scene, write_tiff
+from landsat_downloader.downloader_base import AWSDownloaderCollection1Tiers
+from landsat_downloader.exceptions import UnsupportedTiffError
+from landsat_downloader.files import DownloadedFile
+from landsat_downloader.scene_info import SceneInfo
+
+np = pytest.importorskip('numpy')
+
+from landsat_downloader.tiff import memmap_tiff  # noqa: E402
+
+SCENE_ID = 'LC82240682018069LGN00'
+PRODUCT_ID = 'LC08_L1TP_224068_20180310_20180320_01_T1'
+
+
+def _image(height=300, width=200):
+    return (np.arange(height * width) % 65000).astype(np.uint16).reshape(
+        height, width)
+
+
+@pytest.mark.parametrize('options', [
+    {}, {'rows_per_strip': 7}, {'rows_per_strip': 1, 'byte_order': '>'}])
+def test_memmap_tiff(tmpdir, options):
+    image = _image()
+    path = str(tmpdir.join('band.TIF'))
+    write_tiff(path, image, **options)
+
+    array = memmap_tiff(path)
+    assert(isinstance(array, np.memmap))
+    assert(array.shape == image.shape)
+    assert(np.array_equal(array, image))
+    with pytest.raises(ValueError):
+        array[0, 0] = 1
+
+
+@pytest.mark.parametrize('options', [
+    {'tile': 64}, {'compression': 8}, {'compression': 5},
+    {'rows_per_strip': 10, 'predictor': 2}])
+def test_memmap_tiff_unsupported(tmpdir, options):
+    path = str(tmpdir.join('band.TIF'))
+    write_tiff(path, _image(), **options)
+
+    with pytest.raises(UnsupportedTiffError) as exc:
+        memmap_tiff(path)
+    assert(path in str(exc.value))
+
+
+def test_downloaded_file_array(local_pds, tmpdir):
+    scene_dir = publish_scene(
+        local_pds.root, 'c1/L8', PRODUCT_ID, ['B4', 'B5'])
+    image = _image()
+    write_tiff(os.path.join(scene_dir, PRODUCT_ID + '_B4.TIF'), image,
+               rows_per_strip=16)
+    write_tiff(os.path.join(scene_dir, PRODUCT_ID + '_B5.TIF'), image,
+               tile=64, compression=8)
+
+    downloader = AWSDownloaderCollection1Tiers(
+        SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID))
+    red, nir, mtl = downloader.download(
+        ['B4', 'B5'], download_dir=str(tmpdir))
+
+    assert(isinstance(red, DownloadedFile))
+    assert(red == {"name": PRODUCT_ID + '_B4.TIF', "path": red['path'],
+                   "type": 'B4', "size": red['size']})
+    assert(json.loads(json.dumps(red)) == red)
+    assert(np.array_equal(red.array[10:20, 5:50], image[10:20, 5:50]))
+    assert(red.array is red.array)
+
+    with pytest.raises(UnsupportedTiffError):
+        nir.array
+    with pytest.raises(UnsupportedTiffError):
+        mtl.array
+
+    copy = pickle.loads(pickle.dumps(red))
+    assert(copy == red)
+    assert(np.array_equal(copy.array, red.array))
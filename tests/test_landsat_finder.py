@@ -3,8 +3,15 @@
 
 """Tests for `landsat_downloader` package."""
 
+import os
+import asyncio
+
+import pytest
+
 from datetime import datetime
 
+from conftest import make_inventory_record, publish_inventory
+from landsat_downloader.exceptions import MetadataError
 from landsat_downloader.finder import LandsatFinder
 
 PATH_ROW_LIST = [(222, 63), (222, 64)]
@@ -36,3 +43,156 @@ END_DATE = datetime(2018, 2, 1)
 #     for scene in scenes:
 #         assert(scene.get("path") == 222)
 #         assert(scene.get("row") == 63 or scene.get("row") == 64)
+
+
+def test_landsat_finder_local(local_ee):
+    publish_inventory(local_ee.root, [
+        make_inventory_record(222, 63, datetime(2018, 1, 5)),
+        make_inventory_record(222, 63, datetime(2018, 1, 21), 0.5),
+    ])
+    scenes = LandsatFinder.search_scenes_metadata(
+        path_row_list=[(222, 63)],
+        start_date=START_DATE,
+        end_date=END_DATE)
+
+    assert(len(scenes) == 2)
+    assert(scenes[0]['sceneID'] == 'LC82220632018005LGN00')
+    assert(scenes[0]['path'] == 222)
+    assert(scenes[1]['cloudCover'] == 0.5)
+    assert(scenes[1]['acquisitionDate'] == '2018-01-21')
+
+
+def test_landsat_finder_async(local_ee):
+    publish_inventory(local_ee.root, [
+        make_inventory_record(222, 63, datetime(2018, 1, 5)),
+    ])
+    scenes = asyncio.run(LandsatFinder.search_scenes_metadata_async(
+        path_row_list=PATH_ROW_LIST,
+        start_date=START_DATE,
+        end_date=END_DATE))
+
+    assert(len(scenes) == 1)
+    assert(len(local_ee.hits) == 1)
+    assert(scenes[0]['sceneID'] == 'LC82220632018005LGN00')
+
+
+def test_landsat_finder_concurrent_order(local_ee):
+    publish_inventory(local_ee.root, [
+        make_inventory_record(path, row, datetime(2018, 1, day))
+        for path, row in [(1, 1), (2, 2), (3, 3), (4, 4)]
+        for day in (5, 21)
+    ])
+    path_row_list = [(4, 4), (1, 1), (3, 3), (2, 2)]
+    scenes = LandsatFinder.search_scenes_metadata(
+        path_row_list=path_row_list,
+        start_date=START_DATE,
+        end_date=END_DATE,
+        max_workers=4)
+
+    assert(len(local_ee.hits) == 4)
+    assert([(s['path'], s['row']) for s in scenes[::2]] == path_row_list)
+    assert(scenes[0]['acquisitionDate'] == '2018-01-05')
+    assert(scenes[1]['acquisitionDate'] == '2018-01-21')
+
+
+def test_landsat_finder_date_windows(local_ee):
+    publish_inventory(local_ee.root, [
+        make_inventory_record(222, 63, datetime(2018, month, 10))
+        for month in range(1, 13)
+    ])
+    scenes = LandsatFinder.search_scenes_metadata(
+        path_row_list=[(222, 63), (222, 63)],
+        start_date=datetime(2018, 1, 1),
+        end_date=datetime(2018, 12, 31),
+        window_days=30)
+
+    # 13 windows of 30 days
+    assert(len(local_ee.hits) == 13)
+    assert(len(scenes) == 12)
+    assert([s['acquisitionDate'][5:7] for s in scenes] ==
+           ['{:02d}'.format(month) for month in range(1, 13)])
+
+    ids = LandsatFinder.search_scenes_id_list(
+        [(222, 63)], datetime(2018, 1, 1), datetime(2018, 12, 31),
+        window_days=90)
+    assert(ids == [s['sceneID'] for s in scenes])
+
+
+def test_landsat_finder_ranges(local_ee):
+    publish_inventory(local_ee.root, [
+        make_inventory_record(path, row, datetime(2018, 1, 5))
+        for path in range(220, 225) for row in range(60, 66)
+    ])
+    path_row_list = [
+        (path, row) for path in range(220, 224) for row in range(61, 65)]
+    path_row_list.remove((221, 62))
+
+    scenes = LandsatFinder.search_scenes_metadata(
+        path_row_list=path_row_list,
+        start_date=START_DATE,
+        end_date=END_DATE)
+    assert(len(local_ee.hits) > 1)
+    assert([(s['path'], s['row']) for s in scenes] == path_row_list)
+
+    del local_ee.hits[:]
+    scenes = LandsatFinder.search_scenes_metadata(
+        path_row_list=path_row_list,
+        start_date=START_DATE,
+        end_date=END_DATE,
+        max_overfetch=0.1)
+    assert(len(local_ee.hits) == 1)
+    assert('start_path=220&end_path=223&start_row=61&end_row=64' in
+           local_ee.hits[0][1])
+    assert([(s['path'], s['row']) for s in scenes] == path_row_list)
+
+
+def test_landsat_finder_iter(local_ee):
+    publish_inventory(local_ee.root, [
+        make_inventory_record(path, 63, datetime(2018, 1, day))
+        for path in (222, 223) for day in (5, 21)
+    ])
+    scenes = LandsatFinder.iter_scenes_metadata(
+        path_row_list=[(223, 63), (222, 63)],
+        start_date=START_DATE,
+        end_date=END_DATE,
+        window_days=16)
+
+    first = next(scenes)
+    assert(first['path'] == 222)
+    rest = list(scenes)
+    assert(len(rest) == 3)
+    assert(sorted(s['sceneID'] for s in [first] + rest) ==
+           sorted(s['sceneID'] for s in LandsatFinder.search_scenes_metadata(
+               [(223, 63), (222, 63)], START_DATE, END_DATE)))
+
+
+def test_landsat_finder_iter_close(local_ee):
+    publish_inventory(local_ee.root, [
+        make_inventory_record(222, 63, datetime(2018, 1, day))
+        for day in range(1, 32)
+    ])
+    scenes = LandsatFinder.iter_scenes_metadata(
+        path_row_list=[(222, 63)],
+        start_date=START_DATE,
+        end_date=END_DATE,
+        window_days=1,
+        max_workers=2)
+
+    assert(next(scenes)['acquisitionDate'] == '2018-01-01')
+    scenes.close()
+
+
+def test_landsat_finder_errors_reported(local_ee):
+    with pytest.raises(MetadataError) as exc:
+        LandsatFinder.search_scenes_metadata(
+            [(222, 63)], START_DATE, END_DATE)
+    assert('HTTP 404' in str(exc.value))
+
+    folder = os.path.join(local_ee.root, 'EE', 'InventoryStream')
+    os.makedirs(folder)
+    with open(os.path.join(folder, 'pathrow'), 'w') as f:
+        f.write('<searchResponse><metaData><path>222</path>')
+
+    with pytest.raises(MetadataError):
+        LandsatFinder.search_scenes_metadata(
+            [(222, 63)], START_DATE, END_DATE)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader.finder_cache`."""
+
+from datetime import date, datetime, timedelta
+
+from conftest import make_inventory_record, publish_inventory
+from landsat_downloader.finder import LandsatFinder
+from landsat_downloader.finder_cache import (
+    FinderCache, merge_intervals, subtract_intervals
+)
+
+SENSOR = 'LANDSAT_8_C1'
+
+
+def _queried_dates(hits):
+    return sorted(
+        tuple(part.split('=')[1] for part in path.split('&')
+              if 'date' in part)
+        for _, path in hits)
+
+
+def test_intervals():
+    d = lambda day: date(2018, 1, day)  # noqa: E731
+
+    assert(merge_intervals([(d(10), d(12)), (d(1), d(5)), (d(6), d(8))]) ==
+           [(d(1), d(8)), (d(10), d(12))])
+    assert(subtract_intervals(d(1), d(31), []) == [(d(1), d(31))])
+    assert(subtract_intervals(d(1), d(31), [(d(5), d(9)), (d(20), d(31))]) ==
+           [(d(1), d(4)), (d(10), d(19))])
+    assert(subtract_intervals(d(5), d(9), [(d(1), d(12))]) == [])
+
+
+def test_finder_cache_coverage():
+    cache = FinderCache(':memory:', refresh_days=10)
+    cache.add_coverage(SENSOR, 222, 63, date(2018, 1, 1), date(2018, 1, 31))
+    assert(cache.get_gaps(SENSOR, 222, 63, datetime(2018, 1, 1),
+                          datetime(2018, 3, 31)) ==
+           [(date(2018, 2, 1), date(2018, 3, 31))])
+    assert(cache.get_gaps(SENSOR, 222, 64, date(2018, 1, 1),
+                          date(2018, 1, 2)) ==
+           [(date(2018, 1, 1), date(2018, 1, 2))])
+
+    # the last refresh_days are never marked as searched
+    today = date.today()
+    cache.add_coverage(SENSOR, 1, 1, today - timedelta(days=30), today)
+    assert(cache.get_gaps(SENSOR, 1, 1, today - timedelta(days=30), today) ==
+           [(today - timedelta(days=9), today)])
+
+    cache.add(SENSOR, [make_inventory_record(222, 63, datetime(2018, 1, 5))])
+    cache.add(SENSOR, [make_inventory_record(222, 63, datetime(2018, 1, 5),
+                                             cloud_cover=1.5)])
+    scenes = cache.get_scenes(SENSOR, 222, 63, date(2018, 1, 1),
+                              date(2018, 1, 31))
+    assert(len(cache) == 1)
+    assert(scenes[0]['cloudCover'] == 1.5)
+    assert(list(scenes[0].keys())[:2] == ['browseAvailable', 'sceneID'])
+
+
+def test_finder_cache_search(local_ee):
+    publish_inventory(local_ee.root, [
+        make_inventory_record(222, row, datetime(2018, month, 10))
+        for row in (63, 64) for month in (1, 2, 3)
+    ])
+    cache = FinderCache(':memory:')
+    path_row_list = [(222, 63), (222, 64)]
+
+    scenes = LandsatFinder.search_scenes_metadata(
+        path_row_list, datetime(2018, 1, 1), datetime(2018, 1, 31),
+        cache=cache)
+    assert(len(scenes) == 2)
+    assert(_queried_dates(local_ee.hits) == [('2018-01-01', '2018-01-31')])
+
+    del local_ee.hits[:]
+    scenes = LandsatFinder.search_scenes_metadata(
+        path_row_list, datetime(2018, 1, 1), datetime(2018, 3, 31),
+        cache=cache)
+    assert(_queried_dates(local_ee.hits) == [('2018-02-01', '2018-03-31')])
+    assert([(s['row'], s['acquisitionDate']) for s in scenes] == [
+        (row, '2018-{:02d}-10'.format(month))
+        for row in (63, 64) for month in (1, 2, 3)])
+
+    # a new tile is searched alone
+    del local_ee.hits[:]
+    ids = LandsatFinder.search_scenes_id_list(
+        [(222, 64), (222, 65)], datetime(2018, 1, 1), datetime(2018, 3, 31),
+        cache=cache)
+    assert(len(local_ee.hits) == 1)
+    assert('start_row=65&end_row=65' in local_ee.hits[0][1])
+    assert(ids == [s['sceneID'] for s in scenes[3:]])
+
+    del local_ee.hits[:]
+    LandsatFinder.search_scenes_metadata(
+        path_row_list, datetime(2018, 1, 15), datetime(2018, 2, 15),
+        cache=cache)
+    assert(local_ee.hits == [])
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader.inventory`."""
+
+import pytest
+
+from datetime import datetime
+
+from conftest import _inventory_xml, make_inventory_record
+from landsat_downloader.exceptions import MetadataError
+from landsat_downloader.inventory import iter_metadata, parse_value
+
+
+def test_parse_value():
+    assert(parse_value('222') == 222)
+    assert(parse_value('10.5') == 10.5)
+    assert(parse_value('2018-01-05') == '2018-01-05')
+    assert(parse_value('') is None)
+    assert(parse_value(None) is None)
+
+
+def test_iter_metadata_chunks():
+    data = _inventory_xml([
+        make_inventory_record(222, 63, datetime(2018, 1, day))
+        for day in range(1, 11)
+    ]).encode()
+    chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+
+    records = list(iter_metadata(chunks))
+    assert(len(records) == 10)
+    assert(list(records[0].keys()) ==
+           list(make_inventory_record(1, 1, datetime(2018, 1, 1)).keys()))
+    assert(records[0]['path'] == 222)
+    assert(records[0]['cloudCover'] == 10.5)
+    assert(records[9]['acquisitionDate'] == '2018-01-10')
+
+
+def test_iter_metadata_incremental():
+    data = _inventory_xml([
+        make_inventory_record(222, 63, datetime(2018, 1, 5)),
+        make_inventory_record(222, 63, datetime(2018, 1, 21)),
+    ]).encode()
+    first_end = data.index(b'</metaData>') + len('</metaData>')
+
+    def chunks():
+        yield data[:first_end]
+        # the first record is out before the rest is read
+        assert(len(parsed) == 1)
+        yield data[first_end:]
+
+    parsed = []
+    for record in iter_metadata(chunks()):
+        parsed.append(record)
+    assert(len(parsed) == 2)
+
+
+def test_iter_metadata_errors():
+    data = _inventory_xml([
+        make_inventory_record(222, 63, datetime(2018, 1, 5)),
+    ]).encode()
+
+    with pytest.raises(MetadataError) as exc:
+        list(iter_metadata([data[:-20]], url='http://ee/query'))
+    assert('http://ee/query' in str(exc.value))
+
+    with pytest.raises(MetadataError):
+        list(iter_metadata([b'<html><body>Maintenance</html>']))
+
+    with pytest.raises(MetadataError):
+        list(iter_metadata([]))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import os
+import hashlib
+
+import pytest
+
+from conftest import make_downloader
+from landsat_downloader.exceptions import ChecksumMismatchError
+from landsat_downloader.manifest import (
+    Manifest, etag_matches, hash_file, verify
+)
+from landsat_downloader.transport import HTTPTransport
+
+SCENE_ID = 'LC82240692018053LGN00'
+PRODUCT_ID = 'LC08_L1GT_224069_20180222_20180308_01_T2'
+BANDS = ['B4', 'B5', 'BQA']
+
+
+def md5(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def test_etag_matches():
+    digest = hashlib.md5(b'landsat').hexdigest()
+    assert(etag_matches('"{}"'.format(digest), digest) is True)
+    assert(etag_matches('"{}"'.format('0' * 32), digest) is False)
+    assert(etag_matches('"{}-12"'.format(digest[:30]), digest) is None)
+    assert(etag_matches(None, digest) is None)
+
+
+def test_download_writes_manifest(http_server, tmpdir):
+    downloader = make_downloader(
+        http_server, SCENE_ID, PRODUCT_ID, BANDS, size=5000)
+    imgs = downloader.download(bands=BANDS, download_dir=str(tmpdir))
+
+    manifest = Manifest(os.path.dirname(imgs[0]['path']))
+    assert(sorted(manifest.files) == sorted(i['name'] for i in imgs))
+    for img in imgs:
+        entry = manifest.get(img['name'])
+        assert(entry['size'] == img['size'])
+        assert(entry['md5'] == md5(img['path']))
+        assert(entry['sha256'] == hash_file(img['path'])['sha256'])
+
+
+def test_manifest_is_trusted(http_server, tmpdir):
+    downloader = make_downloader(
+        http_server, SCENE_ID, PRODUCT_ID, BANDS, size=5000)
+    imgs = downloader.download(bands=BANDS, download_dir=str(tmpdir))
+
+    del http_server.hits[:]
+    assert(downloader.download(
+        bands=BANDS, download_dir=str(tmpdir)) == imgs)
+    assert(http_server.hits == [])
+
+
+def test_segmented_downloads_are_hashed(http_server, tmpdir):
+    downloader = make_downloader(
+        http_server, SCENE_ID, PRODUCT_ID, BANDS, size=5000)
+    imgs = downloader.download(
+        bands=BANDS, download_dir=str(tmpdir), segments=3)
+
+    manifest = Manifest(os.path.dirname(imgs[0]['path']))
+    assert(manifest.get(imgs[1]['name'])['md5'] == md5(imgs[1]['path']))
+    assert(verify(str(tmpdir)) == [])
+
+
+def test_verify_reports_corrupted_files(http_server, tmpdir):
+    downloader = make_downloader(
+        http_server, SCENE_ID, PRODUCT_ID, BANDS, size=5000)
+    imgs = downloader.download(bands=BANDS, download_dir=str(tmpdir))
+
+    with open(imgs[0]['path'], 'r+b') as f:
+        f.write(b'\xff')
+    os.remove(imgs[1]['path'])
+
+    errors = verify(str(tmpdir), max_workers=2)
+    assert(errors == [
+        {"path": imgs[0]['path'], "error": 'md5'},
+        {"path": imgs[1]['path'], "error": 'missing'},
+    ])
+
+
+def test_transport_hashers_on_resume(http_server, tmpdir):
+    data = os.urandom(4000)
+    with open(os.path.join(http_server.root, 'file.bin'), 'wb') as f:
+        f.write(data)
+    file_path = str(tmpdir.join('file.bin'))
+    with open(file_path + '.part', 'wb') as f:
+        f.write(data[:1500])
+
+    hasher = hashlib.md5()
+    HTTPTransport().download(
+        http_server.url + 'file.bin', file_path, chunk_size=512,
+        hashers=[hasher])
+    assert(hasher.hexdigest() == hashlib.md5(data).hexdigest())
+
+
+def test_checksum_mismatch_keeps_existing_file(http_server, tmpdir):
+    downloader = make_downloader(
+        http_server, SCENE_ID, PRODUCT_ID, BANDS, size=5000)
+    imgs = downloader.download(bands=BANDS, download_dir=str(tmpdir))
+    path = imgs[0]['path']
+    with open(path, 'wb') as f:
+        f.write(b'previous')
+    with open(path + '.part', 'wb') as f:
+        f.write(b'\xff' * 100)
+
+    with pytest.raises(ChecksumMismatchError):
+        downloader.download(bands=BANDS[:1], download_dir=str(tmpdir))
+    assert(not os.path.exists(path + '.part'))
+    with open(path, 'rb') as f:
+        assert(f.read() == b'previous')
+
+
+def test_corrupt_file_of_the_remote_size_is_downloaded_again(
+        http_server, tmpdir):
+    downloader = make_downloader(
+        http_server, SCENE_ID, PRODUCT_ID, BANDS, size=5000)
+    imgs = downloader.download(bands=BANDS, download_dir=str(tmpdir))
+    path = imgs[0]['path']
+    expected = md5(path)
+    with open(path, 'wb') as f:
+        f.write(b'\xff' * imgs[0]['size'])
+    os.remove(Manifest(os.path.dirname(path)).path)
+
+    del http_server.hits[:]
+    downloader.download(bands=BANDS, download_dir=str(tmpdir))
+    assert([os.path.basename(url) for method, url in http_server.hits
+            if method == 'GET'] == [imgs[0]['name']])
+    assert(md5(path) == expected)
+    assert(verify(str(tmpdir)) == [])
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import pytest
+
+from conftest import publish_scene
+from landsat_downloader.downloader_base import Downloader
+from landsat_downloader.metrics import (
+    COUNTER, EVENT, Metrics, MetricsRegistry, get_default_metrics,
+    set_default_metrics
+)
+from landsat_downloader.retry import Resilience, RetryPolicy
+from landsat_downloader.scene_info import SceneInfo
+from landsat_downloader.transport import HTTPTransport
+
+
+SCENE_ID = 'LC82240692018053LGN00'
+PRODUCT_ID = 'LC08_L1GT_224069_20180222_20180308_01_T2'
+
+
+@pytest.fixture
+def metrics():
+    registry = MetricsRegistry()
+    set_default_metrics(registry)
+    yield registry
+    set_default_metrics(None)
+
+
+def test_default_metrics_do_nothing():
+    metrics = get_default_metrics()
+    assert(type(metrics) is Metrics)
+    assert(not metrics.enabled)
+    metrics.increment('x', 1, label='a')
+    metrics.observe('x', 1.0)
+    metrics.event('x', scene_id='a')
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry(buckets={'size': (10, 100)})
+    registry.increment('landsat_retries_total', host='s3', reason='503')
+    registry.increment('landsat_retries_total', 2, host='s3', reason='503')
+    for value in (5, 10, 50, 500):
+        registry.observe('size', value)
+
+    assert(registry.get_counter(
+        'landsat_retries_total', host='s3', reason='503') == 3)
+    assert(registry.get_histogram('size') == (4, 565.0))
+    assert(registry.to_prometheus().splitlines() == [
+        '# HELP landsat_retries_total Requests retried after a transient '
+        'failure',
+        '# TYPE landsat_retries_total counter',
+        'landsat_retries_total{host="s3",reason="503"} 3',
+        '# TYPE size histogram',
+        'size_bucket{le="10"} 2',
+        'size_bucket{le="100"} 3',
+        'size_bucket{le="+Inf"} 4',
+        'size_sum 565.0',
+        'size_count 4',
+    ])
+
+
+def test_hooks_get_every_metric_and_event():
+    calls = []
+    registry = MetricsRegistry(hooks=[lambda *args: calls.append(args)])
+    registry.add_hook(lambda *args: 1 / 0)
+
+    registry.increment('files', source='aws')
+    registry.event('scene', scene_id='x')
+
+    assert(calls == [
+        (COUNTER, 'files', 1, {'source': 'aws'}),
+        (EVENT, 'scene', None, {'scene_id': 'x'}),
+    ])
+
+
+def test_downloader_reports_metrics(local_pds, tmpdir, metrics):
+    events = []
+    metrics.add_hook(lambda kind, name, value, labels: kind == EVENT and
+                     events.append(name))
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID, ['B4'])
+    band_path = '/c1/L8/224/069/{0}/{0}_B4.TIF'.format(PRODUCT_ID)
+    local_pds.failures[band_path] = [503]
+    transport = HTTPTransport(
+        resilience=Resilience(RetryPolicy(attempts=2, backoff=0.01)))
+
+    downloader = Downloader(scene_info, transport=transport)
+    downloader.download(bands=['B4'], download_dir=str(tmpdir))
+    downloader.download(bands=['B4'], download_dir=str(tmpdir))
+    source = local_pds.url[7:-1]
+
+    assert(metrics.get_counter(
+        'landsat_probes_total', collection='t1', outcome='available') == 1)
+    assert(metrics.get_counter(
+        'landsat_probes_total', collection='rt', outcome='missing') == 1)
+    assert(metrics.get_histogram(
+        'landsat_probe_seconds', collection='pre')[0] == 1)
+    assert(metrics.get_histogram(
+        'landsat_head_seconds', host=source)[0] == 6)
+    assert(metrics.get_counter(
+        'landsat_files_downloaded_total', source=source) == 2)
+    assert(metrics.get_counter(
+        'landsat_files_skipped_total', reason='manifest') == 2)
+    assert(metrics.get_counter(
+        'landsat_retries_total', host=source, reason='503') == 1)
+    assert(metrics.get_counter('landsat_received_bytes_total') == 1024 + 54)
+    assert(events == [
+        'scene', 'availability', 'file_downloaded', 'file_downloaded',
+        'file_skipped', 'file_skipped'])
+    assert('landsat_get_bytes_per_second_bucket' in metrics.to_prometheus())
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader.planner`."""
+
+from landsat_downloader.planner import plan_path_row_ranges
+
+
+def _tiles(path_row_ranges):
+    return sorted(
+        tile for path_row_range in path_row_ranges
+        for tile in path_row_range.tiles)
+
+
+def test_plan_block():
+    path_row_list = [
+        (path, row) for path in range(220, 225) for row in range(60, 66)]
+    ranges = plan_path_row_ranges(path_row_list)
+
+    assert(len(ranges) == 1)
+    assert(ranges[0][:4] == (220, 224, 60, 65))
+    assert(_tiles(ranges) == sorted(path_row_list))
+
+
+def test_plan_exact_by_default():
+    # an L shape can't be a single rectangle without extra tiles
+    path_row_list = [(1, 1), (1, 2), (1, 3), (2, 1)]
+    ranges = plan_path_row_ranges(path_row_list)
+
+    assert(len(ranges) == 2)
+    assert(_tiles(ranges) == sorted(path_row_list))
+    for path_row_range in ranges:
+        start_path, end_path, start_row, end_row, tiles = path_row_range
+        assert((end_path - start_path + 1) * (end_row - start_row + 1) ==
+               len(tiles))
+
+
+def test_plan_overfetch():
+    path_row_list = [(1, 1), (1, 2), (1, 3), (2, 1), (2, 3), (1, 1)]
+    assert(len(plan_path_row_ranges(path_row_list)) == 3)
+
+    ranges = plan_path_row_ranges(path_row_list, max_overfetch=0.25)
+    assert(len(ranges) == 1)
+    assert(ranges[0][:4] == (1, 2, 1, 3))
+
+
+def test_plan_far_apart():
+    path_row_list = [(10, 10), (100, 100), (10, 12)]
+    ranges = plan_path_row_ranges(path_row_list, max_overfetch=0.5)
+
+    assert([r[:4] for r in ranges] ==
+           [(10, 10, 10, 12), (100, 100, 100, 100)])
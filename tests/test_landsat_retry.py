@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import os
+import asyncio
+
+import aiohttp
+import pytest
+
+from conftest import FakeClock, publish_scene
+from landsat_downloader.async_transport import AsyncHTTPTransport
+from landsat_downloader.downloader import LandsatDownloader
+from landsat_downloader.downloader_base import (
+    AWSDownloaderCollection1RT, Downloader
+)
+from landsat_downloader.exceptions import (
+    BatchDownloadErrors, CircuitOpenError, DownloaderErrors, TransientError,
+    is_transient
+)
+from landsat_downloader.retry import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, Resilience, RetryPolicy
+)
+from landsat_downloader.scene_info import SceneInfo
+from landsat_downloader.transport import HTTPTransport
+
+
+SCENE_ID = 'LC82240692018053LGN00'
+PRODUCT_ID = 'LC08_L1GT_224069_20180222_20180308_01_T2'
+
+
+def make_transport(attempts=3, failures=5):
+    return HTTPTransport(resilience=Resilience(
+        RetryPolicy(attempts=attempts, backoff=0.01), failures=failures))
+
+
+def publish_file(server, name):
+    with open(os.path.join(server.root, name), 'wb') as f:
+        f.write(b'x' * 100)
+    return server.url + name
+
+
+def test_retry_delay_is_bounded():
+    policy = RetryPolicy(backoff=1, max_backoff=5)
+    for retry in range(10):
+        assert(0 <= policy.get_delay(retry) <= min(5, 2 ** retry))
+    assert(policy.get_delay(0, retry_after='3') == 3)
+    assert(policy.get_delay(0, retry_after='60') == 5)
+    assert(policy.is_retryable(503))
+    assert(not policy.is_retryable(404))
+
+
+def test_circuit_breaker_opens_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker('host', failures=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    assert(breaker.state == OPEN)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    clock.now = 10
+    breaker.check()
+    assert(breaker.state == HALF_OPEN)
+    # a single trial call is let through
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_failure()
+    assert(breaker.state == OPEN)
+
+    clock.now = 20
+    breaker.check()
+    breaker.record_success()
+    assert(breaker.state == CLOSED)
+
+
+def test_cancelled_half_open_trial():
+    clock = FakeClock()
+    resilience = Resilience(failures=1, reset_timeout=10, clock=clock)
+    url = 'http://host/file'
+    breaker = resilience.get_breaker(url)
+    breaker.record_failure()
+    clock.now = 10
+
+    async def trial():
+        task = asyncio.ensure_future(resilience.call_async(
+            url, lambda: asyncio.sleep(60), ()))
+        await asyncio.sleep(0)
+        assert(breaker.state == HALF_OPEN)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(trial())
+    assert(breaker.state == OPEN)
+    breaker.check()
+    assert(breaker.state == HALF_OPEN)
+
+    # a trial never reporting is given up after reset_timeout
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.now = 20
+    breaker.check()
+    breaker.record_success()
+    assert(breaker.state == CLOSED)
+
+
+def test_transport_retries_transient_answers(http_server):
+    url = publish_file(http_server, 'file.bin')
+    http_server.failures['/file.bin'] = [503, 500]
+
+    response = make_transport().head(url)
+    assert(response.status_code == 200)
+    assert(len(http_server.hits) == 3)
+
+
+def test_transport_returns_last_answer(http_server):
+    url = publish_file(http_server, 'file.bin')
+    http_server.failures['/file.bin'] = [503] * 3
+
+    assert(make_transport().head(url).status_code == 503)
+    assert(make_transport().head(http_server.url + 'missing').status_code ==
+           404)
+    assert(len(http_server.hits) == 4)
+
+
+def test_transport_fails_fast_while_circuit_is_open(http_server):
+    url = publish_file(http_server, 'file.bin')
+    http_server.failures['/file.bin'] = [503] * 2
+    transport = make_transport(attempts=2, failures=2)
+
+    assert(transport.head(url).status_code == 503)
+    with pytest.raises(CircuitOpenError):
+        transport.head(url)
+    assert(len(http_server.hits) == 2)
+    assert(transport.stats()['circuits'][http_server.url[7:-1]]['state'] ==
+           OPEN)
+
+    transport.resilience.reset()
+    assert(transport.head(url).status_code == 200)
+
+
+def test_async_download_retries_transient_answers(http_server, tmpdir):
+    url = publish_file(http_server, 'file.bin')
+    http_server.failures['/file.bin'] = [503, 500]
+    file_path = str(tmpdir.join('file.bin'))
+
+    async def download():
+        async with AsyncHTTPTransport(resilience=Resilience(
+                RetryPolicy(backoff=0.01))) as transport:
+            return await transport.download(url, file_path)
+
+    assert(asyncio.run(download()) == os.path.getsize(file_path))
+    assert(len(http_server.hits) == 3)
+
+
+def test_async_errors_are_classified(http_server, tmpdir):
+    url = publish_file(http_server, 'file.bin')
+    http_server.failures['/file.bin'] = [503]
+    file_path = str(tmpdir.join('file.bin'))
+
+    async def download(url):
+        async with AsyncHTTPTransport(resilience=Resilience(
+                RetryPolicy(attempts=1))) as transport:
+            return await transport.download(url, file_path)
+
+    with pytest.raises(aiohttp.ClientResponseError) as exc:
+        asyncio.run(download(url))
+    assert(is_transient(exc.value))
+    with pytest.raises(aiohttp.ClientResponseError) as exc:
+        asyncio.run(download(http_server.url + 'missing'))
+    assert(not is_transient(exc.value))
+
+    assert(is_transient(asyncio.TimeoutError()))
+    assert(is_transient(aiohttp.ServerDisconnectedError()))
+    assert(DownloaderErrors([aiohttp.ClientOSError()]).transient)
+
+
+def test_transient_probe_is_not_a_missing_scene(local_pds):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    rt_id = scene_info.make_rt_product_id()
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID, ['BQA'])
+    local_pds.failures['/c1/L8/224/069/{}/index.html'.format(rt_id)] = [503]
+
+    with pytest.raises(DownloaderErrors) as exc:
+        Downloader(scene_info, transport=make_transport(attempts=1))
+
+    assert(exc.value.transient)
+    assert(any(isinstance(error, TransientError)
+               for error in exc.value.errors))
+
+
+def test_transient_probe_is_retried(local_pds):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    rt_id = scene_info.make_rt_product_id()
+    publish_scene(local_pds.root, 'c1/L8', rt_id, ['BQA'])
+    local_pds.failures['/c1/L8/224/069/{}/index.html'.format(rt_id)] = [503]
+
+    downloader = Downloader(scene_info, transport=make_transport())
+    assert(isinstance(downloader.downloader, AWSDownloaderCollection1RT))
+    assert(downloader.rt_available is True)
+
+
+def test_missing_scene_is_not_transient(local_pds):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    with pytest.raises(DownloaderErrors) as exc:
+        Downloader(scene_info, transport=make_transport())
+
+    assert(not exc.value.transient)
+    assert(len(exc.value.errors) == 3)
+
+
+def test_batch_lists_transient_failures(local_pds, tmpdir):
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    rt_id = scene_info.make_rt_product_id()
+    local_pds.failures['/c1/L8/224/069/{}/index.html'.format(rt_id)] = [503]
+    missing = ('LC82240702018053LGN00',
+               'LC08_L1GT_224070_20180222_20180308_01_T2')
+
+    with pytest.raises(BatchDownloadErrors) as exc:
+        LandsatDownloader.download_scenes(
+            [(SCENE_ID, PRODUCT_ID), missing], ['BQA'],
+            download_dir=str(tmpdir), transport=make_transport(attempts=1))
+
+    assert(exc.value.get_transient() == [SCENE_ID])
@@ -3,6 +3,8 @@
 
 """Tests for `landsat_downloader` package."""
 
+import pytest
+
 from datetime import datetime
 
 from landsat_downloader.scene_info import SceneInfo, Identifier, Product
@@ -61,3 +63,62 @@ def test_scene_info_julian_2_date():
 #         s = "{}{}".format(scene, i)
 #         scene_info = SceneInfo(scene_id=s, product_id=scene_rt)
 #         assert(scene_info.scene_id == "LC82240682018069LGN00")
+
+
+def _assert_same_info(scene_info, other):
+    assert(scene_info.scene_id == other.scene_id)
+    assert(scene_info.product_id == other.product_id)
+    for info, other_info in ((scene_info.id_info, other.id_info),
+                             (scene_info.product_info, other.product_info)):
+        for name in info.__slots__:
+            value, other_value = getattr(info, name), getattr(other_info, name)
+            assert(value == other_value)
+            assert(type(value) == type(other_value))
+
+
+def test_scene_info_slots():
+    scene_info = SceneInfo(
+        scene_id="LC82240682018069LGN00",
+        product_id="LC08_L1GT_224068_20180310_20180320_01_T2")
+
+    for obj in (scene_info, scene_info.id_info, scene_info.product_info):
+        assert(not hasattr(obj, '__dict__'))
+    assert(isinstance(scene_info.product_info, Product))
+    assert(scene_info.product_info.process_date == datetime(2018, 3, 20))
+
+
+def test_scene_info_from_ids():
+    scene_ids = [
+        "LC82240682018069LGN00", "LC82240692018037LGN00",
+        "LC82240692016366LGN01", "LC82240682018069LGN00"]
+    product_ids = [
+        "LC08_L1GT_224068_20180310_20180320_01_T2",
+        "LC08_L1GT_224069_20180206_20180206_01_RT",
+        "LC08_L1TP_224069_20161231_20170314_01_T1",
+        "LC08_L1GT_224068_20180310_20180320_01_T2"]
+
+    scenes = SceneInfo.from_ids(scene_ids, product_ids)
+    assert(len(scenes) == 4)
+    for scene, scene_id, product_id in zip(scenes, scene_ids, product_ids):
+        _assert_same_info(scene, SceneInfo(scene_id, product_id))
+    assert(scenes[2].id_info.acq_date == datetime(2016, 12, 31).date())
+    assert(scenes[1].make_rt_product_id() == product_ids[1])
+
+    # ids out of the fixed layout are parsed one by one
+    scenes = SceneInfo.from_ids(
+        ["LC82240682018069LGN001"], ["LC08_L1GT_224068_20180310_20180320_1_T2"])
+    _assert_same_info(scenes[0], SceneInfo(
+        "LC82240682018069LGN001", "LC08_L1GT_224068_20180310_20180320_1_T2"))
+
+
+def test_scene_info_from_ids_errors():
+    with pytest.raises(ValueError):
+        SceneInfo.from_ids(["LC82240682018069LGN00"], [])
+    with pytest.raises(ValueError):
+        SceneInfo.from_ids(
+            ["LC82240682018069LGN00"],
+            ["LC08_L1GT_224068_20181310_20180320_01_T2"])
+    with pytest.raises(ValueError):
+        SceneInfo.from_ids(
+            ["LC8224068201806XLGN00"],
+            ["LC08_L1GT_224068_20180310_20180320_01_T2"])
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import time
+import threading
+
+from collections import Counter
+
+import pytest
+
+from landsat_downloader.scheduler import Scheduler, get_host
+
+
+def test_get_host():
+    assert(get_host('https://s3-us-west-2.amazonaws.com/landsat-pds/c1/') ==
+           's3-us-west-2.amazonaws.com')
+
+
+def test_scheduler_limits():
+    running = Counter()
+    peaks = Counter()
+    lock = threading.Lock()
+
+    def task(host):
+        with lock:
+            running[host] += 1
+            running['all'] += 1
+            peaks[host] = max(peaks[host], running[host])
+            peaks['all'] = max(peaks['all'], running['all'])
+        time.sleep(0.01)
+        with lock:
+            running[host] -= 1
+            running['all'] -= 1
+        return host
+
+    with Scheduler(max_workers=4, max_per_host=2) as scheduler:
+        futures = [
+            scheduler.submit(host, task, host)
+            for host in ['a', 'b', 'c'] * 6
+        ]
+        assert([f.result() for f in futures] == ['a', 'b', 'c'] * 6)
+
+    assert(peaks['all'] == 4)
+    assert(max(peaks['a'], peaks['b'], peaks['c']) == 2)
+
+
+def test_scheduler_errors_and_cancel():
+    event = threading.Event()
+
+    def fail():
+        raise ValueError('failed')
+
+    scheduler = Scheduler(max_workers=1)
+    blocking = scheduler.submit('a', event.wait)
+    failing = scheduler.submit('a', fail)
+    cancelled = scheduler.submit('a', fail)
+    assert(cancelled.cancel())
+
+    event.set()
+    assert(blocking.result() is True)
+    with pytest.raises(ValueError):
+        failing.result()
+    scheduler.shutdown()
+    assert(cancelled.cancelled())
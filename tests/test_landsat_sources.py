@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import os
+import asyncio
+
+import pytest
+
+from conftest import publish_scene
+from landsat_downloader.downloader import LandsatDownloader
+from landsat_downloader.downloader_base import Downloader, MirrorDownloader
+from landsat_downloader.exceptions import (
+    DownloaderErrors, RemoteFileDoesntExist, TransientError
+)
+from landsat_downloader.retry import Resilience, RetryPolicy
+from landsat_downloader.scene_info import SceneInfo
+from landsat_downloader.sources import (
+    HTTPSource, LocalSource, SceneLocation, Source, SourceRegistry
+)
+from landsat_downloader.transport import HTTPTransport
+
+
+SCENE_ID = 'LC82240692018053LGN00'
+PRODUCT_ID = 'LC08_L1GT_224069_20180222_20180308_01_T2'
+SCENE = SceneLocation('t1', PRODUCT_ID, 224, 69)
+
+
+def make_http_source(server, name='mirror'):
+    transport = HTTPTransport(
+        resilience=Resilience(RetryPolicy(attempts=1)))
+    return HTTPSource(name, {
+        'rt': server.url + 'c1/L8/',
+        't1': server.url + 'c1/L8/',
+        'pre': server.url + 'L8/',
+    }, transport=transport)
+
+
+def test_local_source(tmpdir):
+    root = str(tmpdir.mkdir('mirror'))
+    publish_scene(root, 'c1/L8', PRODUCT_ID, ['B4'])
+    source = LocalSource(root)
+    filename = '{}_B4.TIF'.format(PRODUCT_ID)
+
+    assert(source.probe(SCENE))
+    assert(not source.probe(SCENE._replace(collection='pre')))
+    assert(filename in source.list(SCENE))
+    assert(source.head(SCENE, filename).size == 1024)
+    assert(not source.head(SCENE, 'missing.TIF').exists)
+    assert(source.read_range(SCENE, filename, 1020, 10) == b'\x00' * 4)
+
+    file_path = str(tmpdir.join(filename))
+    assert(source.fetch(SCENE, filename, file_path) == 1024)
+    assert(os.path.getsize(file_path) == 1024)
+
+
+def test_http_source_lists_index(http_server):
+    scene_dir = publish_scene(http_server.root, 'c1/L8', PRODUCT_ID, ['B4'])
+    with open(os.path.join(scene_dir, 'index.html'), 'w') as f:
+        f.write('<a href="{0}_B4.TIF">B4</a> <a href="../">up</a>'.format(
+            PRODUCT_ID))
+    source = make_http_source(http_server)
+
+    assert(source.probe(SCENE))
+    assert(source.list(SCENE) == ['{}_B4.TIF'.format(PRODUCT_ID)])
+    assert(source.list(SCENE._replace(considered_id='other')) == [])
+
+
+def test_registry_ranks_fastest_healthy_first(tmpdir):
+    slow = LocalSource(str(tmpdir), name='slow')
+    fast = LocalSource(str(tmpdir), name='fast')
+    down = LocalSource(str(tmpdir), name='down')
+    registry = SourceRegistry([down, slow, fast], failures=1)
+
+    registry.record_transfer(slow, 1000, 1.0)
+    registry.record_transfer(fast, 1000, 0.1)
+    registry.record_failure(down)
+
+    assert([s.name for s in registry.rank(size=10 ** 6)] ==
+           ['fast', 'slow', 'down'])
+    stats = registry.stats()
+    assert(stats['down']['healthy'] is False)
+    assert(stats['fast']['throughput'] == 10000)
+
+
+def test_registry_probe_separates_transient_errors(http_server, tmpdir):
+    http_server.failures['/c1/L8/224/069/{}/index.html'.format(
+        PRODUCT_ID)] = [503, 503]
+    registry = SourceRegistry([
+        make_http_source(http_server), LocalSource(str(tmpdir))])
+
+    with pytest.raises(TransientError):
+        registry.probe(SCENE)
+
+    publish_scene(str(tmpdir), 'c1/L8', PRODUCT_ID, ['B4'])
+    assert(registry.probe(SCENE) == 'local')
+
+
+def test_downloader_fails_over_to_next_source(http_server, tmpdir):
+    root = str(tmpdir.mkdir('mirror'))
+    publish_scene(http_server.root, 'c1/L8', PRODUCT_ID, ['B4'])
+    publish_scene(root, 'c1/L8', PRODUCT_ID, ['B4'])
+    local = LocalSource(root)
+    registry = SourceRegistry([make_http_source(http_server), local])
+
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    downloader = Downloader(scene_info, sources=registry)
+    assert(isinstance(downloader.downloader, MirrorDownloader))
+    assert(downloader.t1_available is True)
+
+    # the local mirror is slower, used only when the other fails
+    registry.record_latency(local, 10)
+    band_path = '/c1/L8/224/069/{0}/{0}_B4.TIF'.format(PRODUCT_ID)
+    http_server.failures[band_path] = [503]
+    imgs = downloader.download(
+        bands=['B4'], download_dir=str(tmpdir.mkdir('out')))
+
+    assert([img['size'] for img in imgs] == [1024, 54])
+    assert(registry.stats()['mirror']['failures'] == 1)
+    assert(registry.stats()['local']['bytes'] == 1024)
+    assert(registry.stats()['mirror']['bytes'] == 54)
+
+
+def test_download_scene_from_local_mirror(tmpdir):
+    root = str(tmpdir.mkdir('mirror'))
+    publish_scene(root, 'L8', SCENE_ID, ['B4'])
+    registry = SourceRegistry([LocalSource(root)])
+
+    imgs = LandsatDownloader.download_scene(
+        [4], SCENE_ID, PRODUCT_ID, download_dir=str(tmpdir.mkdir('out')),
+        sources=registry)
+    assert([img['type'] for img in imgs] == ['B4', 'MTL'])
+    assert(os.path.dirname(imgs[0]['path']).endswith(SCENE_ID))
+
+
+def test_mirrors_without_the_scene(tmpdir):
+    registry = SourceRegistry([LocalSource(str(tmpdir))])
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+
+    with pytest.raises(DownloaderErrors) as exc:
+        Downloader(scene_info, sources=registry)
+    assert(not exc.value.transient)
+
+
+def test_sources_reject_the_asyncio_api(tmpdir):
+    with pytest.raises(TypeError):
+        Source()
+
+    registry = SourceRegistry([LocalSource(str(tmpdir))])
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    downloader = Downloader(scene_info, probe=False, sources=registry)
+
+    with pytest.raises(ValueError):
+        asyncio.run(downloader.resolve_async())
+    with pytest.raises(ValueError):
+        asyncio.run(downloader.download_async(bands=['B4']))
+
+
+def test_large_files_go_to_the_highest_throughput_source(tmpdir):
+    roots = [str(tmpdir.mkdir(name)) for name in ('near', 'fast')]
+    for root in roots:
+        publish_scene(root, 'c1/L8', PRODUCT_ID, ['B4'], size=1000000)
+    near, fast = [LocalSource(root, name=os.path.basename(root))
+                  for root in roots]
+    registry = SourceRegistry([near, fast])
+    registry.record_latency(near, 0.01)
+    registry.record_transfer(near, 1000, 1)
+    registry.record_latency(fast, 0.1)
+    registry.record_transfer(fast, 10000000, 1)
+
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    downloader = Downloader(scene_info, sources=registry)
+    assert(registry.rank('t1')[0] is near)
+    downloader.download(bands=['B4'], metadata=False,
+                        download_dir=str(tmpdir.mkdir('out')))
+
+    stats = registry.stats()
+    assert(stats['fast']['bytes'] == 10000000 + 1000000)
+    assert(stats['near']['bytes'] == 1000)
+
+
+def test_range_reader_without_source_for_the_collection(tmpdir):
+    registry = SourceRegistry([LocalSource(str(tmpdir), folders={})])
+    scene_info = SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID)
+    downloader = MirrorDownloader(
+        scene_info.product_info, 't1', PRODUCT_ID, registry, check=False)
+
+    with pytest.raises(RemoteFileDoesntExist):
+        downloader._get_range_reader('{}_B4.TIF'.format(PRODUCT_ID))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader.table`."""
+
+import io
+import csv
+
+import pytest
+
+from datetime import datetime
+
+from conftest import make_inventory_record, publish_inventory
+from landsat_downloader.finder import LandsatFinder
+
+np = pytest.importorskip('numpy')
+
+from landsat_downloader.table import SceneTable  # noqa: E402
+
+
+def _records():
+    records = [
+        make_inventory_record(path, row, datetime(2018, month, 10),
+                              cloud_cover=month * 10.0)
+        for path, row in [(223, 63), (222, 64), (222, 63)]
+        for month in (3, 1, 2)
+    ]
+    records[0]['cloudCover'] = 0
+    del records[1]['sunElevation']
+    return records
+
+
+def test_scene_table_columns():
+    table = SceneTable.from_records(_records())
+
+    assert(len(table) == 9)
+    assert(table.names[:2] == ['browseAvailable', 'sceneID'])
+    assert(table['path'].dtype == np.int64)
+    assert(table['cloudCover'].dtype == np.float64)
+    assert(table['acquisitionDate'].dtype == np.dtype('datetime64[D]'))
+    assert(np.isnan(table['sunElevation'][1]))
+    assert(list(table.categories['sensor']) == ['OLI_TIRS'])
+    assert(table.columns['sensor'].tolist() == [0] * 9)
+    assert(table['sensor'][0] == 'OLI_TIRS')
+
+
+def test_scene_table_round_trip():
+    records = _records()
+    table = SceneTable.from_records(records)
+    dict_list = table.to_dict_list()
+
+    assert(dict_list[0] == records[0])
+    assert(dict_list[1]['sunElevation'] is None)
+    del dict_list[1]['sunElevation']
+    assert(dict_list[1:] == records[1:])
+    assert(SceneTable.from_records([]).to_dict_list() == [])
+
+
+def test_scene_table_all_missing_text_column():
+    table = SceneTable.from_records(
+        [{'sceneID': 'A', 'path': 1, 'row': 2, 'x': None},
+         {'sceneID': 'B', 'path': 1, 'row': 2, 'x': None}])
+
+    assert(table['x'].tolist() == [None, None])
+    assert(table[:1].to_dict_list() == [
+        {'sceneID': 'A', 'path': 1, 'row': 2, 'x': None}])
+
+
+def test_scene_table_filter_sort_group():
+    table = SceneTable.from_records(_records())
+
+    clear = table[(table['cloudCover'] < 25) &
+                  (table['acquisitionDate'] >= np.datetime64('2018-01-01'))]
+    assert(len(clear) == 7)
+    assert(len(table[table.isin('sceneID', [
+        'LC82220632018069LGN00', 'LC82220632018010LGN00', 'missing'])]) == 2)
+
+    ordered = table.sort('path', 'row', 'acquisitionDate')
+    assert([(s['path'], s['row'], s['acquisitionDate'])
+            for s in ordered.to_dict_list()[:4]] == [
+        (222, 63, '2018-01-10'), (222, 63, '2018-02-10'),
+        (222, 63, '2018-03-10'), (222, 64, '2018-01-10')])
+
+    groups = clear.group_by_path_row()
+    assert(list(groups) == [(222, 63), (222, 64), (223, 63)])
+    assert([len(group) for group in groups.values()] == [2, 2, 3])
+    assert(groups[(223, 63)]['acquisitionDate'].astype(str).tolist() ==
+           ['2018-03-10', '2018-01-10', '2018-02-10'])
+
+
+def test_scene_table_export(tmpdir):
+    table = SceneTable.from_records(_records())
+
+    buffer = io.StringIO()
+    table.to_csv(buffer)
+    rows = list(csv.reader(io.StringIO(buffer.getvalue())))
+    assert(rows[0] == table.names)
+    assert(len(rows) == 10)
+    assert(rows[2][table.names.index('sunElevation')] == '')
+
+    pa = pytest.importorskip('pyarrow')
+    arrow = table.to_arrow()
+    assert(arrow.num_rows == 9)
+    assert(arrow.schema.field('sensor').type ==
+           pa.dictionary(pa.int32(), pa.string()))
+    assert(arrow.column('path').to_pylist()[0] == 223)
+    assert(arrow.column('sunElevation').null_count == 1)
+
+    path = str(tmpdir.join('scenes.parquet'))
+    table.to_parquet(path)
+    import pyarrow.parquet as pq
+    assert(pq.read_table(path).num_rows == 9)
+
+
+def test_search_scenes_table(local_ee):
+    publish_inventory(local_ee.root, _records())
+    table = LandsatFinder.search_scenes_table(
+        [(222, 63), (223, 63)], datetime(2018, 1, 1), datetime(2018, 12, 31))
+
+    assert(len(table) == 6)
+    assert(sorted(table.group_by_path_row()) == [(222, 63), (223, 63)])
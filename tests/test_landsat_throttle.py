@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import FakeClock
+from landsat_downloader.throttle import (
+    AdaptiveConcurrency, RateLimiter, TokenBucket
+)
+from landsat_downloader.transport import HTTPTransport
+
+
+def test_token_bucket_waits_for_the_debt():
+    clock = FakeClock()
+    bucket = TokenBucket(100, clock=clock, sleep=clock.sleep)
+
+    assert(bucket.acquire(100) == 0)
+    assert(bucket.acquire(50) == 0.5)
+    clock.now += 2
+    # refilled up to burst only
+    assert(bucket.acquire(100) == 0)
+    assert(bucket.acquire(100) == 1)
+    assert(clock.sleeps == [0.5, 1])
+
+
+def test_rate_limiter_stats():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        bytes_per_second=1000, requests_per_second=2, clock=clock,
+        sleep=clock.sleep)
+
+    for _ in range(4):
+        limiter.request()
+        limiter.consume(500)
+
+    stats = limiter.stats()
+    assert(stats['requests'] == 4)
+    assert(stats['bytes'] == 2000)
+    assert(stats['bytes_per_second_limit'] == 1000)
+    assert(stats['throughput'] == 200)
+    assert(stats['waited'] > 0)
+    assert(clock.now >= 1)
+
+
+def test_rate_limiter_without_limits_does_not_wait():
+    limiter = RateLimiter()
+    limiter.request()
+    limiter.consume(10 ** 9)
+    assert(limiter.stats()['waited'] == 0)
+
+
+def test_adaptive_concurrency_grows_and_shrinks():
+    concurrency = AdaptiveConcurrency(initial=2, maximum=4)
+
+    for _ in range(2):
+        concurrency.record(True, 0.1, 1000)
+    assert(concurrency.stats()['limit'] == 3)
+
+    concurrency.record(False)
+    assert(concurrency.stats()['limit'] == 1)
+    assert(concurrency.stats()['errors'] == 1)
+
+    for _ in range(20):
+        concurrency.record(True, 0.1)
+    assert(concurrency.stats()['limit'] == 4)
+
+
+def test_adaptive_concurrency_shrinks_on_rising_latency():
+    concurrency = AdaptiveConcurrency(initial=8, latency_tolerance=2)
+
+    concurrency.record(True, 0.1)
+    for _ in range(5):
+        concurrency.record(True, 1.0)
+    assert(concurrency.stats()['limit'] < 8)
+
+
+def test_adaptive_concurrency_limits_requests_in_flight():
+    concurrency = AdaptiveConcurrency(initial=2, maximum=2)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def work(_):
+        with concurrency.slot():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            threading.Event().wait(0.01)
+            with lock:
+                running.pop()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(work, range(16)))
+
+    assert(max(peak) == 2)
+    assert(concurrency.stats()['in_flight'] == 0)
+    assert(concurrency.stats()['successes'] == 16)
+
+
+def test_transport_shares_limits(http_server, tmpdir):
+    with open(os.path.join(http_server.root, 'file.bin'), 'wb') as f:
+        f.write(b'x' * 3000)
+    url = http_server.url + 'file.bin'
+    transport = HTTPTransport(
+        rate_limiter=RateLimiter(), concurrency=AdaptiveConcurrency())
+
+    assert(transport.head(url).status_code == 200)
+    assert(transport.head(http_server.url + 'missing').status_code == 404)
+    transport.download(url, str(tmpdir.join('file.bin')), chunk_size=1024)
+    transport.download(
+        url, str(tmpdir.join('other.bin')), size=3000, segments=3)
+
+    stats = transport.stats()
+    assert(stats['rate']['requests'] == 6)
+    assert(stats['rate']['bytes'] == 6000)
+    assert(stats['concurrency']['successes'] == 6)
+    assert(stats['concurrency']['errors'] == 0)
+    assert(stats['concurrency']['in_flight'] == 0)
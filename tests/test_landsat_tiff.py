@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader.tiff`."""
+
+import os
+
+import pytest
+
+from conftest import publish_scene, write_tiff
+from landsat_downloader.downloader_base import AWSDownloaderCollection1Tiers
+from landsat_downloader.exceptions import UnsupportedTiffError
+from landsat_downloader.scene_info import SceneInfo
+
+np = pytest.importorskip('numpy')
+
+from landsat_downloader.tiff import (  # noqa: E402
+    TiffLayout, coalesce_ranges, read_window
+)
+
+SCENE_ID = 'LC82240682018069LGN00'
+PRODUCT_ID = 'LC08_L1TP_224068_20180310_20180320_01_T1'
+
+
+def _image(height=300, width=200, dtype=np.uint16):
+    return (np.arange(height * width, dtype=np.int64).reshape(
+        height, width) * 7919 % 65521).astype(dtype)
+
+
+def _file_reader(path, requests=None):
+    def read(offset, size):
+        if requests is not None:
+            requests.append((offset, size))
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
+    return read
+
+
+@pytest.mark.parametrize('options', [
+    {'tile': 64},
+    {'tile': 64, 'compression': 8, 'predictor': 2},
+    {'rows_per_strip': 7},
+    {'rows_per_strip': 16, 'compression': 8, 'byte_order': '>'},
+    {},
+])
+def test_read_window(tmpdir, options):
+    image = _image()
+    path = str(tmpdir.join('band.TIF'))
+    write_tiff(path, image, **options)
+
+    read = _file_reader(path)
+    layout = TiffLayout(read, header_size=256)
+    assert(layout.shape == image.shape)
+    assert(layout.dtype.kind == 'u' and layout.dtype.itemsize == 2)
+
+    for window in (((0, 300), (0, 200)), ((10, 75), (63, 129)),
+                   ((299, 300), (199, 200)), ((130, 131), (0, 200))):
+        (r0, r1), (c0, c1) = window
+        assert(np.array_equal(read_window(read, layout, window),
+                              image[r0:r1, c0:c1]))
+
+
+def test_read_window_signed_float(tmpdir):
+    for dtype in (np.int16, np.float32):
+        image = _image(dtype=dtype) - 100
+        path = str(tmpdir.join('band_{}.TIF'.format(np.dtype(dtype).name)))
+        write_tiff(path, image, tile=32, compression=8)
+        read = _file_reader(path)
+        window = read_window(read, TiffLayout(read), ((5, 40), (5, 40)))
+        assert(window.dtype == dtype)
+        assert(np.array_equal(window, image[5:40, 5:40]))
+
+
+def test_read_window_requests(tmpdir):
+    image = _image(512, 512)
+    path = str(tmpdir.join('band.TIF'))
+    blocks = write_tiff(path, image, tile=64)
+
+    requests = []
+    read = _file_reader(path, requests)
+    layout = TiffLayout(read, header_size=1024)
+    del requests[:]
+
+    # 2 x 2 tiles, each pair of adjacent tiles is a single request
+    read_window(read, layout, ((70, 130), (70, 130)), max_gap=0)
+    assert(sorted(requests) == [
+        (blocks[9][0], 2 * blocks[9][1]),
+        (blocks[17][0], 2 * blocks[17][1])])
+
+    del requests[:]
+    read_window(read, layout, ((70, 130), (70, 130)),
+                max_gap=6 * blocks[0][1])
+    assert(len(requests) == 1)
+    assert(sum(size for _, size in requests) < os.path.getsize(path) / 4)
+
+
+def test_coalesce_ranges():
+    ranges = [(100, 10, 'b'), (0, 10, 'a'), (115, 5, 'c'), (500, 1, 'd')]
+    assert([r[:2] for r in coalesce_ranges(ranges, max_gap=5)] ==
+           [(0, 10), (100, 20), (500, 1)])
+    assert([key for _, _, key in coalesce_ranges(ranges, 5)[1][2]] ==
+           ['b', 'c'])
+
+
+def test_unsupported_tiff(tmpdir):
+    path = str(tmpdir.join('band.TIF'))
+    write_tiff(path, _image(), tile=64, compression=5)
+    with pytest.raises(UnsupportedTiffError):
+        TiffLayout(_file_reader(path))
+
+    with pytest.raises(UnsupportedTiffError):
+        TiffLayout(lambda offset, size: b'<html></html>')
+
+    write_tiff(path, _image(), tile=64)
+    layout = TiffLayout(_file_reader(path))
+    with pytest.raises(ValueError):
+        read_window(_file_reader(path), layout, ((0, 301), (0, 10)))
+
+
+def test_downloader_read_window(local_pds):
+    scene_dir = publish_scene(
+        local_pds.root, 'c1/L8', PRODUCT_ID, ['B4'])
+    image = _image(512, 512)
+    band_path = os.path.join(scene_dir, PRODUCT_ID + '_B4.TIF')
+    write_tiff(band_path, image, tile=128, compression=8, predictor=2)
+
+    downloader = AWSDownloaderCollection1Tiers(
+        SceneInfo(scene_id=SCENE_ID, product_id=PRODUCT_ID))
+    del local_pds.hits[:]
+
+    window = downloader.read_window('B4', ((200, 260), (10, 20)))
+    assert(np.array_equal(window, image[200:260, 10:20]))
+    # the header, then both tiles, close enough, in a single request
+    assert(len(local_pds.hits) == 2)
+
+    window = downloader.read_window('B4', ((0, 1), (0, 1)))
+    assert(window[0, 0] == image[0, 0])
+    assert(len(local_pds.hits) == 3)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import json
+import threading
+
+from datetime import datetime
+
+import pytest
+
+from conftest import make_inventory_record, publish_inventory, publish_scene
+from landsat_downloader.downloader import LandsatDownloader
+from landsat_downloader.finder import LandsatFinder
+from landsat_downloader.tracing import (
+    STATUS_ERROR, STATUS_OK, SpanRecorder, Tracer, get_current_span,
+    get_default_tracer, set_default_tracer
+)
+
+
+SCENE_ID = 'LC82240692018053LGN00'
+PRODUCT_ID = 'LC08_L1GT_224069_20180222_20180308_01_T2'
+
+
+@pytest.fixture
+def tracer():
+    recorder = SpanRecorder()
+    set_default_tracer(recorder)
+    yield recorder
+    set_default_tracer(None)
+
+
+def test_default_tracer_does_nothing():
+    tracer = get_default_tracer()
+    assert(type(tracer) is Tracer)
+    with tracer.span('x', scene_id='a') as span:
+        span.set_attribute('band', 'B4')
+    assert(get_current_span() is None)
+    assert(tracer.wrap(len) is len)
+
+
+def test_spans_nest_across_threads_and_export(tmpdir):
+    tracer = SpanRecorder()
+
+    def work():
+        with tracer.span('child', band='B4'):
+            pass
+
+    with tracer.span('root', scene_id='a') as root:
+        thread = threading.Thread(target=tracer.wrap(work))
+        thread.start()
+        thread.join()
+        with pytest.raises(ValueError):
+            with tracer.span('failed'):
+                raise ValueError('boom')
+
+    child, failed, root = tracer.get_spans()
+    assert(child.parent is root and failed.parent is root)
+    assert(child.trace_id == root.trace_id)
+    assert(failed.status == STATUS_ERROR and root.status == STATUS_OK)
+    assert(failed.attributes['error'] == 'ValueError: boom')
+
+    path = str(tmpdir.join('trace.json'))
+    tracer.write_chrome_trace(path)
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    complete = [event for event in events if event['ph'] == 'X']
+    assert([event['name'] for event in complete] ==
+           ['child', 'failed', 'root'])
+    assert(complete[0]['args']['band'] == 'B4')
+    assert(complete[0]['args']['parent_id'] ==
+           complete[2]['args']['span_id'])
+    assert(len([event for event in events if event['ph'] == 'M']) == 2)
+
+    spans = tracer.to_otlp()['resourceSpans'][0]['scopeSpans'][0]['spans']
+    assert(spans[0]['parentSpanId'] == spans[2]['spanId'])
+    assert(spans[0]['traceId'] == spans[2]['traceId'])
+    assert('parentSpanId' not in spans[2])
+    assert({"key": "scene_id", "value": {"stringValue": "a"}} in
+           spans[2]['attributes'])
+    assert(spans[1]['status'] == {"code": STATUS_ERROR})
+    assert(int(spans[2]['endTimeUnixNano']) >=
+           int(spans[2]['startTimeUnixNano']))
+
+    bounded = SpanRecorder(max_spans=1)
+    for name in ('a', 'b'):
+        with bounded.span(name):
+            pass
+    assert([span.name for span in bounded.get_spans()] == ['b'])
+    assert(bounded.dropped == 1)
+
+
+def test_download_scene_spans(local_pds, tmpdir, tracer):
+    publish_scene(local_pds.root, 'c1/L8', PRODUCT_ID, ['B4'])
+
+    LandsatDownloader.download_scene(
+        [4], SCENE_ID, PRODUCT_ID, download_dir=str(tmpdir))
+
+    scene, = tracer.get_spans('scene')
+    resolve, = tracer.get_spans('resolve')
+    probes = tracer.get_spans('probe')
+    assert(resolve.parent is scene)
+    assert(sorted((span.attributes['collection'], span.attributes['outcome'])
+                  for span in probes) ==
+           [('pre', 'missing'), ('rt', 'missing'), ('t1', 'available')])
+    assert(all(span.parent is resolve for span in probes))
+    assert(len(tracer.get_spans('probe.pre_version')) == 1)
+
+    download, = tracer.get_spans('download')
+    fetches = tracer.get_spans('fetch')
+    assert(download.parent is scene)
+    assert(sorted(span.attributes['band'] for span in fetches) ==
+           ['B4', 'MTL'])
+    assert(all(span.parent is download and
+               span.attributes['scene_id'] == PRODUCT_ID
+               for span in fetches))
+
+    for span in tracer.get_spans('http.get'):
+        assert(span.parent in fetches)
+        assert(span.attributes['status'] == 200)
+        assert('fs.write_seconds' in span.attributes)
+    assert(len(tracer.get_spans('fs.sync')) == 2)
+    assert(all(span.parent.name in ('fetch', 'probe', 'probe.pre_version')
+               for span in tracer.get_spans('http.head')))
+
+
+def test_finder_spans(local_ee, tracer):
+    publish_inventory(local_ee.root, [
+        make_inventory_record(222, 63, datetime(2018, 1, day))
+        for day in (5, 21)
+    ])
+
+    with tracer.span('search') as search:
+        LandsatFinder.search_scenes_metadata(
+            path_row_list=[(222, 63)], start_date=datetime(2018, 1, 1),
+            end_date=datetime(2018, 1, 31))
+
+    query, = tracer.get_spans('finder.query')
+    parse, = tracer.get_spans('finder.parse')
+    assert(query.parent is search and parse.parent is search)
+    assert(query.attributes['status'] == 200)
+    assert(parse.attributes['records'] == 2)
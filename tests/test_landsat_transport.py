@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `landsat_downloader` package."""
+
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from urllib3.exceptions import ProtocolError
+
+from landsat_downloader.exceptions import is_transient
+from landsat_downloader.transport import (
+    HTTPTransport, MAX_SEGMENTS, SEGMENT_SIZE, get_default_transport,
+    get_segments_count, set_default_transport, split_ranges
+)
+
+
+def publish_file(server, name, size):
+    with open(os.path.join(server.root, name), 'wb') as f:
+        f.write(b'x' * size)
+    return server.url + name
+
+
+def test_transport_reuses_connections(http_server):
+    url = publish_file(http_server, 'file.bin', 100)
+    transport = HTTPTransport(pool_size=1)
+
+    for _ in range(10):
+        assert(transport.head(url).status_code == 200)
+
+    assert(len(http_server.hits) == 10)
+    assert(len(http_server.clients) == 1)
+
+
+def test_transport_is_thread_safe(http_server):
+    url = publish_file(http_server, 'file.bin', 100)
+    transport = HTTPTransport(pool_size=4)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        codes = list(executor.map(
+            lambda _: transport.head(url).status_code, range(40)))
+
+    assert(codes == [200] * 40)
+    assert(len(http_server.clients) <= 4)
+
+
+def test_transport_download(http_server, tmpdir):
+    url = publish_file(http_server, 'file.bin', 3000)
+    file_path = str(tmpdir.join('file.bin'))
+
+    size = HTTPTransport().download(url, file_path, chunk_size=1024)
+    assert(size == 3000)
+    assert(os.path.getsize(file_path) == 3000)
+
+
+def test_default_transport():
+    transport = get_default_transport()
+    assert(get_default_transport() is transport)
+
+    other = HTTPTransport(pool_size=2)
+    set_default_transport(other)
+    try:
+        assert(get_default_transport() is other)
+    finally:
+        set_default_transport(transport)
+
+
+def test_transport_download_resumes_part_file(http_server, tmpdir):
+    url = publish_file(http_server, 'file.bin', 3000)
+    file_path = str(tmpdir.join('file.bin'))
+    with open(file_path + '.part', 'wb') as f:
+        f.write(b'x' * 1000)
+
+    size = HTTPTransport().download(url, file_path, chunk_size=512)
+    assert(size == 3000)
+    assert(os.path.getsize(file_path) == 3000)
+    assert(not os.path.exists(file_path + '.part'))
+    assert(len(http_server.hits) == 1)
+
+
+def test_transport_download_restarts_invalid_part_file(http_server, tmpdir):
+    url = publish_file(http_server, 'file.bin', 100)
+    file_path = str(tmpdir.join('file.bin'))
+    with open(file_path + '.part', 'wb') as f:
+        f.write(b'y' * 500)
+
+    assert(HTTPTransport().download(url, file_path) == 100)
+    with open(file_path, 'rb') as f:
+        assert(f.read() == b'x' * 100)
+
+
+def test_transport_download_416_without_part_file(http_server, tmpdir):
+    url = publish_file(http_server, 'file.bin', 100)
+    file_path = str(tmpdir.join('file.bin'))
+    with open(file_path + '.part', 'wb') as f:
+        f.write(b'y' * 50)
+    http_server.failures['/file.bin'] = [416, 416, 416]
+
+    with pytest.raises(requests.HTTPError):
+        HTTPTransport().download(url, file_path)
+    assert(len(http_server.hits) == 2)
+    assert(not os.path.exists(file_path))
+
+
+def test_transport_dropped_connection_is_transient(tmpdir):
+    class DroppedRaw:
+        def readinto(self, view):
+            raise ProtocolError('Connection broken', None)
+
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = DroppedRaw()
+    file_path = str(tmpdir.join('file.bin'))
+
+    with pytest.raises(requests.ConnectionError) as exc:
+        HTTPTransport()._write(response, file_path + '.part', 0, 1024)
+    assert(is_transient(exc.value))
+
+
+def test_split_ranges():
+    assert(split_ranges(10, 3) == [(0, 3), (4, 7), (8, 9)])
+    assert(split_ranges(9, 3) == [(0, 2), (3, 5), (6, 8)])
+    assert(split_ranges(2, 4) == [(0, 0), (1, 1)])
+
+
+def test_segments_count():
+    assert(get_segments_count(1024) == 1)
+    assert(get_segments_count(SEGMENT_SIZE * 3) == 3)
+    assert(get_segments_count(SEGMENT_SIZE * 100) == MAX_SEGMENTS)
+
+
+def test_transport_download_segmented(http_server, tmpdir):
+    with open(os.path.join(http_server.root, 'file.bin'), 'wb') as f:
+        data = os.urandom(10000)
+        f.write(data)
+    file_path = str(tmpdir.join('file.bin'))
+
+    size = HTTPTransport().download(
+        http_server.url + 'file.bin', file_path, size=10000, segments=4)
+    assert(size == 10000)
+    with open(file_path, 'rb') as f:
+        assert(f.read() == data)
+    assert(len(http_server.hits) == 4)
+    assert(not os.path.exists(file_path + '.part'))